@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from datetime import datetime
+from app.routing import worker_pool
 
 router = APIRouter(prefix="/health", tags=["health"])
 
@@ -16,3 +17,11 @@ async def health_check():
         "service": "NEO-trading-mcp-backend"
     }
     
+
+@router.get("/workers", summary="Worker replica health")
+async def worker_health():
+    """
+    Health of each neo_worker replica as seen by the gateway.
+    Unhealthy replicas are left out of session routing until they recover.
+    """
+    return {"replicas": worker_pool.status()}
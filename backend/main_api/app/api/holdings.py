@@ -1,21 +1,11 @@
-from fastapi import APIRouter, HTTPException
-import httpx
+from fastapi import APIRouter, Request
+from app.proxy import proxy_to_worker
 
-NEO_WORKER_URL = "http://neo-worker:8001/worker/holdings"
-
-router = APIRouter(prefix="/holdings", tags=["auth"])
+router = APIRouter(prefix="/holdings", tags=["portfolio"])
 
 @router.get("/get-holdings")
-async def get_holdings_data(session_id: str):
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(f"{NEO_WORKER_URL}/{session_id}")
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                details = f"worker error {e.response.json().get('details', 'unknown error')}"
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Cannot connect to Neo Worker service: {e}")
\ No newline at end of file
+async def get_holdings_data(session_id: str, request: Request):
+    """Proxies /worker/holdings; refresh= and fields= are passed through."""
+    params = {k: v for k, v in request.query_params.items() if k != "session_id"}
+    return await proxy_to_worker(request, "GET", f"/worker/holdings/{session_id}",
+                                 params=params, session_id=session_id)
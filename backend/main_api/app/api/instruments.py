@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Request
+from app.proxy import proxy_to_worker
+
+router = APIRouter(prefix="/instruments", tags=["instruments"])
+
+@router.get("/search")
+async def search_instruments(session_id: str, request: Request):
+    """Proxies /worker/instruments/search; q=, segment= and limit= are passed through."""
+    params = {k: v for k, v in request.query_params.items() if k != "session_id"}
+    return await proxy_to_worker(request, "GET", f"/worker/instruments/search/{session_id}",
+                                 params=params, session_id=session_id)
+
+@router.get("/lookup")
+async def lookup_instrument(session_id: str, request: Request):
+    """Proxies /worker/instruments/lookup; symbol= and segment= are passed through."""
+    params = {k: v for k, v in request.query_params.items() if k != "session_id"}
+    return await proxy_to_worker(request, "GET", f"/worker/instruments/lookup/{session_id}",
+                                 params=params, session_id=session_id)
+
+@router.get("/stats")
+async def instrument_stats(request: Request):
+    """Proxies /worker/instruments/stats of one replica."""
+    return await proxy_to_worker(request, "GET", "/worker/instruments/stats", params={})
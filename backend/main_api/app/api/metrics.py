@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("", summary="Prometheus metrics")
+async def metrics():
+    """
+    Request latency histograms, per-stage timings and in-flight counts
+    in Prometheus text format.
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
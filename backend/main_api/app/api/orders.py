@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Request
+import json
+from app.proxy import proxy_to_worker
+
+router = APIRouter(prefix="/orders", tags=["orders"])
+
+# Order bodies are forwarded as-is; the worker validates them and its 422s pass through.
+
+@router.post("/buy")
+async def buy_order(session_id: str, request: Request):
+    """Proxies /worker/buy. Body: {"qty": int, "stock": str}."""
+    return await proxy_to_worker(request, "POST", f"/worker/buy/{session_id}", params={},
+                                 session_id=session_id)
+
+@router.post("/sell")
+async def sell_order(session_id: str, request: Request):
+    """Proxies /worker/sell. Body: {"qty": int, "stock": str}."""
+    return await proxy_to_worker(request, "POST", f"/worker/sell/{session_id}", params={},
+                                 session_id=session_id)
+
+@router.post("/batch")
+async def batch_orders(request: Request):
+    """Proxies /worker/orders/batch; per-leg results come back unchanged.
+    The body's session_id picks the worker replica."""
+    body = await request.body()
+    try:
+        session_id = json.loads(body).get("session_id")
+    except (ValueError, AttributeError):
+        session_id = None
+    return await proxy_to_worker(request, "POST", "/worker/orders/batch", params={},
+                                 content=body, session_id=session_id)
+
+@router.get("/get-orders")
+async def get_orders(session_id: str, request: Request):
+    """Proxies /worker/orders: orders tracked for the session."""
+    return await proxy_to_worker(request, "GET", f"/worker/orders/{session_id}", params={},
+                                 session_id=session_id)
+
+@router.get("/wait")
+async def wait_for_order(session_id: str, order_id: str, request: Request, timeout: float = 30):
+    """Proxies the worker long-poll; returns once the order fills, is rejected or times out."""
+    return await proxy_to_worker(request, "GET", f"/worker/orders/{session_id}/{order_id}/wait",
+                                 params={"timeout": timeout}, session_id=session_id)
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Request
+from app.proxy import proxy_to_worker
+
+router = APIRouter(prefix="/portfolio", tags=["portfolio"])
+
+@router.get("/get-portfolio")
+async def get_portfolio_data(session_id: str, request: Request):
+    """Proxies /worker/portfolio (holdings, limits and positions in one call)."""
+    params = {k: v for k, v in request.query_params.items() if k != "session_id"}
+    return await proxy_to_worker(request, "GET", f"/worker/portfolio/{session_id}",
+                                 params=params, session_id=session_id)
+
+@router.get("/analytics")
+async def get_portfolio_analytics(session_id: str, request: Request):
+    """Proxies /worker/analytics (allocation, P&L, concentration and what-if)."""
+    params = {k: v for k, v in request.query_params.items() if k != "session_id"}
+    return await proxy_to_worker(request, "GET", f"/worker/analytics/{session_id}",
+                                 params=params, session_id=session_id)
+
+@router.get("/history")
+async def get_portfolio_history(session_id: str, request: Request):
+    """Proxies /worker/history (snapshots kept by the worker, no broker call)."""
+    params = {k: v for k, v in request.query_params.items() if k != "session_id"}
+    return await proxy_to_worker(request, "GET", f"/worker/history/{session_id}",
+                                 params=params, session_id=session_id)
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Request
+from app.proxy import proxy_to_worker
+
+router = APIRouter(prefix="/positions", tags=["portfolio"])
+
+@router.get("/get-positions")
+async def get_positions_data(session_id: str, request: Request):
+    """Proxies /worker/positions; refresh= and fields= are passed through."""
+    params = {k: v for k, v in request.query_params.items() if k != "session_id"}
+    return await proxy_to_worker(request, "GET", f"/worker/positions/{session_id}",
+                                 params=params, session_id=session_id)
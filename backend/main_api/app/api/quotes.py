@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Request
+from app.proxy import proxy_to_worker
+
+router = APIRouter(prefix="/quotes", tags=["market"])
+
+@router.get("/get-quotes")
+async def get_quotes(session_id: str, request: Request):
+    """Proxies /worker/quotes; symbols= and segment= are passed through."""
+    params = {k: v for k, v in request.query_params.items() if k != "session_id"}
+    return await proxy_to_worker(request, "GET", f"/worker/quotes/{session_id}",
+                                 params=params, session_id=session_id)
+
+@router.get("/stream")
+async def stream_quotes(session_id: str, request: Request):
+    """Proxies the worker's server-sent events tick stream; events are relayed as they arrive."""
+    params = {k: v for k, v in request.query_params.items() if k != "session_id"}
+    return await proxy_to_worker(request, "GET", f"/worker/stream/quotes/{session_id}",
+                                 params=params, session_id=session_id)
+
+@router.get("/stats")
+async def stream_stats(request: Request):
+    """Proxies /worker/stream/stats of one replica."""
+    return await proxy_to_worker(request, "GET", "/worker/stream/stats", params={})
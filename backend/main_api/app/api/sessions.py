@@ -0,0 +1,20 @@
+from typing import List
+
+from fastapi import APIRouter, Request
+from pydantic import BaseModel, Field
+from app.proxy import proxy_to_worker
+
+# Same cap as the worker's MAX_SESSION_LOOKUP.
+MAX_SESSION_LOOKUP = 500
+
+class SessionStatusRequest(BaseModel):
+    session_ids: List[str] = Field(..., min_length=1, max_length=MAX_SESSION_LOOKUP)
+
+router = APIRouter(prefix="/sessions", tags=["auth"])
+
+@router.post("/status")
+async def session_status(req: SessionStatusRequest, request: Request):
+    """Proxies /worker/sessions/status. Sessions live in the shared Redis, so any
+    replica can answer; the request goes to the replica of the first session."""
+    return await proxy_to_worker(request, "POST", "/worker/sessions/status", params={},
+                                 json=req.model_dump(), session_id=req.session_ids[0])
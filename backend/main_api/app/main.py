@@ -1,14 +1,44 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api import health
 from app.api import validate
 from app.api import holdings
+from app.api import limits
+from app.api import positions
+from app.api import portfolio
+from app.api import orders
+from app.api import quotes
+from app.api import instruments
+from app.api import sessions
+from app.api import metrics
+from app.metrics import metrics_middleware
+from app.proxy import get_worker_client, close_worker_client
+from app.routing import worker_pool
 
-app = FastAPI(title="Trading MCP API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app):
+    # One connection pool to the worker for the whole app lifetime.
+    worker_pool.start(get_worker_client())
+    yield
+    await worker_pool.stop()
+    await close_worker_client()
+
+app = FastAPI(title="Trading MCP API", version="1.0.0", lifespan=lifespan)
+app.middleware("http")(metrics_middleware)
 
 # Routers
 app.include_router(health.router)
 app.include_router(validate.router)
 app.include_router(holdings.router)
+app.include_router(limits.router)
+app.include_router(positions.router)
+app.include_router(portfolio.router)
+app.include_router(orders.router)
+app.include_router(quotes.router)
+app.include_router(instruments.router)
+app.include_router(sessions.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
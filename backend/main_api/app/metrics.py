@@ -0,0 +1,58 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Gauge, Histogram
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_SECONDS = Histogram(
+    "main_api_request_seconds", "HTTP request latency by route.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "main_api_stage_seconds", "Latency of individual request stages.",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge("main_api_requests_in_flight", "HTTP requests currently being served.")
+
+# Stage timings of the current request, echoed back in the Server-Timing header.
+_request_stages = ContextVar("request_stages", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Times a block as one request stage (histogram + Server-Timing entry)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((name, elapsed))
+
+
+async def metrics_middleware(request, call_next):
+    """Records per-route latency and in-flight count and sets Server-Timing.
+    Timings reported by the worker are kept and the gateway's own are appended."""
+    token = _request_stages.set([])
+    REQUESTS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        parts = [f"gw_{name};dur={elapsed * 1000:.2f}" for name, elapsed in _request_stages.get()]
+        parts.append(f"gw_total;dur={(time.perf_counter() - started) * 1000:.2f}")
+        upstream = response.headers.get("Server-Timing")
+        response.headers["Server-Timing"] = ", ".join(([upstream] if upstream else []) + parts)
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_SECONDS.labels(
+            request.method, getattr(route, "path", "unmatched"), str(status)
+        ).observe(time.perf_counter() - started)
+        REQUESTS_IN_FLIGHT.dec()
+        _request_stages.reset(token)
@@ -0,0 +1,112 @@
+import os
+import time
+
+import httpx
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.metrics import stage
+from app.routing import worker_pool
+
+WORKER_CONNECT_TIMEOUT = float(os.getenv("WORKER_CONNECT_TIMEOUT", "5"))
+WORKER_READ_TIMEOUT = float(os.getenv("WORKER_READ_TIMEOUT", "60"))
+WORKER_MAX_CONNECTIONS = int(os.getenv("WORKER_MAX_CONNECTIONS", "200"))
+WORKER_MAX_KEEPALIVE = int(os.getenv("WORKER_MAX_KEEPALIVE", "50"))
+# Remaining request budget in milliseconds, passed on (and reduced) at every hop.
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+# Connection-specific headers that must not be forwarded by a proxy (RFC 9110 7.6.1).
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "host",
+}
+
+worker_client = None
+
+
+def create_worker_client():
+    """One pooled keep-alive client shared by every proxied request (pools are per replica)."""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(WORKER_READ_TIMEOUT, connect=WORKER_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=WORKER_MAX_CONNECTIONS,
+            max_keepalive_connections=WORKER_MAX_KEEPALIVE,
+        ),
+    )
+
+
+def get_worker_client():
+    global worker_client
+    if worker_client is None or worker_client.is_closed:
+        worker_client = create_worker_client()
+    return worker_client
+
+
+async def close_worker_client():
+    global worker_client
+    if worker_client is not None:
+        await worker_client.aclose()
+        worker_client = None
+
+
+def forward_headers(headers) -> dict:
+    return {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+
+
+def request_budget(request: Request, started: float) -> float:
+    """Seconds left for this request: the caller's X-Deadline-Ms (if any) or
+    WORKER_READ_TIMEOUT, minus the time already spent in the gateway."""
+    budget = WORKER_READ_TIMEOUT
+    value = request.headers.get(DEADLINE_HEADER)
+    if value is not None:
+        try:
+            budget = min(budget, float(value) / 1000)
+        except ValueError:
+            pass
+    return budget - (time.monotonic() - started)
+
+
+async def proxy_to_worker(request: Request, method: str, path: str, params=None, content=None, json=None,
+                          session_id: str = None):
+    """Forwards a request to the worker and streams the response back unchanged.
+
+    Status code, headers and body pass through as-is; the body is never parsed.
+    The worker gets the remaining deadline and the gateway stops waiting once it
+    is spent.
+    By default the incoming query string and body are forwarded. Requests for a
+    session always go to the same replica so its worker-side state stays warm.
+    """
+    started = time.monotonic()
+    client = get_worker_client()
+    replica = worker_pool.pick(session_id)
+    if params is None:
+        params = request.query_params
+    headers = forward_headers(request.headers)
+    headers.pop("content-length", None)
+    if json is None and content is None and method not in ("GET", "HEAD"):
+        content = await request.body()
+    budget = request_budget(request, started)
+    if budget <= 0:
+        raise HTTPException(status_code=504, detail="Deadline exceeded before reaching the Neo Worker service.")
+    headers.pop(DEADLINE_HEADER.lower(), None)
+    headers[DEADLINE_HEADER] = str(int(budget * 1000))
+    upstream_request = client.build_request(method, f"{replica}{path}", params=params, headers=headers,
+                                            content=content, json=json,
+                                            timeout=httpx.Timeout(budget, connect=min(budget, WORKER_CONNECT_TIMEOUT)))
+    try:
+        with stage("upstream"):
+            upstream = await client.send(upstream_request, stream=True)
+    except httpx.TimeoutException as e:
+        raise HTTPException(status_code=504, detail=f"Neo Worker service timed out: {e}")
+    except httpx.RequestError as e:
+        worker_pool.mark_failure(replica, str(e) or type(e).__name__)
+        raise HTTPException(status_code=503, detail=f"Cannot connect to Neo Worker service: {e}")
+    worker_pool.mark_success(replica)
+
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        headers=forward_headers(upstream.headers),
+        background=BackgroundTask(upstream.aclose),
+    )
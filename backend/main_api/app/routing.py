@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import itertools
+import os
+import time
+from bisect import bisect
+
+# Comma-separated worker replicas; NEO_WORKER_URL is used when only one is configured.
+NEO_WORKER_URLS = [
+    u.strip().rstrip("/")
+    for u in os.getenv("NEO_WORKER_URLS", os.getenv("NEO_WORKER_URL", "http://neo-worker:8001")).split(",")
+    if u.strip()
+]
+RING_VIRTUAL_NODES = int(os.getenv("RING_VIRTUAL_NODES", "128"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "5"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+# Consecutive failed checks (or proxy connection errors) before a replica leaves the ring.
+UNHEALTHY_AFTER = int(os.getenv("UNHEALTHY_AFTER", "2"))
+HEALTH_PATH = "/worker/health"
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes. Removing a node only moves the
+    keys that node owned; everything else stays where it was."""
+
+    def __init__(self, nodes, virtual_nodes: int):
+        points = sorted(
+            (_hash(f"{node}#{i}"), node)
+            for node in nodes
+            for i in range(virtual_nodes)
+        )
+        self._hashes = [h for h, _ in points]
+        self._nodes = [n for _, n in points]
+
+    def __bool__(self):
+        return bool(self._nodes)
+
+    def get(self, key: str):
+        if not self._nodes:
+            return None
+        idx = bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[idx]
+
+
+class Replica:
+    __slots__ = ("url", "healthy", "failures", "checked_at", "last_error")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = True
+        self.failures = 0
+        self.checked_at = None
+        self.last_error = None
+
+
+class WorkerPool:
+    """Routes each session_id to a stable worker replica and tracks replica health."""
+
+    def __init__(self, urls, virtual_nodes: int):
+        self.replicas = {url: Replica(url) for url in urls}
+        self.virtual_nodes = virtual_nodes
+        self._full_ring = HashRing(list(self.replicas), virtual_nodes)
+        self._ring = self._full_ring
+        self._round_robin = itertools.cycle(list(self.replicas))
+        self._task = None
+
+    def _rebuild(self):
+        healthy = [r.url for r in self.replicas.values() if r.healthy]
+        # With every replica down, keep routing over all of them rather than nowhere.
+        self._ring = HashRing(healthy, self.virtual_nodes) if healthy else self._full_ring
+
+    def pick(self, session_id: str = None) -> str:
+        """Replica URL for a session; requests without one are spread round-robin."""
+        if session_id:
+            return self._ring.get(session_id)
+        for _ in range(len(self.replicas)):
+            url = next(self._round_robin)
+            if self.replicas[url].healthy:
+                return url
+        return next(self._round_robin)
+
+    def mark_success(self, url: str):
+        replica = self.replicas.get(url)
+        if replica is None:
+            return
+        replica.failures = 0
+        replica.last_error = None
+        if not replica.healthy:
+            replica.healthy = True
+            print(f"Worker replica {url} is healthy again")
+            self._rebuild()
+
+    def mark_failure(self, url: str, error: str):
+        replica = self.replicas.get(url)
+        if replica is None:
+            return
+        replica.failures += 1
+        replica.last_error = error
+        if replica.healthy and replica.failures >= UNHEALTHY_AFTER:
+            replica.healthy = False
+            print(f"Worker replica {url} removed from routing: {error}")
+            self._rebuild()
+
+    async def check(self, client):
+        async def probe(replica):
+            replica.checked_at = time.time()
+            try:
+                response = await client.get(f"{replica.url}{HEALTH_PATH}", timeout=HEALTH_CHECK_TIMEOUT)
+                if response.status_code == 200:
+                    self.mark_success(replica.url)
+                else:
+                    self.mark_failure(replica.url, f"status {response.status_code}")
+            except Exception as e:
+                self.mark_failure(replica.url, str(e) or type(e).__name__)
+
+        await asyncio.gather(*(probe(r) for r in self.replicas.values()))
+
+    def start(self, client):
+        if self._task is not None or len(self.replicas) < 2:
+            return
+
+        async def loop():
+            while True:
+                await self.check(client)
+                await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+
+        self._task = asyncio.ensure_future(loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self):
+        return [
+            {"url": r.url, "healthy": r.healthy, "failures": r.failures,
+             "checked_at": r.checked_at, "last_error": r.last_error}
+            for r in self.replicas.values()
+        ]
+
+
+worker_pool = WorkerPool(NEO_WORKER_URLS, RING_VIRTUAL_NODES)
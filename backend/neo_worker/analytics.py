@@ -0,0 +1,236 @@
+import numpy as np
+
+
+def _num(value) -> float:
+    """Broker numbers arrive as floats, ints or strings ("1000.00"); blanks are NaN."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def column(rows, field: str, default: float = np.nan):
+    """One field of every row as a float64 array (missing values are NaN)."""
+    values = [row.get(field, default) for row in rows]
+    try:
+        # NumPy parses numeric strings and maps None to NaN in one C-level pass.
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.fromiter((_num(v) for v in values), dtype=np.float64, count=len(values))
+
+
+def quote_prices(quotes, keys):
+    """Live LTP per key from the market feed table, NaN where there is no tick."""
+    if not quotes:
+        return np.full(len(keys), np.nan)
+    return column([quotes.get(k) or {} for k in keys], "ltp")
+
+
+def _rows(payload):
+    rows = payload.get("data") if isinstance(payload, dict) else payload
+    return [row for row in rows or [] if isinstance(row, dict)]
+
+
+def _symbol(value) -> str:
+    """Upper-case symbol without the NSE cash series suffix, for matching."""
+    symbol = str(value or "").upper()
+    return symbol[:-3] if symbol.endswith("-EQ") else symbol
+
+
+def _ratio(numerator, denominator):
+    """Element-wise numerator / denominator with 0 where the denominator is 0."""
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0)
+
+
+def _r(value, digits: int = 2):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+class HoldingsFrame:
+    """Holdings as columns: one float64 array per numeric field, one list of symbols."""
+
+    def __init__(self, symbols, keys, qty, avg, close, ltp):
+        self.symbols = symbols
+        self.keys = keys
+        self.qty = qty
+        self.avg = avg
+        self.close = close
+        # Live prices from the market feed where a tick is available, NaN elsewhere.
+        self.ltp = ltp
+
+    @classmethod
+    def from_payload(cls, payload, quotes=None):
+        rows = _rows(payload)
+        keys = [f"{r.get('exchangeSegment')}|{r.get('instrumentToken')}" for r in rows]
+        return cls(
+            symbols=[_symbol(r.get("displaySymbol") or r.get("instrumentName")) for r in rows],
+            keys=keys,
+            qty=np.nan_to_num(column(rows, "quantity")),
+            avg=np.nan_to_num(column(rows, "averagePrice")),
+            close=column(rows, "closingPrice"),
+            ltp=quote_prices(quotes, keys),
+        )
+
+    def with_row(self, symbol: str, price: float):
+        """A copy with an extra, empty row for an instrument not held yet."""
+        return HoldingsFrame(
+            self.symbols + [_symbol(symbol)], self.keys + [None],
+            np.append(self.qty, 0.0), np.append(self.avg, price),
+            np.append(self.close, np.nan), np.append(self.ltp, price),
+        )
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def index(self, symbol: str):
+        symbol = _symbol(symbol)
+        try:
+            return self.symbols.index(symbol)
+        except ValueError:
+            return None
+
+    @property
+    def price(self):
+        """Mark price: live LTP where known, otherwise the last close, otherwise cost."""
+        price = np.where(np.isnan(self.ltp), self.close, self.ltp)
+        return np.where(np.isnan(price), self.avg, price)
+
+
+def holdings_summary(frame: HoldingsFrame, top: int):
+    """Allocation, P&L, day change and concentration, computed column-wise."""
+    qty, price = frame.qty, frame.price
+    cost = qty * frame.avg
+    value = qty * price
+    pnl = value - cost
+    total_value = value.sum()
+    weights = value / total_value if total_value else np.zeros_like(value)
+    live = ~np.isnan(frame.ltp) & ~np.isnan(frame.close)
+    day_change = np.where(live, qty * (frame.ltp - frame.close), 0.0)
+    previous_value = total_value - day_change.sum()
+    hhi = float(np.square(weights).sum())
+
+    order = np.argsort(-value, kind="stable")[:top]
+    pnl_pct = _ratio(pnl, cost) * 100
+    return {
+        "count": int(np.count_nonzero(qty)),
+        "invested": _r(cost.sum()),
+        "value": _r(total_value),
+        "unrealised": _r(pnl.sum()),
+        "unrealised_pct": _r(pnl.sum() / cost.sum() * 100 if cost.sum() else 0.0),
+        "day_change": _r(day_change.sum()),
+        "day_change_pct": _r(day_change.sum() / previous_value * 100 if previous_value else 0.0),
+        "priced_live": int(live.sum()),
+        "hhi": _r(hhi, 4),
+        "effective_positions": _r(1 / hhi if hhi else 0.0),
+        "top_weight": _r(weights[order].sum() * 100),
+        "top": [
+            {"symbol": frame.symbols[i], "qty": _r(qty[i], 4), "price": _r(price[i]),
+             "value": _r(value[i]), "weight_pct": _r(weights[i] * 100),
+             "unrealised": _r(pnl[i]), "unrealised_pct": _r(pnl_pct[i]),
+             "day_change": _r(day_change[i])}
+            for i in order if qty[i]
+        ],
+    }
+
+
+class PositionsFrame:
+    """Positions as columns, with quantities and amounts summed over the day (fl*)
+    and carried-forward (cf*) legs. The contract multiplier is
+    multiplier * genNum/genDen * prcNum/prcDen."""
+
+    def __init__(self, payload, quotes=None):
+        rows = _rows(payload)
+        nz = np.nan_to_num
+        self.symbols = [_symbol(r.get("trdSym")) for r in rows]
+        buy_qty = nz(column(rows, "flBuyQty")) + nz(column(rows, "cfBuyQty"))
+        sell_qty = nz(column(rows, "flSellQty")) + nz(column(rows, "cfSellQty"))
+        buy_amt = nz(column(rows, "buyAmt")) + nz(column(rows, "cfBuyAmt"))
+        sell_amt = nz(column(rows, "sellAmt")) + nz(column(rows, "cfSellAmt"))
+        multiplier = (column(rows, "multiplier", 1) * column(rows, "genNum", 1) / column(rows, "genDen", 1)
+                      * column(rows, "prcNum", 1) / column(rows, "prcDen", 1))
+        self.multiplier = np.where(np.isnan(multiplier) | (multiplier == 0), 1.0, multiplier)
+
+        # Amounts are already in rupees; prices per unit are amount / (qty * multiplier).
+        avg_buy = _ratio(buy_amt, buy_qty * self.multiplier)
+        avg_sell = _ratio(sell_amt, sell_qty * self.multiplier)
+        self.realised = np.minimum(buy_qty, sell_qty) * (avg_sell - avg_buy) * self.multiplier
+        self.net = buy_qty - sell_qty
+        self.open_avg = np.where(self.net > 0, avg_buy, avg_sell)
+        self.cash_flow = sell_amt - buy_amt
+        self.ltp = quote_prices(quotes, [f"{r.get('exSeg')}|{r.get('tok')}" for r in rows])
+
+    def __len__(self):
+        return len(self.symbols)
+
+
+def positions_summary(payload, quotes=None):
+    """Realised and unrealised P&L of the day's positions.
+    Open quantity is only marked where the market feed has a live price."""
+    frame = PositionsFrame(payload, quotes)
+    if not len(frame):
+        return {"count": 0, "open": 0, "realised": 0.0, "unrealised": 0.0, "unpriced": 0}
+    unrealised = frame.net * (frame.ltp - frame.open_avg) * frame.multiplier
+    is_open = frame.net != 0
+    return {
+        "count": len(frame),
+        "open": int(is_open.sum()),
+        "realised": _r(frame.realised.sum()),
+        "unrealised": _r(np.nansum(np.where(is_open, unrealised, 0.0))),
+        "unpriced": int((is_open & np.isnan(frame.ltp)).sum()),
+    }
+
+
+def available_cash(limits):
+    if not isinstance(limits, dict):
+        return None
+    return _r(_num(limits.get("Net")))
+
+
+def what_if(frame: HoldingsFrame, side: str, symbol: str, qty: float, price, top: int, cash=None):
+    """Effect of a proposed order on the holdings, next to the current state."""
+    if qty <= 0:
+        raise ValueError("qty must be positive.")
+    index = frame.index(symbol)
+    if index is None and side == "S":
+        raise ValueError(f"Cannot sell {symbol}: it is not held.")
+    if price is None:
+        if index is None:
+            raise ValueError(f"{symbol} is not held; pass a price to simulate buying it.")
+        price = float(frame.price[index])
+    after = frame
+    if index is None:
+        after = frame.with_row(symbol, price)
+        index = len(frame)
+    held = float(after.qty[index])
+    if side == "S" and qty > held:
+        raise ValueError(f"Cannot sell {qty:g} {symbol}: only {held:g} held.")
+
+    avg = after.avg.copy()
+    qty_after = after.qty.copy()
+    if side == "B":
+        # A buy moves the average cost; a sell realises P&L against it.
+        avg[index] = (held * avg[index] + qty * price) / (held + qty)
+        qty_after[index] += qty
+    else:
+        qty_after[index] -= qty
+    after = HoldingsFrame(after.symbols, after.keys, qty_after, avg, after.close, after.ltp)
+
+    value_after = qty_after * after.price
+    total_after = value_after.sum()
+    before = holdings_summary(frame, top)
+    summary = holdings_summary(after, top)
+    result = {
+        "side": side, "symbol": _symbol(symbol), "qty": qty, "price": _r(price),
+        "order_value": _r(qty * price),
+        "qty_after": _r(qty_after[index], 4),
+        "weight_after_pct": _r(value_after[index] / total_after * 100 if total_after else 0.0),
+        "value_after": summary["value"],
+        "hhi_before": before["hhi"], "hhi_after": summary["hhi"],
+        "effective_positions_after": summary["effective_positions"],
+    }
+    if side == "S":
+        result["realised"] = _r(qty * (price - frame.avg[index]))
+    if cash is not None:
+        result["cash_after"] = _r(cash - (qty if side == "B" else -qty) * price)
+    return result
@@ -0,0 +1,148 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# The Neo client is fully synchronous, so every broker call runs on this pool
+# instead of the event loop.
+BROKER_MAX_WORKERS = int(os.getenv("BROKER_MAX_WORKERS", "16"))
+BROKER_GLOBAL_CONCURRENCY = int(os.getenv("BROKER_GLOBAL_CONCURRENCY", str(BROKER_MAX_WORKERS)))
+# Three lets a portfolio fan-out (holdings, limits, positions) run fully in parallel.
+BROKER_SESSION_CONCURRENCY = int(os.getenv("BROKER_SESSION_CONCURRENCY", "3"))
+# Scrip master downloads and snapshot file I/O run on their own small pool, so
+# they never take a broker slot from user calls.
+BACKGROUND_MAX_WORKERS = int(os.getenv("BACKGROUND_MAX_WORKERS", "2"))
+
+
+class BrokerExecutor:
+    """Thread pool for blocking broker I/O with global and per-session caps."""
+
+    def __init__(self, max_workers: int, global_limit: int, session_limit: int, name: str = "neo-broker"):
+        self.name = name
+        self.max_workers = max_workers
+        self.global_limit = global_limit
+        self.session_limit = session_limit
+        self._executor = None
+        self._global = asyncio.Semaphore(global_limit)
+        # session_id -> [semaphore, number of callers holding or waiting on it]
+        self._sessions = {}
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        # Calls whose caller gave up while the broker thread kept running.
+        self.abandoned = 0
+        self.abandoned_total = 0
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=self.name,
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _acquire_session(self, session_id: str):
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            entry = [asyncio.Semaphore(self.session_limit), 0]
+            self._sessions[session_id] = entry
+        entry[1] += 1
+        return entry
+
+    def _release_session(self, session_id: str, entry):
+        entry[1] -= 1
+        if entry[1] == 0:
+            self._sessions.pop(session_id, None)
+
+    async def run(self, session_id: str, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) on the broker pool once both caps allow it.
+
+        The slot is held until the broker thread returns, not until the caller
+        stops waiting: a caller that times out or is cancelled leaves the call
+        counted as abandoned, so a hung broker fills the caps (and queue_depth)
+        instead of piling work up unseen in the pool's own queue.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        entry = self._acquire_session(session_id)
+        self.waiting += 1
+        holding_session = False
+        try:
+            await entry[0].acquire()
+            holding_session = True
+            await self._global.acquire()
+        except BaseException:
+            if holding_session:
+                entry[0].release()
+            self._release_session(session_id, entry)
+            raise
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        call = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        state = {"abandoned": False}
+
+        def done(_):
+            # Runs on the broker thread; the bookkeeping belongs to the loop.
+            try:
+                loop.call_soon_threadsafe(self._finish, session_id, entry, call, state)
+            except RuntimeError:
+                pass  # loop closed at shutdown
+
+        call.add_done_callback(done)
+        try:
+            return await asyncio.wrap_future(call)
+        except asyncio.CancelledError:
+            if not call.done():
+                state["abandoned"] = True
+                self.abandoned += 1
+                self.abandoned_total += 1
+            raise
+
+    def _finish(self, session_id: str, entry, call, state):
+        self.in_flight -= 1
+        if state["abandoned"]:
+            self.abandoned -= 1
+        if not call.cancelled():
+            if call.exception() is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+        self._global.release()
+        entry[0].release()
+        self._release_session(session_id, entry)
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "global_limit": self.global_limit,
+            "session_limit": self.session_limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "active_sessions": len(self._sessions),
+            "completed": self.completed,
+            "failed": self.failed,
+            "abandoned": self.abandoned,
+            "abandoned_total": self.abandoned_total,
+        }
+
+
+broker_executor = BrokerExecutor(
+    max_workers=BROKER_MAX_WORKERS,
+    global_limit=BROKER_GLOBAL_CONCURRENCY,
+    session_limit=BROKER_SESSION_CONCURRENCY,
+)
+
+# Keyed by task ("scrip-master", "snapshots"); one of each at a time.
+background_executor = BrokerExecutor(
+    max_workers=BACKGROUND_MAX_WORKERS,
+    global_limit=BACKGROUND_MAX_WORKERS,
+    session_limit=1,
+    name="neo-background",
+)
@@ -0,0 +1,102 @@
+import os
+import time
+from collections import OrderedDict
+
+# Consecutive failures of one broker call before its breaker opens.
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+# Seconds an open breaker fails fast before letting one probe call through.
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+# (call, account) circuits kept; the least recently used is forgotten beyond this.
+BREAKER_CIRCUITS = int(os.getenv("BREAKER_CIRCUITS", "4096"))
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Broker {name} calls are failing; retry in {retry_after:.0f}s.")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive errors -> half-open after
+    `cooldown`, where one probe decides between closed and open again."""
+
+    def __init__(self, name: str, failures: int, cooldown: float):
+        self.name = name
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+
+    def before_call(self):
+        """Raises CircuitOpen unless the call may go to the broker."""
+        if self.state == "closed":
+            return
+        waited = time.monotonic() - self.opened_at
+        if self.state == "open" and waited >= self.cooldown:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return
+        self.rejected += 1
+        raise CircuitOpen(self.name, max(self.cooldown - waited, 1))
+
+    def record_success(self):
+        if self.state != "closed":
+            print(f"Circuit for broker {self.name} closed")
+        self.state = "closed"
+        self.consecutive = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.consecutive += 1
+        if self.state == "half_open" or (self.state == "closed" and self.consecutive >= self.failures):
+            if self.state == "closed":
+                print(f"Circuit for broker {self.name} opened after {self.consecutive} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def record_abandoned(self):
+        """The caller gave up (its own deadline): no verdict on the broker."""
+        self._probing = False
+
+
+class BreakerRegistry:
+    """One breaker per broker call name (holdings, place_order, ...) and account,
+    so one account's failing session does not fail fast the calls of the others."""
+
+    def __init__(self, failures: int, cooldown: float, max_circuits: int):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.max_circuits = max_circuits
+        self._breakers = OrderedDict()
+
+    def get(self, name: str, account: str) -> CircuitBreaker:
+        key = (name, account)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(name, self.failures, self.cooldown)
+        self._breakers.move_to_end(key)
+        while len(self._breakers) > self.max_circuits:
+            self._breakers.popitem(last=False)
+        return breaker
+
+    def is_closed(self, name: str, account: str) -> bool:
+        breaker = self._breakers.get((name, account))
+        return breaker is None or breaker.state == "closed"
+
+    def stats(self):
+        """Per call name: how many accounts' circuits are tracked and not closed."""
+        calls = {}
+        for (name, _), b in self._breakers.items():
+            call = calls.setdefault(name, {"circuits": 0, "open": 0, "rejected": 0})
+            call["circuits"] += 1
+            call["open"] += b.state != "closed"
+            call["rejected"] += b.rejected
+        return calls
+
+
+broker_breakers = BreakerRegistry(BREAKER_FAILURES, BREAKER_COOLDOWN, BREAKER_CIRCUITS)
@@ -0,0 +1,85 @@
+import os
+import time
+from collections import OrderedDict
+
+CLIENT_CACHE_SIZE = int(os.getenv("CLIENT_CACHE_SIZE", "256"))
+CLIENT_CACHE_TTL = float(os.getenv("CLIENT_CACHE_TTL", "900"))
+# Minimum gap between sliding-expiry refreshes (GET + EXPIRE) for one session.
+SESSION_REFRESH_INTERVAL = float(os.getenv("SESSION_REFRESH_INTERVAL", "60"))
+
+
+class CachedClient:
+    __slots__ = ("client", "fingerprint", "created_at", "refreshed_at")
+
+    def __init__(self, client, fingerprint: str, now: float):
+        self.client = client
+        self.fingerprint = fingerprint
+        self.created_at = now
+        self.refreshed_at = now
+
+
+class ClientCache:
+    """Bounded LRU + TTL cache of ready-to-use NeoAPI clients keyed by session id."""
+
+    def __init__(self, max_size: int, ttl: float, refresh_interval: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session_id: str):
+        """Returns the cached entry, or None if it is missing or past its TTL."""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        if time.monotonic() - entry.created_at >= self.ttl:
+            del self._entries[session_id]
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        return entry
+
+    def needs_refresh(self, entry: CachedClient) -> bool:
+        return time.monotonic() - entry.refreshed_at >= self.refresh_interval
+
+    def mark_refreshed(self, entry: CachedClient):
+        entry.refreshed_at = time.monotonic()
+
+    def put(self, session_id: str, client, fingerprint: str) -> CachedClient:
+        entry = CachedClient(client, fingerprint, time.monotonic())
+        self._entries[session_id] = entry
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def invalidate(self, session_id: str):
+        self._entries.pop(session_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "refresh_interval": self.refresh_interval,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+client_cache = ClientCache(
+    max_size=CLIENT_CACHE_SIZE,
+    ttl=CLIENT_CACHE_TTL,
+    refresh_interval=SESSION_REFRESH_INTERVAL,
+)
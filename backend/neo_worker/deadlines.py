@@ -0,0 +1,61 @@
+import math
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.responses import JSONResponse
+
+# Remaining budget of the request in milliseconds, set by the caller and
+# decremented by every hop (MCP server -> gateway -> worker).
+DEADLINE_HEADER = "X-Deadline-Ms"
+# Upper bound for a single broker call, whatever the caller's budget.
+BROKER_CALL_TIMEOUT = float(os.getenv("BROKER_CALL_TIMEOUT", "20"))
+
+_deadline = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The caller's budget ran out before the work could finish."""
+
+
+class BrokerTimeout(Exception):
+    """A broker call took longer than BROKER_CALL_TIMEOUT."""
+
+
+def remaining() -> float:
+    """Seconds left in the current request's budget (inf when none was given)."""
+    deadline = _deadline.get()
+    return math.inf if deadline is None else deadline - time.monotonic()
+
+
+@contextmanager
+def without_deadline():
+    """For background work started by a request that must outlive it."""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def parse_budget(value):
+    """Budget in seconds from an X-Deadline-Ms header value, or None if absent/invalid."""
+    if value is None:
+        return None
+    try:
+        return float(value) / 1000
+    except ValueError:
+        return None
+
+
+async def deadline_middleware(request, call_next):
+    """Starts the request's deadline clock from X-Deadline-Ms; a spent budget gets 504."""
+    budget = parse_budget(request.headers.get(DEADLINE_HEADER))
+    if budget is not None and budget <= 0:
+        return JSONResponse({"detail": "Deadline already exceeded."}, status_code=504)
+    token = _deadline.set(None if budget is None else time.monotonic() + budget)
+    try:
+        return await call_next(request)
+    finally:
+        _deadline.reset(token)
@@ -0,0 +1,335 @@
+import asyncio
+import csv
+import datetime
+import difflib
+import io
+import os
+import time
+import urllib.request
+from array import array
+from bisect import bisect_left
+
+# Scrip master segments loaded into the index, and where the daily CSVs are kept.
+SCRIP_SEGMENTS = [s.strip() for s in os.getenv("SCRIP_SEGMENTS", "nse_cm,bse_cm,nse_fo").split(",") if s.strip()]
+SCRIP_CACHE_DIR = os.getenv("SCRIP_CACHE_DIR", "/tmp/scrip_master")
+SCRIP_DOWNLOAD_TIMEOUT = float(os.getenv("SCRIP_DOWNLOAD_TIMEOUT", "60"))
+# Seconds before a failed or empty index build is tried again.
+INSTRUMENT_RETRY_INTERVAL = float(os.getenv("INSTRUMENT_RETRY_INTERVAL", "600"))
+
+# Segment tried first when a lookup does not name one.
+SEGMENT_PREFERENCE = ["nse_cm", "bse_cm", "nse_fo", "bse_fo", "cde_fo", "mcx_fo"]
+
+# Scrip master CSV columns (the file headers carry stray whitespace, so they are stripped).
+COL_TOKEN = "pSymbol"
+COL_SEGMENT = "pExchSeg"
+COL_TRADING_SYMBOL = "pTrdSymbol"
+COL_NAME = "pSymbolName"
+COL_INSTRUMENT_TYPE = "pInstType"
+COL_LOT_SIZE = "lLotSize"
+
+
+class UnknownInstrument(ValueError):
+    pass
+
+
+def _to_int(value, default=0):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+class InstrumentIndex:
+    """Read-only, array-backed index over the broker scrip master.
+
+    Rows are stored column-wise: tokens and lot sizes in typed arrays, segment
+    and instrument type as small integer codes, and symbols/names as plain
+    string lists. Exact lookups go through one dict, prefix searches bisect a
+    sorted symbol list.
+    """
+
+    def __init__(self, as_of=None):
+        self.as_of = as_of
+        self.tokens = array("q")
+        self.lot_sizes = array("i")
+        self.segment_codes = array("B")
+        self.type_codes = array("B")
+        self.symbols = []
+        self.names = []
+        self.segments = []
+        self.instrument_types = []
+        self._segment_ids = {}
+        self._type_ids = {}
+        # "segment|SYMBOL" -> row
+        self._by_key = {}
+        self._sorted_symbols = []
+        self._sorted_rows = array("I")
+        self._base_symbols = []
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def _code(self, values: list, ids: dict, value: str) -> int:
+        code = ids.get(value)
+        if code is None:
+            code = ids[value] = len(values)
+            values.append(value)
+        return code
+
+    def add_rows(self, reader):
+        for raw in reader:
+            row = {(k or "").strip(): (v or "").strip() for k, v in raw.items()}
+            symbol = row.get(COL_TRADING_SYMBOL, "").upper()
+            segment = row.get(COL_SEGMENT, "").lower()
+            if not symbol or not segment:
+                continue
+            idx = len(self.symbols)
+            self.symbols.append(symbol)
+            self.names.append(row.get(COL_NAME, ""))
+            self.tokens.append(_to_int(row.get(COL_TOKEN)))
+            self.lot_sizes.append(_to_int(row.get(COL_LOT_SIZE), 1))
+            self.segment_codes.append(self._code(self.segments, self._segment_ids, segment))
+            self.type_codes.append(self._code(self.instrument_types, self._type_ids, row.get(COL_INSTRUMENT_TYPE, "")))
+            self._by_key.setdefault(f"{segment}|{symbol}", idx)
+
+    def finalize(self):
+        order = sorted(range(len(self.symbols)), key=self.symbols.__getitem__)
+        self._sorted_symbols = [self.symbols[i] for i in order]
+        self._sorted_rows = array("I", order)
+        self._base_symbols = sorted({s.split("-")[0] for s in self.symbols})
+        return self
+
+    def row(self, idx: int) -> dict:
+        return {
+            "trading_symbol": self.symbols[idx],
+            "name": self.names[idx],
+            "token": self.tokens[idx],
+            "exchange_segment": self.segments[self.segment_codes[idx]],
+            "instrument_type": self.instrument_types[self.type_codes[idx]],
+            "lot_size": self.lot_sizes[idx],
+        }
+
+    def find(self, symbol: str, segment: str = None):
+        """Row index for a trading symbol, or None. Bare NSE/BSE equity symbols
+        also match their -EQ series."""
+        symbol = symbol.upper()
+        segments = [segment.lower()] if segment else SEGMENT_PREFERENCE + self.segments
+        for seg in segments:
+            idx = self._by_key.get(f"{seg}|{symbol}")
+            if idx is None and "-" not in symbol:
+                idx = self._by_key.get(f"{seg}|{symbol}-EQ")
+            if idx is not None:
+                return idx
+        return None
+
+    def lookup(self, symbol: str, segment: str = None):
+        idx = self.find(symbol, segment)
+        return None if idx is None else self.row(idx)
+
+    def _matches(self, idx: int, segment: str) -> bool:
+        return segment is None or self.segments[self.segment_codes[idx]] == segment
+
+    def search(self, query: str, segment: str = None, limit: int = 10):
+        """Exact, then prefix, then substring (symbol or name), then fuzzy matches."""
+        query = query.strip().upper()
+        segment = segment.lower() if segment else None
+        if not query:
+            return []
+        seen = []
+
+        def take(idx):
+            if idx not in seen and self._matches(idx, segment):
+                seen.append(idx)
+            return len(seen) >= limit
+
+        exact = self.find(query, segment)
+        if exact is not None and take(exact):
+            return [self.row(i) for i in seen]
+
+        pos = bisect_left(self._sorted_symbols, query)
+        while pos < len(self._sorted_symbols) and self._sorted_symbols[pos].startswith(query):
+            if take(self._sorted_rows[pos]):
+                return [self.row(i) for i in seen]
+            pos += 1
+
+        for idx, (symbol, name) in enumerate(zip(self.symbols, self.names)):
+            if query in symbol or query in name.upper():
+                if take(idx):
+                    return [self.row(i) for i in seen]
+
+        for base in difflib.get_close_matches(query, self._base_symbols, n=limit, cutoff=0.7):
+            pos = bisect_left(self._sorted_symbols, base)
+            while pos < len(self._sorted_symbols) and self._sorted_symbols[pos].startswith(base):
+                if take(self._sorted_rows[pos]):
+                    break
+                pos += 1
+            if len(seen) >= limit:
+                break
+        return [self.row(i) for i in seen]
+
+
+def _cache_path(day: datetime.date, segment: str) -> str:
+    return os.path.join(SCRIP_CACHE_DIR, f"{day.isoformat()}_{segment}.csv")
+
+
+def _segment_urls(scrip_master_response) -> dict:
+    """Maps segment -> CSV URL from a NeoAPI.scrip_master() response."""
+    paths = scrip_master_response
+    if isinstance(paths, dict):
+        paths = paths.get("data", paths)
+        paths = paths.get("filesPaths", paths) if isinstance(paths, dict) else paths
+    if isinstance(paths, str):
+        paths = [paths]
+    urls = {}
+    for url in paths or []:
+        if isinstance(url, str) and url.endswith(".csv"):
+            segment = url.rsplit("/", 1)[-1][:-4].lower()
+            urls[segment] = url
+    return urls
+
+
+def download_scrip_master(client, day: datetime.date):
+    """Downloads today's scrip master CSVs into SCRIP_CACHE_DIR (blocking)."""
+    os.makedirs(SCRIP_CACHE_DIR, exist_ok=True)
+    missing = [seg for seg in SCRIP_SEGMENTS if not os.path.exists(_cache_path(day, seg))]
+    if not missing:
+        return
+    urls = _segment_urls(client.scrip_master())
+    for segment in missing:
+        url = urls.get(segment)
+        if url is None:
+            print(f"Scrip master has no file for segment {segment}")
+            continue
+        tmp = _cache_path(day, segment) + ".part"
+        with urllib.request.urlopen(url, timeout=SCRIP_DOWNLOAD_TIMEOUT) as response, open(tmp, "wb") as f:
+            while chunk := response.read(1 << 20):
+                f.write(chunk)
+        os.replace(tmp, _cache_path(day, segment))
+
+
+def build_index(day: datetime.date) -> InstrumentIndex:
+    """Builds the index from the cached CSVs for the given day (blocking)."""
+    index = InstrumentIndex(as_of=day)
+    for segment in SCRIP_SEGMENTS:
+        path = _cache_path(day, segment)
+        if not os.path.exists(path):
+            continue
+        with io.open(path, newline="", encoding="utf-8", errors="replace") as f:
+            index.add_rows(csv.DictReader(f))
+    return index.finalize()
+
+
+def prune_cache(day: datetime.date):
+    if not os.path.isdir(SCRIP_CACHE_DIR):
+        return
+    prefix = day.isoformat()
+    for name in os.listdir(SCRIP_CACHE_DIR):
+        if name.endswith(".csv") and not name.startswith(prefix):
+            os.remove(os.path.join(SCRIP_CACHE_DIR, name))
+
+
+class InstrumentStore:
+    """Holds the current index and rebuilds it once per calendar day.
+
+    A build that fails or finds no instruments is not retried for retry_interval
+    seconds, so order traffic does not re-download the scrip master each time.
+    """
+
+    def __init__(self, retry_interval: float):
+        self.retry_interval = retry_interval
+        self.index = None
+        self._loading = None
+        self._failed_at = None
+        self._last_error = None
+        self.attempts = 0
+        self.failures = 0
+
+    def ready(self) -> bool:
+        index = self.index
+        return index is not None and len(index) > 0 and index.as_of == datetime.date.today()
+
+    def backing_off(self) -> bool:
+        return self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_interval
+
+    async def ensure_loaded(self, run_blocking, client=None):
+        """Returns today's index, building it if needed. run_blocking(fn, *args)
+        runs blocking work off the event loop. Concurrent callers share one build."""
+        if self.ready():
+            return self.index
+        if self._loading is None and self.backing_off():
+            if self.index is None:
+                raise RuntimeError(f"last build failed ({self._last_error}); retrying later")
+            return self.index
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load(run_blocking, client))
+        try:
+            return await asyncio.shield(self._loading)
+        finally:
+            if self._loading is not None and self._loading.done():
+                self._loading = None
+
+    def refresh_in_background(self, run_blocking, client=None):
+        """Starts a rebuild without waiting for it; failures are only logged."""
+        if self.ready() or self._loading is not None or self.backing_off():
+            return
+
+        async def refresh():
+            try:
+                await self.ensure_loaded(run_blocking, client)
+            except Exception as e:
+                print(f"Instrument index refresh failed: {e}")
+
+        asyncio.ensure_future(refresh())
+
+    async def _load(self, run_blocking, client):
+        self.attempts += 1
+        try:
+            index = await self._build(run_blocking, client)
+        except Exception as e:
+            self._failed(e)
+            raise
+        if len(index):
+            self._failed_at = self._last_error = None
+        else:
+            self._failed("no instruments")
+        return self.index
+
+    def _failed(self, error):
+        self.failures += 1
+        self._failed_at = time.monotonic()
+        self._last_error = error
+
+    async def _build(self, run_blocking, client):
+        day = datetime.date.today()
+        if client is not None:
+            await run_blocking(download_scrip_master, client, day)
+        index = await run_blocking(build_index, day)
+        if len(index) or self.index is None:
+            self.index = index
+        await run_blocking(prune_cache, day)
+        print(f"Instrument index loaded: {len(index)} instruments for {day}")
+        return index
+
+    def check(self, symbol: str, segment: str):
+        """Raises UnknownInstrument if the index is loaded and the symbol is not in it."""
+        if self.index is None or not len(self.index):
+            return None
+        row = self.index.lookup(symbol, segment)
+        if row is None:
+            raise UnknownInstrument(f"Unknown instrument {symbol} on {segment}.")
+        return row
+
+    def stats(self):
+        index = self.index
+        return {
+            "loaded": index is not None,
+            "as_of": index.as_of.isoformat() if index is not None else None,
+            "instruments": len(index) if index is not None else 0,
+            "segments": list(index.segments) if index is not None else [],
+            "attempts": self.attempts,
+            "failures": self.failures,
+            "backing_off": self.backing_off(),
+        }
+
+
+instrument_store = InstrumentStore(retry_interval=INSTRUMENT_RETRY_INTERVAL)
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+import time
+
+# At most this many broker websockets are opened, whatever the number of sessions.
+MARKET_FEED_MAX_SOCKETS = int(os.getenv("MARKET_FEED_MAX_SOCKETS", "4"))
+# Per-consumer SSE buffer; the oldest tick is dropped when a slow consumer falls behind.
+MARKET_FEED_QUEUE_SIZE = int(os.getenv("MARKET_FEED_QUEUE_SIZE", "256"))
+# How long a quote read waits for the first tick of a newly subscribed instrument.
+QUOTE_FIRST_TICK_WAIT = float(os.getenv("QUOTE_FIRST_TICK_WAIT", "2"))
+
+
+def quote_key(exchange_segment: str, token) -> str:
+    return f"{exchange_segment}|{token}"
+
+
+class SessionFeed:
+    __slots__ = ("session_id", "client", "keys", "opened_at")
+
+    def __init__(self, session_id: str, client):
+        self.session_id = session_id
+        self.client = client
+        self.keys = set()
+        self.opened_at = time.time()
+
+
+class MarketFeed:
+    """Latest-quote table fed by the Neo websocket.
+
+    Each instrument is subscribed once, on one session's socket, no matter how
+    many sessions or consumers ask for it. Ticks arrive on the websocket thread
+    and are handed to the event loop, where they are merged into the table and
+    fanned out to SSE consumers.
+    """
+
+    def __init__(self, max_sockets: int, queue_size: int):
+        self.max_sockets = max_sockets
+        self.queue_size = queue_size
+        # "segment|token" -> latest merged tick
+        self.quotes = {}
+        self._feeds = {}
+        # "segment|token" -> session_id whose socket carries it
+        self._owner = {}
+        # queue -> set of keys it wants
+        self._streams = {}
+        self._loop = None
+        self._tick = asyncio.Event()
+        self.ticks = 0
+        self.dropped = 0
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    def stop(self):
+        for feed in list(self._feeds.values()):
+            self._close_feed(feed.session_id)
+
+    # ---- websocket callbacks (websocket thread) ----
+
+    def _attach(self, feed: SessionFeed):
+        loop = self._loop
+        session_id = feed.session_id
+        feed.client.on_message = lambda message: loop.call_soon_threadsafe(self._on_message, message)
+        feed.client.on_error = lambda error: print(f"Market feed error ({session_id}): {error}")
+        feed.client.on_close = lambda *args: loop.call_soon_threadsafe(self._close_feed, session_id)
+        feed.client.on_open = lambda *args: print(f"Market feed opened ({session_id})")
+
+    # ---- event loop side ----
+
+    def _on_message(self, message):
+        if isinstance(message, (str, bytes)):
+            try:
+                message = json.loads(message)
+            except ValueError:
+                return
+        if isinstance(message, dict):
+            message = message.get("data", [message])
+        if not isinstance(message, list):
+            return
+        now = time.time()
+        for item in message:
+            if not isinstance(item, dict) or "tk" not in item:
+                continue
+            key = quote_key(item.get("e", ""), item["tk"])
+            quote = self.quotes.get(key)
+            if quote is None:
+                quote = self.quotes[key] = {"exchange_segment": item.get("e", ""), "token": str(item["tk"])}
+            quote.update(item)
+            quote["updated_at"] = now
+            self.ticks += 1
+            for queue, keys in self._streams.items():
+                if key in keys:
+                    if queue.full():
+                        queue.get_nowait()
+                        self.dropped += 1
+                    queue.put_nowait(quote.copy())
+        self._tick.set()
+        self._tick = asyncio.Event()
+
+    def _close_feed(self, session_id: str):
+        """Forgets a closed socket so its instruments are re-subscribed on next use."""
+        feed = self._feeds.pop(session_id, None)
+        if feed is None:
+            return
+        for key in feed.keys:
+            if self._owner.get(key) == session_id:
+                del self._owner[key]
+        print(f"Market feed closed ({session_id})")
+
+    def _feed_for(self, session_id: str, client) -> SessionFeed:
+        feed = self._feeds.get(session_id)
+        if feed is not None:
+            return feed
+        if len(self._feeds) >= self.max_sockets:
+            # Market data is the same for every account: reuse the least loaded socket.
+            return min(self._feeds.values(), key=lambda f: len(f.keys))
+        feed = self._feeds[session_id] = SessionFeed(session_id, client)
+        self._attach(feed)
+        return feed
+
+    async def subscribe(self, session_id: str, client, instruments, run_blocking):
+        """Subscribes (exchange_segment, token) pairs not already carried by a socket.
+        run_blocking(session_id, fn, **kwargs) runs the blocking subscribe call."""
+        if self._loop is None:
+            self.start()
+        new = []
+        for segment, token in instruments:
+            key = quote_key(segment, token)
+            if key not in self._owner and (segment, token) not in new:
+                new.append((segment, token))
+        if not new:
+            return
+
+        feed = self._feed_for(session_id, client)
+        keys = [quote_key(segment, token) for segment, token in new]
+        for key in keys:
+            self._owner[key] = feed.session_id
+            feed.keys.add(key)
+        try:
+            await run_blocking(
+                feed.session_id,
+                feed.client.subscribe,
+                instrument_tokens=[{"instrument_token": str(token), "exchange_segment": segment}
+                                   for segment, token in new],
+                isIndex=False,
+                isDepth=False,
+            )
+        except Exception:
+            for key in keys:
+                self._owner.pop(key, None)
+                feed.keys.discard(key)
+            raise
+
+    async def wait_for(self, keys, timeout: float):
+        """Waits until every key has a quote or the timeout passes."""
+        deadline = time.monotonic() + timeout
+        while any(key not in self.quotes for key in keys):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._tick.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+
+    def get(self, key: str):
+        quote = self.quotes.get(key)
+        if quote is None:
+            return None
+        quote = quote.copy()
+        quote["age"] = round(time.time() - quote["updated_at"], 3)
+        return quote
+
+    def open_stream(self, keys) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._streams[queue] = set(keys)
+        return queue
+
+    def close_stream(self, queue: asyncio.Queue):
+        self._streams.pop(queue, None)
+
+    def stats(self):
+        return {
+            "sockets": len(self._feeds),
+            "max_sockets": self.max_sockets,
+            "subscribed": len(self._owner),
+            "quotes": len(self.quotes),
+            "streams": len(self._streams),
+            "ticks": self.ticks,
+            "dropped": self.dropped,
+        }
+
+
+market_feed = MarketFeed(max_sockets=MARKET_FEED_MAX_SOCKETS, queue_size=MARKET_FEED_QUEUE_SIZE)
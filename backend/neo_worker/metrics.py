@@ -0,0 +1,145 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_SECONDS = Histogram(
+    "neo_worker_request_seconds", "HTTP request latency by route.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "neo_worker_stage_seconds", "Latency of individual request stages.",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge("neo_worker_requests_in_flight", "HTTP requests currently being served.")
+BROKER_ERRORS = Counter(
+    "neo_worker_broker_errors_total", "Failed broker calls by call and exception type.",
+    ["call", "error"],
+)
+BROKER_HEDGES = Counter(
+    "neo_worker_broker_hedges_total", "Hedged broker reads by call and which request answered first.",
+    ["call", "winner"],
+)
+
+# Stage timings of the current request, echoed back in the Server-Timing header.
+_request_stages = ContextVar("request_stages", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Times a block as one request stage (histogram + Server-Timing entry)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((name, elapsed))
+
+
+def server_timing(stages, total: float) -> str:
+    # Repeated stages (e.g. three broker calls in a portfolio read) are summed.
+    merged = {}
+    for name, elapsed in stages:
+        merged[name] = merged.get(name, 0.0) + elapsed
+    parts = [f"{name};dur={elapsed * 1000:.2f}" for name, elapsed in merged.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+async def metrics_middleware(request, call_next):
+    """Records per-route latency and in-flight count and sets Server-Timing."""
+    token = _request_stages.set([])
+    REQUESTS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["Server-Timing"] = server_timing(_request_stages.get(), time.perf_counter() - started)
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_SECONDS.labels(
+            request.method, getattr(route, "path", "unmatched"), str(status)
+        ).observe(time.perf_counter() - started)
+        REQUESTS_IN_FLIGHT.dec()
+        _request_stages.reset(token)
+
+
+class StatsCollector:
+    """Exposes the counters kept by the worker's caches and pools at scrape time."""
+
+    def __init__(self, sources):
+        # name -> callable returning a stats dict
+        self.sources = sources
+
+    def collect(self):
+        stats = {name: source() for name, source in self.sources.items()}
+
+        lookups = CounterMetricFamily("neo_worker_cache_lookups", "Cache lookups by cache and result.",
+                                      labels=["cache", "result"])
+        for cache in ("clients", "reads"):
+            s = stats.get(cache)
+            if s is None:
+                continue
+            for result in ("hits", "misses", "coalesced"):
+                if result in s:
+                    lookups.add_metric([cache, result], s[result])
+        yield lookups
+
+        size = GaugeMetricFamily("neo_worker_cache_entries", "Entries held per cache.", labels=["cache"])
+        for cache in ("clients", "reads"):
+            if cache in stats:
+                size.add_metric([cache], stats[cache]["size"])
+        yield size
+
+        broker = stats.get("broker")
+        if broker is not None:
+            yield GaugeMetricFamily("neo_worker_broker_in_flight", "Broker calls running on the pool.",
+                                    value=broker["in_flight"])
+            yield GaugeMetricFamily("neo_worker_broker_queue_depth", "Broker calls waiting for a slot.",
+                                    value=broker["queue_depth"])
+            yield GaugeMetricFamily("neo_worker_broker_abandoned", "Broker calls still running after their caller gave up.",
+                                    value=broker["abandoned"])
+
+        rate = stats.get("rate_limits")
+        if rate is not None:
+            yield GaugeMetricFamily("neo_worker_rate_queue_depth", "Callers waiting for broker rate budget.",
+                                    value=rate["queue_depth"])
+            rejected = CounterMetricFamily("neo_worker_rate_rejected", "Calls turned away by the rate scheduler.",
+                                           labels=["kind"])
+            for kind, count in rate["rejected"].items():
+                rejected.add_metric([kind], count)
+            yield rejected
+
+        breakers = stats.get("breakers")
+        if breakers is not None:
+            state = GaugeMetricFamily("neo_worker_breaker_open", "Accounts whose circuit for a broker call is not closed.",
+                                      labels=["call"])
+            for name, b in breakers.items():
+                state.add_metric([name], b["open"])
+            yield state
+
+        pre_trade = stats.get("pre_trade")
+        if pre_trade is not None:
+            rejected = CounterMetricFamily("neo_worker_pre_trade_rejected",
+                                           "Orders rejected locally by the pre-trade check.", labels=["check"])
+            for check, count in pre_trade["rejected"].items():
+                rejected.add_metric([check], count)
+            yield rejected
+
+
+def register_stats(sources: dict):
+    REGISTRY.register(StatsCollector(sources))
+
+
+def render_metrics():
+    """Returns (body, content type) for the /metrics endpoint."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,67 +1,147 @@
-from fastapi import FastAPI, HTTPException
-import redis.asyncio as aioredis
+from fastapi import FastAPI, Header, HTTPException
 import json
+import asyncio
 from fastapi import HTTPException
 from neo_api_client import NeoAPI
 from pydantic import BaseModel, Field
 import uuid
+import datetime
+import math
+import os
+import time
+from typing import List, Literal, Optional
+from broker_executor import broker_executor, background_executor
+from client_cache import client_cache
+from read_cache import read_cache
+from rate_limiter import broker_scheduler, RateLimitExceeded
+from instruments import instrument_store, UnknownInstrument
+from market_feed import market_feed, quote_key, QUOTE_FIRST_TICK_WAIT
+from order_book import order_book
+from read_versions import read_versions, diff, content_version
+from analytics import HoldingsFrame, holdings_summary, positions_summary, available_cash, what_if
+from snapshot_store import snapshot_store, account_key, KINDS as SNAPSHOT_KINDS
+from pre_trade import pre_trade, PreTradeRejected, broker_error
+from session_store import session_store, create_redis_client, decode_session
+from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, Response
+from metrics import stage, metrics_middleware, register_stats, render_metrics, BROKER_ERRORS, BROKER_HEDGES
+from deadlines import deadline_middleware, remaining, without_deadline, DeadlineExceeded, BrokerTimeout, BROKER_CALL_TIMEOUT
+from circuit_breaker import broker_breakers, CircuitOpen
+try:
+    # orjson serializes broker payloads several times faster than the stdlib encoder.
+    import orjson
+except ImportError:
+    orjson = None
 
-EIGHTEEN_HOURS_IN_SECONDS = 18 * 60 * 60
+class DefaultResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        with stage("serialize"):
+            if orjson is None:
+                return super().render(content)
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+def dumps(obj) -> str:
+    if orjson is None:
+        return json.dumps(obj)
+    return orjson.dumps(obj).decode()
 
 redis_connection = None
 
-def create_redis_client():
-    """Returns a client object, but does NOT connect yet."""
-    return aioredis.Redis(
-        host='redis', 
-        port=6379, 
-        db=0, 
-        decode_responses=True
+def build_client(session_data: dict):
+    """Builds a NeoAPI client from the session data stored in Redis."""
+    # 1. Initialize Client with the final TRADING_TOKEN
+    client = NeoAPI(
+        environment=session_data.get("environment"),
+        # The TRADING_TOKEN (from totp_validate) is the one required for trading access.
+        access_token=session_data.get("TRADING_TOKEN"), 
+        neo_fin_key=session_data.get("neo_fin_key"),
+        consumer_key=session_data.get("consumer_key"),
     )
+    
+    # 2. CRITICAL STEP: Manually set the TRADING_SID and BASE_URL
+    # The NeoAPI client needs the TRADING_SID/BASE_URL headers for trading endpoints.
+    
+    # The TRADING_TOKEN from totp_validate is often stored as the internal 'edit_token'
+    # The TRADING_SID from totp_validate is often stored as the internal 'edit_sid'
+    client.configuration.edit_token = session_data.get("TRADING_TOKEN") 
+    client.configuration.edit_sid = session_data.get("TRADING_SID") 
+    client.configuration.base_url = session_data.get("BASE_URL")
+    
+    # 3. Handle potential property name mismatch (if client uses 'bearer_token' internally)
+    # Check if the NeoAPI client needs the TRADING_TOKEN stored as 'bearer_token'
+    client.configuration.bearer_token = session_data.get("TRADING_TOKEN")
+    
+    # 4. Broker rate budgets are tracked per consumer_key.
+    client.configuration.consumer_key = session_data.get("consumer_key")
+    
+    return client
 
 async def get_current_client(x_session_id: str):
     
     if not global_redis_client:
         raise HTTPException(status_code=503, detail="Redis service is unavailable.")
     
-    # ... (Redis fetch logic) ...
-    redis_key = f"session:{x_session_id}"
-    session_data_json = await global_redis_client.get(redis_key)
+    # Hot path: a cached client whose session was checked against Redis recently.
+    entry = client_cache.get(x_session_id)
+    if entry is not None and not client_cache.needs_refresh(entry):
+        return entry.client
     
-    # ... (Error handling) ...
+    with stage("redis_session"):
+        session_blob = await session_store.get(x_session_id)
+    return client_from_session(x_session_id, entry, session_blob)
 
-    try:
-        session_data = json.loads(session_data_json)
-        
-        # 1. Initialize Client with the final TRADING_TOKEN
-        client = NeoAPI(
-            environment=session_data.get("environment"),
-            # The TRADING_TOKEN (from totp_validate) is the one required for trading access.
-            access_token=session_data.get("TRADING_TOKEN"), 
-            neo_fin_key=session_data.get("neo_fin_key"),
-            consumer_key=session_data.get("consumer_key"),
-        )
-        
-        # 2. CRITICAL STEP: Manually set the TRADING_SID and BASE_URL
-        # The NeoAPI client needs the TRADING_SID/BASE_URL headers for trading endpoints.
-        
-        # The TRADING_TOKEN from totp_validate is often stored as the internal 'edit_token'
-        # The TRADING_SID from totp_validate is often stored as the internal 'edit_sid'
-        client.configuration.edit_token = session_data.get("TRADING_TOKEN") 
-        client.configuration.edit_sid = session_data.get("TRADING_SID") 
-        client.configuration.base_url = session_data.get("BASE_URL")
-        
-        # 3. Handle potential property name mismatch (if client uses 'bearer_token' internally)
-        # Check if the NeoAPI client needs the TRADING_TOKEN stored as 'bearer_token'
-        client.configuration.bearer_token = session_data.get("TRADING_TOKEN")
-        
-        await global_redis_client.expire(redis_key, EIGHTEEN_HOURS_IN_SECONDS)
-        
-        return client
+def client_from_session(session_id: str, entry, session_blob):
+    """Turns a stored session into a client, reusing the cached one if the session
+    is unchanged. Raises 401 when the session is missing or expired."""
+    if session_blob is None:
+        client_cache.invalidate(session_id)
+        raise HTTPException(status_code=401, detail="Session not found or expired.")
     
+    # Session unchanged in Redis: keep the cached client.
+    if entry is not None and entry.fingerprint == session_blob:
+        client_cache.mark_refreshed(entry)
+        return entry.client
+
+    try:
+        session_data = decode_session(session_blob)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to recreate client from session: {e}")
+    if session_data is None:
+        client_cache.invalidate(session_id)
+        raise HTTPException(status_code=401, detail="Session not found or expired.")
+    try:
+        with stage("client_build"):
+            client = build_client(session_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to recreate client from session: {e}")
     
+    client_cache.put(session_id, client, session_blob)
+    return client
+
+async def get_current_clients(session_ids):
+    """Resolves many sessions at once: clients still fresh in the cache are reused
+    and the rest are read from Redis in one batch. Returns {session_id: client or
+    HTTPException}."""
+    if not global_redis_client:
+        raise HTTPException(status_code=503, detail="Redis service is unavailable.")
+    
+    resolved, entries = {}, {}
+    for session_id in session_ids:
+        entry = client_cache.get(session_id)
+        if entry is not None and not client_cache.needs_refresh(entry):
+            resolved[session_id] = entry.client
+        else:
+            entries[session_id] = entry
+    if entries:
+        with stage("redis_session"):
+            blobs = await session_store.get_many(entries)
+        for session_id, entry in entries.items():
+            try:
+                resolved[session_id] = client_from_session(session_id, entry, blobs.get(session_id))
+            except HTTPException as e:
+                resolved[session_id] = e
+    return resolved
+    
 class ValidateRequest(BaseModel):
     totp: str = Field(..., min_length=4, max_length=32)
     consumer_key: str
@@ -74,28 +154,257 @@ class ValidateRequest(BaseModel):
 
 global_redis_client = None
 
-app = FastAPI(title="Koatk Neo Worker", version="1.0.0")
+app = FastAPI(title="Koatk Neo Worker", version="1.0.0", default_response_class=DefaultResponse)
+app.middleware("http")(deadline_middleware)
+app.middleware("http")(metrics_middleware)
 
 @app.on_event("startup")
 async def startup_event():
     global global_redis_client
+    broker_executor.start()
+    background_executor.start()
+    market_feed.start()
     try:
         global_redis_client = create_redis_client()
         await global_redis_client.ping()
+        broker_scheduler.attach(global_redis_client)
+        session_store.attach(global_redis_client)
         print("Connection to Redis success")
     except Exception as e:
         print(f"FATAL: could not connect to redis: {e}")
         global_redis_client = None
+    # Load today's scrip master from the local cache if it was downloaded already.
+    instrument_store.refresh_in_background(run_scrip_task)
         
 @app.on_event("shutdown")
 async def shutdown_event():
     global global_redis_client
     if global_redis_client:
         await global_redis_client.close()
+    market_feed.stop()
+    order_book.stop()
+    client_cache.clear()
+    read_cache.clear()
+    read_versions.clear()
+    broker_executor.shutdown()
+    background_executor.shutdown()
 
-@app.get("/worker/holdings/{session_id}")
-async def get_holdings_data(session_id: str):
-    """Fetches holdings using Koatk Neo library (websockets==8.0)."""
+register_stats({
+    "clients": client_cache.stats,
+    "reads": read_cache.stats,
+    "broker": broker_executor.stats,
+    "rate_limits": broker_scheduler.stats,
+    "breakers": broker_breakers.stats,
+    "pre_trade": pre_trade.stats,
+})
+
+@app.get("/worker/health")
+async def health():
+    """Liveness/readiness for the gateway: unhealthy while Redis is unreachable."""
+    if not global_redis_client:
+        raise HTTPException(status_code=503, detail="Redis service is unavailable.")
+    return {"status": "ok", "broker": broker_executor.stats()["in_flight"]}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request/stage latency histograms, cache and pool counters."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/worker/broker/stats")
+async def broker_stats():
+    """Reports broker thread-pool usage, queue depth and rate-limit state."""
+    return {**broker_executor.stats(), "background": background_executor.stats(),
+            "rate_limits": broker_scheduler.stats(),
+            "breakers": broker_breakers.stats(), "orders": order_book.stats(), "pre_trade": pre_trade.stats()}
+
+@app.get("/worker/cache/stats")
+async def cache_stats():
+    """Reports in-process client and read cache usage."""
+    return {"clients": client_cache.stats(), "reads": read_cache.stats(), "versions": read_versions.stats(),
+            "sessions": session_store.stats()}
+
+# Idempotent reads still running after this many seconds get a second, racing
+# request (0 disables hedging).
+BROKER_HEDGE_AFTER = float(os.getenv("BROKER_HEDGE_AFTER", "0"))
+
+# Calls whose error payload answers the request itself (a rejected order) and is
+# passed back to the caller instead of counting as a broker failure.
+ANSWERED_CALLS = {"place_order"}
+
+class BrokerError(Exception):
+    """The broker answered with an error payload instead of data."""
+
+    def __init__(self, name: str, payload):
+        super().__init__(f"Broker {name} returned an error: {payload}")
+        self.payload = payload
+
+async def call_broker(session_id: str, account: str, name: str, fn, *args, **kwargs):
+    """Runs a broker call on the pool, timing it and counting failures by type.
+    Fails fast while the call's circuit is open and gives up when the request
+    deadline or BROKER_CALL_TIMEOUT passes, whichever comes first. An error
+    payload is a failure too (raised as BrokerError), except for ANSWERED_CALLS.
+    Circuits are per call name and account (see rate_key)."""
+    breaker = broker_breakers.get(name, account)
+    breaker.before_call()
+    budget = remaining()
+    if budget <= 0:
+        breaker.record_abandoned()
+        raise DeadlineExceeded(f"Deadline exceeded before calling broker {name}.")
+    limit = min(budget, BROKER_CALL_TIMEOUT)
+    with stage("broker"):
+        try:
+            result = await asyncio.wait_for(broker_executor.run(session_id, fn, *args, **kwargs), limit)
+        except asyncio.TimeoutError:
+            if limit < BROKER_CALL_TIMEOUT:
+                breaker.record_abandoned()
+                raise DeadlineExceeded(f"Deadline exceeded waiting for broker {name}.")
+            breaker.record_failure()
+            BROKER_ERRORS.labels(name, "BrokerTimeout").inc()
+            raise BrokerTimeout(f"Broker {name} did not answer within {BROKER_CALL_TIMEOUT:g}s.")
+        except asyncio.CancelledError:
+            breaker.record_abandoned()
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            BROKER_ERRORS.labels(name, type(e).__name__).inc()
+            raise
+    if name not in ANSWERED_CALLS and broker_error(result):
+        breaker.record_failure()
+        BROKER_ERRORS.labels(name, "BrokerError").inc()
+        raise BrokerError(name, result)
+    breaker.record_success()
+    return result
+
+async def hedged_call(session_id: str, client, name: str, fn):
+    """Calls an idempotent broker read; if it is still running after
+    BROKER_HEDGE_AFTER, sends one more and returns whichever answers first.
+    The hedge needs a free read token and a closed circuit, so it never adds
+    load to an already struggling broker."""
+    account = rate_key(client, session_id)
+    first = asyncio.ensure_future(call_broker(session_id, account, name, fn))
+    if BROKER_HEDGE_AFTER <= 0:
+        return await first
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=BROKER_HEDGE_AFTER)
+        if done or not broker_breakers.is_closed(name, account) or remaining() < BROKER_HEDGE_AFTER:
+            return await first
+        try:
+            await broker_scheduler.acquire(account, "read", max_wait=0)
+        except RateLimitExceeded:
+            return await first
+        second = asyncio.ensure_future(call_broker(session_id, account, name, fn))
+        tasks.add(second)
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        if all(t.exception() is not None for t in done) and pending:
+            done, _ = await asyncio.wait(pending)
+        # Prefer an answer over an error when both calls finished together.
+        winner = min(done, key=lambda t: t.exception() is not None)
+        BROKER_HEDGES.labels(name, "hedge" if winner is second else "original").inc()
+        return winner.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # the losing call's error is not worth a warning
+
+def broker_http_error(e: Exception, action: str) -> HTTPException:
+    """Maps a failed broker call to a status code the caller can act on."""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, RateLimitExceeded):
+        return HTTPException(status_code=429, detail=str(e))
+    if isinstance(e, CircuitOpen):
+        return HTTPException(status_code=503, detail=str(e),
+                             headers={"Retry-After": str(math.ceil(e.retry_after))})
+    if isinstance(e, (DeadlineExceeded, BrokerTimeout)):
+        return HTTPException(status_code=504, detail=str(e))
+    if isinstance(e, UnknownInstrument):
+        return HTTPException(status_code=400, detail=str(e))
+    if isinstance(e, PreTradeRejected):
+        return HTTPException(status_code=422, detail={
+            "message": "Order failed the pre-trade check", "check": e.check, "reason": e.reason,
+        })
+    # Log the error in the worker service's logs
+    print(f"Exception when calling {action}: {e}")
+    return HTTPException(status_code=502, detail=f"Error from Koatk Neo ({action}): {e}")
+
+def rate_key(client, session_id: str) -> str:
+    """Rate budgets are shared by every session of the same consumer_key."""
+    return getattr(client.configuration, "consumer_key", None) or session_id
+
+def parse_fields(fields: Optional[str]):
+    """Splits a comma-separated fields= parameter into a list (None = everything)."""
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()] or None
+
+def project(payload, fields):
+    """Keeps only the requested columns: per row for {"data": [...]} payloads,
+    top-level keys otherwise."""
+    if not fields or not isinstance(payload, dict):
+        return payload
+    rows = payload.get("data")
+    if isinstance(rows, list):
+        projected = {k: v for k, v in payload.items() if k != "data"}
+        projected["data"] = [{f: row.get(f) for f in fields} for row in rows if isinstance(row, dict)]
+        return projected
+    return {f: payload.get(f) for f in fields}
+
+async def cached_read(session_id: str, client, kind: str, refresh: bool = False):
+    """Reads holdings/limits/positions through the per-session read-through cache.
+    Returns (data, cached, age_seconds)."""
+    fetch = getattr(client, kind)
+
+    async def load():
+        with stage("rate_wait"):
+            await broker_scheduler.acquire(rate_key(client, session_id), "read", max_wait=remaining())
+        data = await hedged_call(session_id, client, kind, fetch)
+        pre_trade.observe(session_id, kind, data)
+        if kind in SNAPSHOT_KINDS:
+            # Every fresh broker read feeds the local history (only when it changed).
+            snapshot_store.record_in_background(run_snapshot_task, account_key(rate_key(client, session_id)),
+                                                kind, read_versions.observe(session_id, kind, data), data)
+        return data
+
+    return await read_cache.get(session_id, kind, load, refresh=refresh)
+
+def make_etag(version: str, fields) -> str:
+    """Weak ETag of a read: the payload version plus the requested projection."""
+    if not fields:
+        return f'W/"{version}"'
+    return f'W/"{version}.{content_version(fields)[:8]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 8.8.3.2): the W/ prefix is ignored.
+    strip = lambda tag: tag.strip().removeprefix("W/")
+    return strip(etag) in {strip(tag) for tag in if_none_match.split(",")}
+
+def project_delta(delta: dict, fields):
+    if not fields:
+        return delta
+    projected = dict(delta)
+    if isinstance(delta["changed"], dict):
+        projected["changed"] = {k: v for k, v in delta["changed"].items() if k in fields}
+        projected["removed"] = [k for k in delta["removed"] if k in fields]
+        return projected
+    for part in ("added", "changed"):
+        projected[part] = [{f: row.get(f) for f in fields} for row in delta[part]]
+    return projected
+
+async def versioned_read(session_id: str, kind: str, refresh: bool, fields: Optional[str],
+                         since: Optional[str], if_none_match: Optional[str]):
+    """Serves holdings/limits/positions with a content version.
+
+    Returns 304 when If-None-Match still matches, only the changed rows when
+    since=<version> is known, and the full (projected) payload otherwise.
+    """
     try:
         client = await get_current_client(session_id)
     except HTTPException as e:
@@ -104,16 +413,81 @@ async def get_holdings_data(session_id: str):
         raise HTTPException(status_code=401, detail=f"Cannot get client: {e}")
     
     try:
-        holdings = client.holdings()
-        return {"session_id": session_id, "message": "Holdings fetched", "holdings": holdings}
+        data, cached, age = await cached_read(session_id, client, kind, refresh)
     except Exception as e:
-        # Log the error in the worker service's logs
-        print(f"Exception when calling holdings: {e}")
-        raise HTTPException(status_code=500, detail=f"Error fetching holdings from Koatk Neo: {e}")
+        raise broker_http_error(e, kind)
+    
+    field_list = parse_fields(fields)
+    version = read_versions.observe(session_id, kind, data)
+    etag = make_etag(version, field_list)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    body = {"session_id": session_id, "message": f"{kind.capitalize()} fetched", "version": version,
+            "cached": cached, "age": round(age, 3)}
+    previous = read_versions.since(session_id, kind, since) if since else None
+    if previous is not None:
+        body["since"] = since
+        body["delta"] = True
+        body[kind] = project_delta(diff(kind, previous, data), field_list)
+    else:
+        body["delta"] = False
+        body[kind] = project(data, field_list)
+    return DefaultResponse(body, headers={"ETag": etag})
+
+@app.get("/worker/holdings/{session_id}")
+async def get_holdings_data(session_id: str, refresh: bool = False, fields: Optional[str] = None,
+                            since: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    """Fetches holdings using Koatk Neo library (websockets==8.0).
+    Served from a short-lived cache unless refresh=true.
+    fields= takes a comma-separated list of columns to return.
+    Sends an ETag; If-None-Match gets 304 and since=<version> only the changes."""
+    return await versioned_read(session_id, "holdings", refresh, fields, since, if_none_match)
     
 @app.get("/worker/limits/{session_id}")
-async def get_limits_data(session_id: str):
-    """Fetches limits using Koatk Neo library (websockets==8.0)."""
+async def get_limits_data(session_id: str, refresh: bool = False, fields: Optional[str] = None,
+                          since: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    """Fetches limits using Koatk Neo library (websockets==8.0).
+    Served from a short-lived cache unless refresh=true.
+    fields= takes a comma-separated list of columns to return.
+    Sends an ETag; If-None-Match gets 304 and since=<version> only the changes."""
+    return await versioned_read(session_id, "limits", refresh, fields, since, if_none_match)
+    
+@app.get("/worker/positions/{session_id}")
+async def get_positions_data(session_id: str, refresh: bool = False, fields: Optional[str] = None,
+                             since: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    """Fetches positions using Koatk Neo library (websockets==8.0).
+    Served from a short-lived cache unless refresh=true.
+    fields= takes a comma-separated list of columns to return.
+    Sends an ETag; If-None-Match gets 304 and since=<version> only the changes."""
+    return await versioned_read(session_id, "positions", refresh, fields, since, if_none_match)
+    
+async def run_scrip_task(fn, *args):
+    """Runs scrip master download/parsing on the background pool."""
+    return await background_executor.run("scrip-master", fn, *args)
+
+async def run_snapshot_task(fn, *args):
+    """Runs snapshot file reads and writes on the background pool."""
+    return await background_executor.run("snapshots", fn, *args)
+
+def parse_time(value: str, name: str) -> float:
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO date or datetime.")
+
+@app.get("/worker/history/stats")
+async def history_stats():
+    """Reports the size and retention of the local snapshot store."""
+    return await run_snapshot_task(snapshot_store.stats)
+
+@app.get("/worker/history/{session_id}")
+async def get_portfolio_history(session_id: str, kind: Literal["holdings", "positions"] = "holdings",
+                                days: float = 7, start: Optional[str] = None, end: Optional[str] = None,
+                                symbol: Optional[str] = None, points: int = 30):
+    """Holdings/positions history from the local snapshot store (never the broker).
+    Returns totals per snapshot, or one symbol's rows when symbol= is given,
+    between start/end (ISO) or over the last `days`."""
     try:
         client = await get_current_client(session_id)
     except HTTPException as e:
@@ -121,17 +495,40 @@ async def get_limits_data(session_id: str):
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Cannot get client: {e}")
     
+    end_ts = parse_time(end, "end") if end else time.time()
+    start_ts = parse_time(start, "start") if start else end_ts - days * 86400
+    points = max(2, min(points, 500))
+    try:
+        with stage("history"):
+            return await run_snapshot_task(snapshot_store.query, account_key(rate_key(client, session_id)),
+                                           kind, start_ts, end_ts, symbol, points)
+    except Exception as e:
+        print(f"Exception when reading snapshots: {e}")
+        raise HTTPException(status_code=500, detail=f"Error reading portfolio history: {e}")
+
+@app.get("/worker/instruments/search/{session_id}")
+async def search_instruments(session_id: str, q: str, segment: Optional[str] = None, limit: int = 10):
+    """Searches the local scrip master index by symbol prefix, name or fuzzy match."""
     try:
-        limits = client.limits()
-        return {"session_id": session_id, "message": "Holdings fetched", "limits": limits}
+        client = await get_current_client(session_id)
+    except HTTPException as e:
+        raise e
     except Exception as e:
-        # Log the error in the worker service's logs
-        print(f"Exception when calling limits: {e}")
-        raise HTTPException(status_code=500, detail=f"Error fetching limits from Koatk Neo: {e}")
+        raise HTTPException(status_code=401, detail=f"Cannot get client: {e}")
     
-@app.get("/worker/positions/{session_id}")
-async def get_positions_data(session_id: str):
-    """Fetches positions using Koatk Neo library (websockets==8.0)."""
+    try:
+        index = await instrument_store.ensure_loaded(run_scrip_task, client)
+    except Exception as e:
+        print(f"Exception when loading scrip master: {e}")
+        raise HTTPException(status_code=503, detail=f"Instrument index unavailable: {e}")
+    
+    limit = max(1, min(limit, 50))
+    return {"query": q, "as_of": index.as_of.isoformat(),
+            "results": index.search(q, segment, limit)}
+
+@app.get("/worker/instruments/lookup/{session_id}")
+async def lookup_instrument(session_id: str, symbol: str, segment: Optional[str] = None):
+    """Resolves a trading symbol to its token and segment."""
     try:
         client = await get_current_client(session_id)
     except HTTPException as e:
@@ -140,46 +537,248 @@ async def get_positions_data(session_id: str):
         raise HTTPException(status_code=401, detail=f"Cannot get client: {e}")
     
     try:
-        positions = client.positions()
-        return {"session_id": session_id, "message": "Holdings fetched", "positions": positions}
+        index = await instrument_store.ensure_loaded(run_scrip_task, client)
     except Exception as e:
-        # Log the error in the worker service's logs
-        print(f"Exception when calling positions: {e}")
-        raise HTTPException(status_code=500, detail=f"Error fetching positions from Koatk Neo: {e}")
+        print(f"Exception when loading scrip master: {e}")
+        raise HTTPException(status_code=503, detail=f"Instrument index unavailable: {e}")
     
-from pydantic import BaseModel
+    row = index.lookup(symbol, segment)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Unknown instrument {symbol}.")
+    return row
 
-class BuyOrderRequest(BaseModel):
-    qty: int
-    stock: str
+@app.get("/worker/instruments/stats")
+async def instrument_stats():
+    """Reports the state of the local instrument index."""
+    return instrument_store.stats()
+
+async def subscribe_quotes(session_id: str, symbols: str, segment: Optional[str]):
+    """Resolves comma-separated symbols through the instrument index and makes sure
+    each one is carried by the market feed. Returns (resolved rows, unknown symbols)."""
+    try:
+        client = await get_current_client(session_id)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Cannot get client: {e}")
     
-@app.post("/worker/buy/{session_id}")
-async def buy_order(session_id:str, order_data: BuyOrderRequest):
-    """ Place order to BUY stock for client """
     try:
-        qty = order_data.qty
-        qty = str(qty)
-        stock = order_data.stock
+        index = await instrument_store.ensure_loaded(run_scrip_task, client)
+    except Exception as e:
+        print(f"Exception when loading scrip master: {e}")
+        raise HTTPException(status_code=503, detail=f"Instrument index unavailable: {e}")
+    
+    rows, unknown = [], []
+    for symbol in (s.strip() for s in symbols.split(",")):
+        if not symbol:
+            continue
+        row = index.lookup(symbol, segment)
+        if row is None:
+            unknown.append(symbol)
+        else:
+            rows.append(row)
+    
+    try:
+        await market_feed.subscribe(
+            session_id, client,
+            [(row["exchange_segment"], row["token"]) for row in rows],
+            broker_executor.run,
+        )
+    except Exception as e:
+        print(f"Exception when subscribing to market feed: {e}")
+        raise HTTPException(status_code=502, detail=f"Market feed subscription failed: {e}")
+    return rows, unknown
+
+@app.get("/worker/quotes/{session_id}")
+async def get_quotes(session_id: str, symbols: str, segment: Optional[str] = None):
+    """Latest quotes from the in-memory tick table (no broker round trip once subscribed)."""
+    rows, unknown = await subscribe_quotes(session_id, symbols, segment)
+    keys = [quote_key(row["exchange_segment"], row["token"]) for row in rows]
+    await market_feed.wait_for(keys, QUOTE_FIRST_TICK_WAIT)
+    
+    quotes = {}
+    for row, key in zip(rows, keys):
+        quotes[row["trading_symbol"]] = market_feed.get(key)
+    return {"quotes": quotes, "unknown": unknown}
+
+@app.get("/worker/stream/quotes/{session_id}")
+async def stream_quotes(session_id: str, symbols: str, segment: Optional[str] = None):
+    """Server-sent events stream of ticks for the requested symbols."""
+    rows, unknown = await subscribe_quotes(session_id, symbols, segment)
+    keys = [quote_key(row["exchange_segment"], row["token"]) for row in rows]
+    
+    async def events():
+        queue = market_feed.open_stream(keys)
+        try:
+            for key in keys:
+                quote = market_feed.get(key)
+                if quote is not None:
+                    yield f"data: {dumps(quote)}\n\n"
+            while True:
+                try:
+                    quote = await asyncio.wait_for(queue.get(), 15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {dumps(quote)}\n\n"
+        finally:
+            market_feed.close_stream(queue)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.get("/worker/stream/stats")
+async def stream_stats():
+    """Reports market feed sockets, subscriptions and tick counts."""
+    return market_feed.stats()
+
+# Holdings columns kept in the aggregated portfolio document.
+HOLDINGS_SUMMARY_FIELDS = [
+    "instrumentName", "quantity", "averagePrice",
+    "holdingCost", "closingPrice", "unrealisedGainLoss"
+]
+
+@app.get("/worker/portfolio/{session_id}")
+async def get_portfolio_data(session_id: str, refresh: bool = False,
+                             holdings_fields: Optional[str] = None,
+                             limits_fields: Optional[str] = None,
+                             positions_fields: Optional[str] = None):
+    """Fetches holdings, limits and positions concurrently and merges them.
+    A failing section is reported under "errors" instead of failing the whole call.
+    *_fields take comma-separated column lists (holdings default to the summary columns)."""
+    try:
         client = await get_current_client(session_id)
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Cannot get client: {e}")
+    
+    kinds = ("holdings", "limits", "positions")
+    results = await asyncio.gather(
+        *(cached_read(session_id, client, kind, refresh) for kind in kinds),
+        return_exceptions=True,
+    )
+    
+    portfolio = {"session_id": session_id, "message": "Portfolio fetched",
+                 "versions": {}, "cached": {}, "age": {}, "errors": {}}
+    for kind, result in zip(kinds, results):
+        if isinstance(result, BaseException):
+            print(f"Exception when calling {kind}: {result}")
+            portfolio[kind] = None
+            portfolio["errors"][kind] = str(result)
+            continue
+        data, cached, age = result
+        portfolio[kind] = data
+        portfolio["versions"][kind] = read_versions.observe(session_id, kind, data)
+        portfolio["cached"][kind] = cached
+        portfolio["age"][kind] = round(age, 3)
+    
+    if len(portfolio["errors"]) == len(kinds):
+        error = broker_http_error(results[0], "portfolio")
+        raise HTTPException(status_code=error.status_code, headers=error.headers,
+                            detail=f"Error fetching portfolio from Koatk Neo: {portfolio['errors']}")
+    
+    holdings = project(portfolio["holdings"], parse_fields(holdings_fields) or HOLDINGS_SUMMARY_FIELDS)
+    if isinstance(holdings, dict):
+        portfolio["holdings"] = holdings.get("data") or []
+    portfolio["limits"] = project(portfolio["limits"], parse_fields(limits_fields))
+    portfolio["positions"] = project(portfolio["positions"], parse_fields(positions_fields))
+    return portfolio
+
+ANALYTICS_MAX_TOP = 50
+
+def held_instruments(holdings, positions):
+    """(exchange_segment, token) of every held or open instrument, for the market feed."""
+    instruments = []
+    for payload, segment, token in ((holdings, "exchangeSegment", "instrumentToken"), (positions, "exSeg", "tok")):
+        rows = payload.get("data") if isinstance(payload, dict) else None
+        for row in rows or []:
+            if isinstance(row, dict) and row.get(segment) and row.get(token) is not None:
+                instruments.append((row[segment], row[token]))
+    return instruments
+
+@app.get("/worker/analytics/{session_id}")
+async def get_portfolio_analytics(session_id: str, refresh: bool = False, top: int = 10, live: bool = False,
+                                  side: Optional[Literal["B", "S"]] = None, symbol: Optional[str] = None,
+                                  qty: Optional[float] = None, price: Optional[float] = None):
+    """Allocation, P&L, day change, concentration and top-N exposures computed here,
+    so callers get numbers instead of raw rows. live=true marks holdings at market
+    feed prices (subscribing them if needed); otherwise ticks already in the feed are
+    used and the last close elsewhere. side/symbol/qty[/price] adds a what-if for
+    a proposed order."""
     try:
-        response = client.place_order(
-        exchange_segment="nse_cm",
-        product="CNC",
-        price="0",
-        order_type="MKT",
-        quantity=qty,
-        validity="DAY",
-        trading_symbol= stock + "-EQ",
-        transaction_type="B",
-        amo="YES",
+        client = await get_current_client(session_id)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Cannot get client: {e}")
+    
+    kinds = ("holdings", "positions", "limits")
+    results = await asyncio.gather(
+        *(cached_read(session_id, client, kind, refresh) for kind in kinds),
+        return_exceptions=True,
+    )
+    data, errors = {}, {}
+    for kind, result in zip(kinds, results):
+        if isinstance(result, BaseException):
+            print(f"Exception when calling {kind}: {result}")
+            data[kind] = None
+            errors[kind] = str(result)
+        else:
+            data[kind] = result[0]
+    if "holdings" in errors:
+        raise broker_http_error(results[0], "holdings")
+    
+    if live:
+        instruments = held_instruments(data["holdings"], data["positions"])
+        try:
+            await market_feed.subscribe(session_id, client, instruments, broker_executor.run)
+            await market_feed.wait_for([quote_key(seg, tok) for seg, tok in instruments], QUOTE_FIRST_TICK_WAIT)
+        except Exception as e:
+            print(f"Exception when subscribing to market feed: {e}")
+            errors["live"] = str(e)
+    
+    top = max(1, min(top, ANALYTICS_MAX_TOP))
+    with stage("analytics"):
+        frame = HoldingsFrame.from_payload(data["holdings"], market_feed.quotes)
+        analytics = {
+            "session_id": session_id,
+            "holdings": holdings_summary(frame, top),
+            "positions": positions_summary(data["positions"], market_feed.quotes) if data["positions"] else None,
+            "cash": available_cash(data["limits"]),
+            "errors": errors,
+        }
+        if side and symbol and qty:
+            try:
+                analytics["what_if"] = what_if(frame, side, symbol, qty, price, top, analytics["cash"])
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+    return analytics
+
+from pydantic import BaseModel
+
+def build_order_params(transaction_type: str, qty: int, symbol: str,
+                       exchange_segment: str = "nse_cm", product: str = "CNC",
+                       order_type: str = "MKT", price: str = "0",
+                       trigger_price: str = "0", validity: str = "DAY",
+                       amo: str = "YES"):
+    """Keyword arguments for NeoAPI.place_order. Bare NSE cash symbols get the -EQ series."""
+    if exchange_segment == "nse_cm" and "-" not in symbol:
+        symbol = symbol + "-EQ"
+    return dict(
+        exchange_segment=exchange_segment,
+        product=product,
+        price=price,
+        order_type=order_type,
+        quantity=str(qty),
+        validity=validity,
+        trading_symbol=symbol,
+        transaction_type=transaction_type,
+        amo=amo,
         disclosed_quantity="0",
         market_protection="0",
         pf="N",
-        trigger_price="0",
+        trigger_price=trigger_price,
         tag=None,
         scrip_token=None,
         square_off_type=None,
@@ -189,22 +788,136 @@ async def buy_order(session_id:str, order_data: BuyOrderRequest):
         last_traded_price=None,
         trailing_stop_loss=None,
         trailing_sl_value=None,
-    )   
-        print(response)
-        return response
+    )
+
+def order_rejected(response) -> bool:
+    """True when place_order returned nothing or an error payload."""
+    if not isinstance(response, dict):
+        return response is None
+    return broker_error(response)
+
+def feed_price(instrument):
+    """Last traded price of an instrument index row from the market feed, if streaming."""
+    if not instrument:
+        return None
+    quote = market_feed.quotes.get(quote_key(instrument["exchange_segment"], instrument["token"]))
+    try:
+        return float(quote["ltp"]) if quote and quote.get("ltp") else None
+    except (TypeError, ValueError):
+        return None
+
+async def submit_order(session_id: str, client, params: dict, skip_checks: bool = False):
+    """Places one order on the broker pool, paced by the order rate budget.
+    Symbols missing from the instrument index are rejected before reaching the broker,
+    and so are orders the pre-trade check finds impossible (unless skip_checks)."""
+    instrument_store.refresh_in_background(run_scrip_task, client)
+    instrument = instrument_store.check(params["trading_symbol"], params["exchange_segment"])
+    checked = None
+    if skip_checks:
+        pre_trade.override()
+    else:
+        with stage("pre_trade"):
+            checked = pre_trade.check(session_id, params, instrument, feed_price(instrument))
+    # Held from the check on, so concurrent orders and basket legs count against each other.
+    reservation = pre_trade.reserve(session_id, params, checked["order_value"] if checked else None)
+    try:
+        with stage("rate_wait"):
+            await broker_scheduler.acquire(rate_key(client, session_id), "order", max_wait=remaining())
+        response = await call_broker(session_id, rate_key(client, session_id), "place_order",
+                                     client.place_order, **params)
+    except BaseException:
+        pre_trade.release(session_id, reservation)
+        raise
+    if order_rejected(response) or not response.get("nOrdNo"):
+        pre_trade.release(session_id, reservation)
+    else:
+        pre_trade.confirm(reservation)
+        order_book.track(session_id, response["nOrdNo"], symbol=params["trading_symbol"],
+                         side=params["transaction_type"], qty=params["quantity"])
+        order_book.ensure_poller(session_id, order_report_fetcher(session_id))
+    return response
+
+def order_response(response):
+    """Passes an accepted order through; broker rejections become 422 and an
+    empty broker answer 502, instead of a 200 with no body."""
+    if response is None:
+        raise HTTPException(status_code=502, detail="Koatk Neo returned no response to the order.")
+    if order_rejected(response):
+        raise HTTPException(status_code=422, detail={"message": "Order rejected by Koatk Neo", "response": response})
+    return response
+
+def order_report_fetcher(session_id: str):
+    """Coroutine function the order book poller uses to read the broker order report."""
+    async def fetch():
+        # The poller outlives the request that started it, and its deadline.
+        with without_deadline():
+            client = await get_current_client(session_id)
+            account = rate_key(client, session_id)
+            await broker_scheduler.acquire(account, "read")
+            return await call_broker(session_id, account, "order_report", client.order_report)
+    return fetch
+
+@app.get("/worker/orders/{session_id}")
+async def list_orders(session_id: str):
+    """Orders placed through this worker for the session, as last seen by the poller."""
+    return {"session_id": session_id,
+            "orders": [o.to_dict() for o in order_book.for_session(session_id)]}
+
+@app.get("/worker/orders/{session_id}/{order_id}/wait")
+async def wait_for_order(session_id: str, order_id: str, timeout: float = 30):
+    """Long-polls until the order is final or partly filled, up to timeout seconds."""
+    try:
+        await get_current_client(session_id)
+    except HTTPException as e:
+        raise e
     except Exception as e:
-        print("Exception when calling OrderApi->place_order: %s\n" % e)
+        raise HTTPException(status_code=401, detail=f"Cannot get client: {e}")
+    
+    # Leave a second of the caller's budget to send the answer back.
+    timeout = min(timeout, remaining() - 1)
+    order, changed = await order_book.wait(session_id, order_id, max(timeout, 0),
+                                           order_report_fetcher(session_id))
+    if order is None:
+        raise HTTPException(status_code=404, detail=f"Order {order_id} was not placed through this worker by this session.")
+    return {**order.to_dict(), "changed": changed, "final": order.terminal}
+
+class BuyOrderRequest(BaseModel):
+    qty: int
+    stock: str
+    # Skips the local pre-trade check; the broker still validates the order.
+    skip_checks: bool = False
+    
+@app.post("/worker/buy/{session_id}")
+async def buy_order(session_id:str, order_data: BuyOrderRequest):
+    """ Place order to BUY stock for client """
+    try:
+        qty = order_data.qty
+        stock = order_data.stock
+        client = await get_current_client(session_id)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Cannot get client: {e}")
+    try:
+        response = await submit_order(session_id, client, build_order_params("B", qty, stock),
+                                      skip_checks=order_data.skip_checks)
+    except Exception as e:
+        raise broker_http_error(e, "OrderApi->place_order")
+    print(response)
+    read_cache.invalidate(session_id)
+    return order_response(response)
     
 class SellOrderRequest(BaseModel):
     qty: int
     stock: str
+    # Skips the local pre-trade check; the broker still validates the order.
+    skip_checks: bool = False
     
 @app.post("/worker/sell/{session_id}")
 async def sell_order(session_id:str, order_data: SellOrderRequest):
     """ Place order to SELL stock for client """
     try:
         qty = order_data.qty
-        qty = str(qty)
         stock = order_data.stock
         client = await get_current_client(session_id)
     except HTTPException as e:
@@ -212,35 +925,102 @@ async def sell_order(session_id:str, order_data: SellOrderRequest):
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Cannot get client: {e}")
     try:
-        response = client.place_order(
-        exchange_segment="nse_cm",
-        product="CNC",
-        price="0",
-        order_type="MKT",
-        quantity=qty,
-        validity="DAY",
-        trading_symbol= stock + "-EQ",
-        transaction_type="S",
-        amo="YES",
-        disclosed_quantity="0",
-        market_protection="0",
-        pf="N",
-        trigger_price="0",
-        tag=None,
-        scrip_token=None,
-        square_off_type=None,
-        stop_loss_type=None,
-        stop_loss_value=None,
-        square_off_value=None,
-        last_traded_price=None,
-        trailing_stop_loss=None,
-        trailing_sl_value=None,
-    )   
-        print(response)
-        return response
+        response = await submit_order(session_id, client, build_order_params("S", qty, stock),
+                                      skip_checks=order_data.skip_checks)
+    except Exception as e:
+        raise broker_http_error(e, "OrderApi->place_order")
+    print(response)
+    read_cache.invalidate(session_id)
+    return order_response(response)
+
+MAX_BATCH_LEGS = 50
+
+class OrderLeg(BaseModel):
+    side: Literal["B", "S"]
+    qty: int = Field(..., gt=0)
+    symbol: str
+    exchange_segment: str = "nse_cm"
+    product: str = "CNC"
+    order_type: str = "MKT"
+    price: str = "0"
+    trigger_price: str = "0"
+    validity: str = "DAY"
+    amo: str = "YES"
+    skip_checks: bool = False
+
+class BatchOrderRequest(BaseModel):
+    session_id: str
+    legs: List[OrderLeg] = Field(..., min_length=1, max_length=MAX_BATCH_LEGS)
+
+async def place_leg(session_id: str, client, index: int, leg: OrderLeg):
+    """Places a single basket leg and reports its outcome instead of raising."""
+    result = {"index": index, "side": leg.side, "symbol": leg.symbol, "qty": leg.qty}
+    started = time.perf_counter()
+    try:
+        params = build_order_params(
+            leg.side, leg.qty, leg.symbol,
+            exchange_segment=leg.exchange_segment, product=leg.product,
+            order_type=leg.order_type, price=leg.price,
+            trigger_price=leg.trigger_price, validity=leg.validity, amo=leg.amo,
+        )
+        response = await submit_order(session_id, client, params, skip_checks=leg.skip_checks)
+        result["status"] = "rejected" if order_rejected(response) else "placed"
+        result["order_id"] = response.get("nOrdNo") if isinstance(response, dict) else None
+        result["response"] = response
+    except PreTradeRejected as e:
+        result["status"] = "blocked"
+        result["check"] = e.check
+        result["error"] = e.reason
     except Exception as e:
         print("Exception when calling OrderApi->place_order: %s\n" % e)
+        result["status"] = "error"
+        result["error"] = str(e)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+@app.post("/worker/orders/batch")
+async def place_batch_orders(batch: BatchOrderRequest):
+    """ Place a basket of orders concurrently. Each leg is reported separately,
+    so one failed leg does not abort the rest of the basket. """
+    session_id = batch.session_id
+    try:
+        client = await get_current_client(session_id)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Cannot get client: {e}")
+    
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(place_leg(session_id, client, i, leg) for i, leg in enumerate(batch.legs))
+    )
+    placed = sum(1 for r in results if r["status"] == "placed")
+    if placed:
+        read_cache.invalidate(session_id)
+    return {
+        "session_id": session_id,
+        "message": f"{placed}/{len(results)} orders placed",
+        "placed": placed,
+        "failed": len(results) - placed,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        "legs": results,
+    }
+
 
+MAX_SESSION_LOOKUP = 500
+
+class SessionStatusRequest(BaseModel):
+    session_ids: List[str] = Field(..., min_length=1, max_length=MAX_SESSION_LOOKUP)
+
+@app.post("/worker/sessions/status")
+async def session_status(req: SessionStatusRequest):
+    """ Checks many sessions in one Redis round trip and warms their clients.
+    Each session is reported as "active" or "expired". """
+    resolved = await get_current_clients(req.session_ids)
+    return {"sessions": {
+        session_id: "expired" if isinstance(result, HTTPException) else "active"
+        for session_id, result in resolved.items()
+    }}
 
 @app.post("/worker/validate/")    
 async def validate(req: ValidateRequest):
@@ -258,7 +1038,11 @@ async def validate(req: ValidateRequest):
         
         # --- Step 2a: TOTP Login (Get VIEW_TOKEN) ---
         # The library method is client.totp_login(), which returns the response object.
-        login_response = client.totp_login(
+        login_response = await call_broker(
+            req.consumer_key,
+            req.consumer_key,
+            "totp_login",
+            client.totp_login,
             mobile_number=req.mobile_number, 
             ucc=req.ucc, 
             totp=req.totp
@@ -267,7 +1051,7 @@ async def validate(req: ValidateRequest):
 
         # --- Step 2b: MPIN Validate (Get TRADING_TOKEN) ---
         # The library handles the header construction (Auth, sid) internally based on the view tokens.
-        client.totp_validate(mpin=req.mpin)
+        await call_broker(req.consumer_key, req.consumer_key, "totp_validate", client.totp_validate, mpin=req.mpin)
 
         # --- FINAL TOKEN EXTRACTION FOR REDIS STORAGE ---
         # After totp_validate, the client.configuration should hold the final TRADING tokens.
@@ -294,12 +1078,9 @@ async def validate(req: ValidateRequest):
             "neo_fin_key": config_vars.get('neo_fin_key') or "neotradeapi" # Default if not set
         }
 
-        # 3. Serialize and store in Redis with 12-hour expiration
-        session_data_json = json.dumps(session_data)
+        # 3. Serialize and store in Redis with a sliding SESSION_TTL (18 hours by default)
         session_id = str(uuid.uuid4())
-        redis_key = f"session:{session_id}"
-        
-        await global_redis_client.set(redis_key, session_data_json, ex=EIGHTEEN_HOURS_IN_SECONDS)
+        await session_store.put(session_id, session_data)
 
         return {"session_id": session_id, "message": "Authenticated. Trading session stored in Redis."}
     
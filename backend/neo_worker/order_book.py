@@ -0,0 +1,220 @@
+import asyncio
+import os
+import time
+
+ORDER_POLL_INTERVAL = float(os.getenv("ORDER_POLL_INTERVAL", "1"))
+# Poll interval while a session has open orders but nobody is waiting on them.
+ORDER_IDLE_POLL_INTERVAL = float(os.getenv("ORDER_IDLE_POLL_INTERVAL", "30"))
+# A poller stops after this many failed polls in a row.
+ORDER_POLL_MAX_FAILURES = int(os.getenv("ORDER_POLL_MAX_FAILURES", "5"))
+# Finished orders are forgotten after ORDER_RETENTION seconds, open ones after ORDER_MAX_AGE.
+ORDER_RETENTION = float(os.getenv("ORDER_RETENTION", "3600"))
+ORDER_MAX_AGE = float(os.getenv("ORDER_MAX_AGE", str(24 * 60 * 60)))
+# Kept under the gateway's default 60 s read timeout.
+MAX_WAIT_SECONDS = 55
+
+TERMINAL_STATUSES = {"complete", "rejected", "cancelled"}
+
+
+class TrackedOrder:
+    __slots__ = ("order_id", "session_id", "status", "symbol", "side", "qty",
+                 "filled_qty", "avg_price", "reason", "placed_at", "updated_at", "changed")
+
+    def __init__(self, order_id: str, session_id: str, symbol=None, side=None, qty=None):
+        self.order_id = order_id
+        self.session_id = session_id
+        self.status = "submitted"
+        self.symbol = symbol
+        self.side = side
+        self.qty = qty
+        self.filled_qty = 0
+        self.avg_price = None
+        self.reason = None
+        self.placed_at = time.time()
+        self.updated_at = self.placed_at
+        # Replaced on every status change; waiters block on the current one.
+        self.changed = asyncio.Event()
+
+    @property
+    def terminal(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def to_dict(self):
+        return {
+            "order_id": self.order_id, "status": self.status, "symbol": self.symbol,
+            "side": self.side, "qty": self.qty, "filled_qty": self.filled_qty,
+            "avg_price": self.avg_price, "reason": self.reason,
+            "placed_at": self.placed_at, "updated_at": self.updated_at,
+        }
+
+
+class OrderBook:
+    """In-memory book of orders placed through this worker.
+
+    One background poller per session refreshes the book from the broker's
+    order report, and only while that session has open orders or waiters, so
+    any number of waiters cost one broker call per interval. Without waiters it
+    polls every idle_interval. It stops after max_failures failed polls in a row,
+    and a 401 (the session expired) drops the session's orders.
+    """
+
+    def __init__(self, poll_interval: float, retention: float, idle_interval: float = ORDER_IDLE_POLL_INTERVAL,
+                 max_failures: int = ORDER_POLL_MAX_FAILURES, max_age: float = ORDER_MAX_AGE):
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.idle_interval = idle_interval
+        self.max_failures = max_failures
+        self.max_age = max_age
+        self._orders = {}
+        self._pollers = {}
+        self._waiters = {}
+        # session_id -> Event set when a waiter arrives, cutting an idle sleep short
+        self._wake = {}
+        self.polls = 0
+        self.poll_failures = 0
+        self.dropped = 0
+
+    def track(self, session_id: str, order_id, symbol=None, side=None, qty=None) -> TrackedOrder:
+        order_id = str(order_id)
+        order = self._orders.get(order_id)
+        if order is None:
+            order = self._orders[order_id] = TrackedOrder(order_id, session_id, symbol, side, qty)
+        return order
+
+    def get(self, order_id: str, session_id: str = None):
+        """The tracked order, or None if unknown or (given session_id) placed by another session."""
+        order = self._orders.get(str(order_id))
+        if order is None or (session_id is not None and order.session_id != session_id):
+            return None
+        return order
+
+    def for_session(self, session_id: str):
+        return [o for o in self._orders.values() if o.session_id == session_id]
+
+    def apply_report(self, session_id: str, report):
+        """Updates tracked orders of a session from a NeoAPI.order_report() payload."""
+        rows = report.get("data") if isinstance(report, dict) else report
+        for row in rows or []:
+            if not isinstance(row, dict):
+                continue
+            order = self._orders.get(str(row.get("nOrdNo")))
+            if order is None or order.session_id != session_id:
+                continue
+            status = str(row.get("ordSt", order.status)).lower()
+            filled = row.get("fldQty", order.filled_qty)
+            if status == order.status and filled == order.filled_qty:
+                continue
+            order.status = status
+            order.filled_qty = filled
+            order.avg_price = row.get("avgPrc", order.avg_price)
+            order.reason = row.get("rejRsn") or order.reason
+            order.symbol = order.symbol or row.get("trdSym")
+            order.updated_at = time.time()
+            event, order.changed = order.changed, asyncio.Event()
+            event.set()
+
+    def _prune(self):
+        now = time.time()
+        for order_id in [k for k, o in self._orders.items()
+                         if now - (o.updated_at if o.terminal else o.placed_at)
+                         > (self.retention if o.terminal else self.max_age)]:
+            del self._orders[order_id]
+
+    def drop_session(self, session_id: str):
+        """Forgets a session's orders (its session is gone, so they cannot be polled)."""
+        for order_id in [k for k, o in self._orders.items() if o.session_id == session_id]:
+            del self._orders[order_id]
+            self.dropped += 1
+
+    def _needs_polling(self, session_id: str) -> bool:
+        if self._waiters.get(session_id):
+            return True
+        return any(not o.terminal for o in self._orders.values() if o.session_id == session_id)
+
+    def ensure_poller(self, session_id: str, fetch_report):
+        """Starts the session's poller if it is not running. fetch_report() is a
+        coroutine function returning the broker order report."""
+        task = self._pollers.get(session_id)
+        if task is not None and not task.done():
+            return
+
+        wake = self._wake[session_id] = asyncio.Event()
+
+        async def poll():
+            failures = 0
+            try:
+                while self._needs_polling(session_id):
+                    wake.clear()
+                    try:
+                        self.apply_report(session_id, await fetch_report())
+                        self.polls += 1
+                        failures = 0
+                    except Exception as e:
+                        self.poll_failures += 1
+                        failures += 1
+                        print(f"Order report poll failed ({session_id}): {e}")
+                        if getattr(e, "status_code", None) == 401:
+                            self.drop_session(session_id)
+                            break
+                        if failures >= self.max_failures:
+                            print(f"Order report poller stopped after {failures} failures ({session_id})")
+                            break
+                    self._prune()
+                    interval = self.poll_interval if self._waiters.get(session_id) else self.idle_interval
+                    try:
+                        await asyncio.wait_for(wake.wait(), interval)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._pollers.pop(session_id, None)
+                self._wake.pop(session_id, None)
+
+        self._pollers[session_id] = asyncio.ensure_future(poll())
+
+    async def wait(self, session_id: str, order_id: str, timeout: float, fetch_report):
+        """Long-polls until the order is final or its filled quantity changes
+        (a partial fill). Returns (order, changed); order is None for an order
+        this session did not place through the worker."""
+        order = self.get(order_id, session_id)
+        if order is None:
+            return None, False
+        if order.terminal:
+            return order, False
+        initial = order.filled_qty
+        self._waiters[session_id] = self._waiters.get(session_id, 0) + 1
+        try:
+            self.ensure_poller(session_id, fetch_report)
+            self._wake[session_id].set()  # a poller idling between slow polls checks now
+            deadline = time.monotonic() + min(timeout, MAX_WAIT_SECONDS)
+            while not order.terminal and order.filled_qty == initial:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return order, False
+                try:
+                    await asyncio.wait_for(order.changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return order, False
+            return order, True
+        finally:
+            self._waiters[session_id] -= 1
+            if not self._waiters[session_id]:
+                del self._waiters[session_id]
+
+    def stop(self):
+        for task in self._pollers.values():
+            task.cancel()
+        self._pollers.clear()
+
+    def stats(self):
+        return {
+            "tracked": len(self._orders),
+            "open": sum(1 for o in self._orders.values() if not o.terminal),
+            "pollers": len(self._pollers),
+            "waiters": sum(self._waiters.values()),
+            "polls": self.polls,
+            "poll_failures": self.poll_failures,
+            "dropped": self.dropped,
+        }
+
+
+order_book = OrderBook(poll_interval=ORDER_POLL_INTERVAL, retention=ORDER_RETENTION)
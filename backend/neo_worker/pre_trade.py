@@ -0,0 +1,270 @@
+import math
+import os
+import time
+from collections import OrderedDict
+
+# Holdings/limits/positions older than this are not used to judge an order.
+PRE_TRADE_MAX_AGE = float(os.getenv("PRE_TRADE_MAX_AGE", "300"))
+PRE_TRADE_SESSIONS = int(os.getenv("PRE_TRADE_SESSIONS", "1024"))
+
+# Delivery orders on these segments are checked against holdings and cash.
+CASH_SEGMENTS = {"nse_cm", "bse_cm"}
+
+
+class PreTradeRejected(ValueError):
+    """An order that cannot succeed, caught before it reaches the broker."""
+
+    def __init__(self, check: str, reason: str):
+        super().__init__(reason)
+        self.check = check
+        self.reason = reason
+
+
+def _num(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _symbol(value) -> str:
+    """Upper-case symbol without the NSE cash series suffix, for matching."""
+    symbol = str(value or "").upper()
+    return symbol[:-3] if symbol.endswith("-EQ") else symbol
+
+
+def broker_error(payload) -> bool:
+    """True for a broker error answer: {"error": ...}, {"Error": ...} or stat Not_Ok."""
+    return isinstance(payload, dict) and ("Error" in payload or "error" in payload
+                                          or payload.get("stat") == "Not_Ok")
+
+
+def _rows(payload):
+    rows = payload.get("data") if isinstance(payload, dict) else payload
+    return [row for row in rows or [] if isinstance(row, dict)]
+
+
+# Field holding the trading symbol of a row, per kind.
+SYMBOL_FIELDS = {
+    "holdings": ("displaySymbol", "instrumentName"),
+    "positions": ("trdSym",),
+}
+
+
+def readable(kind: str, payload) -> bool:
+    """Whether a read can be judged from: not an error, and holdings/positions
+    carry a row list (anything else says nothing about what is held)."""
+    if broker_error(payload):
+        return False
+    if kind not in SYMBOL_FIELDS:
+        return isinstance(payload, dict)
+    rows = payload.get("data") if isinstance(payload, dict) else payload
+    return isinstance(rows, list)
+
+
+def by_symbol(kind: str, payload) -> dict:
+    """Rows of a holdings/positions payload grouped by symbol, so a check is a dict lookup."""
+    fields = SYMBOL_FIELDS.get(kind)
+    if fields is None:
+        return {}
+    grouped = {}
+    for row in _rows(payload):
+        symbol = _symbol(next((row[f] for f in fields if row.get(f)), None))
+        grouped.setdefault(symbol, []).append(row)
+    return grouped
+
+
+class SessionState:
+    __slots__ = ("reads", "reserved")
+
+    def __init__(self):
+        # kind -> (payload, rows by symbol, fetched_at)
+        self.reads = {}
+        # Orders held or accepted since the last read: [placed_at, side, symbol, qty, value].
+        # placed_at is inf while the order is still on its way to the broker.
+        self.reserved = []
+
+
+class PreTradeChecker:
+    """Rejects orders that cannot succeed using only what the worker already knows.
+
+    Holdings, limits and positions are remembered from the last broker read of
+    each session, grouped by symbol (read-cache invalidation after an order does
+    not drop them). Orders accepted since then are reserved against them: a sell
+    reduces the sellable quantity until holdings are read again, a buy reduces
+    cash until limits are read again. The reservation is taken together with the
+    check, before the order goes out, so concurrent orders and basket legs see
+    each other; it is released if the broker does not accept the order. A positions read does not release sells:
+    only today's net delivery buys count from it, so a sell of held shares would
+    otherwise vanish from both. Data older than max_age is ignored, so a check
+    is skipped rather than made against a stale picture. Nothing here calls the
+    broker; a check is a few dict lookups.
+    """
+
+    def __init__(self, max_age: float, max_sessions: int):
+        self.max_age = max_age
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self.checked = 0
+        self.overridden = 0
+        self.unreadable = 0
+        self.rejected = {}
+
+    def _state(self, session_id: str) -> SessionState:
+        state = self._sessions.get(session_id)
+        if state is None:
+            state = self._sessions[session_id] = SessionState()
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return state
+
+    def observe(self, session_id: str, kind: str, payload, fetched_at: float = None):
+        """Records a fresh broker read of holdings, limits or positions. Error and
+        unparseable payloads are ignored, so the last good read stays in use."""
+        if not readable(kind, payload):
+            self.unreadable += 1
+            return
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        state = self._state(session_id)
+        state.reads[kind] = (payload, by_symbol(kind, payload), fetched_at)
+        # A read taken after an order already reflects it.
+        covered = {"holdings": "S", "limits": "B"}.get(kind)
+        if covered:
+            state.reserved = [r for r in state.reserved if r[1] != covered or r[0] > fetched_at]
+
+    def _fresh(self, state: SessionState, kind: str):
+        """(payload, rows by symbol) of the last read, or None when missing or too old."""
+        entry = state.reads.get(kind)
+        if entry is None or time.time() - entry[2] > self.max_age:
+            return None
+        return entry[:2]
+
+    def _symbol_rows(self, state: SessionState, kind: str, symbol: str):
+        fresh = self._fresh(state, kind)
+        return fresh[1].get(symbol, ()) if fresh else ()
+
+    def _reject(self, check: str, reason: str):
+        self.rejected[check] = self.rejected.get(check, 0) + 1
+        raise PreTradeRejected(check, reason)
+
+    def sellable(self, state: SessionState, symbol: str):
+        """Quantity of symbol that a delivery sell can use, or None if unknown."""
+        if self._fresh(state, "holdings") is None:
+            return None
+        qty = 0.0
+        for row in self._symbol_rows(state, "holdings", symbol):
+            sellable = row.get("sellableQuantity")
+            qty += _num(row.get("quantity") if sellable is None else sellable)
+        # Delivery shares bought today are in positions, not yet in holdings.
+        for row in self._symbol_rows(state, "positions", symbol):
+            if row.get("prod") == "CNC":
+                qty += max(0.0, _num(row.get("flBuyQty")) - _num(row.get("flSellQty")))
+        qty -= sum(r[3] for r in state.reserved if r[1] == "S" and r[2] == symbol)
+        return qty
+
+    def reference_price(self, state: SessionState, symbol: str, ltp=None):
+        """Last traded price from the market feed, else the holdings' last close."""
+        if ltp:
+            return ltp
+        for row in self._symbol_rows(state, "holdings", symbol):
+            close = _num(row.get("closingPrice"))
+            if close:
+                return close
+        return None
+
+    def check(self, session_id: str, params: dict, instrument=None, ltp=None):
+        """Raises PreTradeRejected for an order that cannot succeed.
+
+        params are NeoAPI.place_order keyword arguments; instrument is the
+        instrument index row (if the index is loaded) and ltp a live price.
+        Returns the checks run and skipped, and the estimated order value.
+        """
+        self.checked += 1
+        state = self._state(session_id)
+        symbol = _symbol(params["trading_symbol"])
+        side = params["transaction_type"]
+        qty = _num(params["quantity"])
+        price = _num(params.get("price"))
+        result = {"passed": [], "skipped": [], "order_value": None}
+
+        if qty <= 0 or qty != int(qty):
+            self._reject("quantity", f"Quantity must be a positive whole number, got {params['quantity']}.")
+        result["passed"].append("quantity")
+        if params.get("order_type") in ("L", "SL") and price <= 0:
+            self._reject("price", f"A {params['order_type']} order needs a price above 0.")
+        result["passed"].append("price")
+        if instrument:
+            lot_size = instrument.get("lot_size") or 1
+            if qty % lot_size:
+                self._reject("lot_size", f"{instrument['trading_symbol']} trades in lots of {lot_size}; "
+                                         f"{qty:g} is not a multiple.")
+            result["passed"].append("lot_size")
+
+        delivery = params.get("exchange_segment") in CASH_SEGMENTS and params.get("product") == "CNC"
+        if not delivery:
+            result["skipped"].extend(["holdings", "funds"])
+            return result
+
+        if side == "S":
+            available = self.sellable(state, symbol)
+            if available is None:
+                result["skipped"].append("holdings")
+            elif qty > available:
+                self._reject("holdings", f"Cannot sell {qty:g} {symbol}: only {max(available, 0):g} "
+                                         f"sellable in holdings and today's delivery buys.")
+            else:
+                result["passed"].append("holdings")
+            return result
+
+        reference = price if price > 0 else self.reference_price(state, symbol, ltp)
+        limits = (self._fresh(state, "limits") or (None,))[0]
+        if reference is None or not isinstance(limits, dict) or "Net" not in limits:
+            result["skipped"].append("funds")
+            return result
+        value = qty * reference
+        cash = _num(limits["Net"]) - sum(r[4] for r in state.reserved if r[1] == "B")
+        result["order_value"] = round(value, 2)
+        if value > cash:
+            self._reject("funds", f"Buying {qty:g} {symbol} needs about {value:,.2f} "
+                                  f"but only {max(cash, 0):,.2f} is available.")
+        result["passed"].append("funds")
+        return result
+
+    def override(self):
+        """Counts an order placed with skip_checks (it is still reserved)."""
+        self.overridden += 1
+
+    def reserve(self, session_id: str, params: dict, order_value=None):
+        """Holds an order against the session until confirm() or release(). Call it
+        right after check(), with no await in between. Returns the reservation."""
+        reservation = [math.inf, params["transaction_type"], _symbol(params["trading_symbol"]),
+                       _num(params["quantity"]), order_value or 0.0]
+        self._state(session_id).reserved.append(reservation)
+        return reservation
+
+    def confirm(self, reservation):
+        """The broker accepted the order: the next read taken after now covers it."""
+        reservation[0] = time.time()
+
+    def release(self, session_id: str, reservation):
+        """The order never reached the book; frees what it held."""
+        state = self._sessions.get(session_id)
+        if state is not None:
+            state.reserved = [r for r in state.reserved if r is not reservation]
+
+    def clear(self):
+        self._sessions.clear()
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "checked": self.checked,
+            "overridden": self.overridden,
+            "unreadable": self.unreadable,
+            "rejected": dict(self.rejected),
+            "max_age": self.max_age,
+        }
+
+
+pre_trade = PreTradeChecker(max_age=PRE_TRADE_MAX_AGE, max_sessions=PRE_TRADE_SESSIONS)
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import time
+
+# Broker call budgets per consumer_key, shared by every worker replica through Redis.
+READ_RATE_LIMIT = float(os.getenv("READ_RATE_LIMIT", "5"))
+READ_RATE_BURST = int(os.getenv("READ_RATE_BURST", "10"))
+ORDER_RATE_LIMIT = float(os.getenv("ORDER_RATE_LIMIT", "10"))
+ORDER_RATE_BURST = int(os.getenv("ORDER_RATE_BURST", "5"))
+# Callers beyond this many waiters per consumer_key, or waiting longer than
+# RATE_MAX_WAIT seconds, are turned away instead of piling up.
+RATE_QUEUE_SIZE = int(os.getenv("RATE_QUEUE_SIZE", "100"))
+RATE_MAX_WAIT = float(os.getenv("RATE_MAX_WAIT", "30"))
+
+# Poll interval for reads that are yielding to queued orders.
+PRIORITY_YIELD_SECONDS = 0.01
+
+# Token bucket kept in a Redis hash. Uses the Redis clock so replicas agree.
+# Returns 0 when a token was taken, otherwise the milliseconds until one is due.
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate / 1000)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class LocalRateLimiter:
+    """In-process token bucket with the same contract as the Redis script."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self) -> float:
+        """Tries to take one token. Returns 0 on success or seconds to wait."""
+        self._refill()
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        self._tokens -= 1
+        return 0
+
+
+class BrokerRateScheduler:
+    """Paces broker calls per consumer_key with separate read and order budgets.
+
+    Bucket state lives in Redis so the limit holds across worker replicas; if
+    Redis is unavailable each replica falls back to a local bucket. Orders take
+    priority: reads for a consumer_key hold back while orders are queued for it.
+    """
+
+    def __init__(self, budgets: dict, queue_size: int, max_wait: float):
+        # kind -> (rate per second, burst)
+        self.budgets = budgets
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.redis = None
+        self._script = None
+        self._local = {}
+        # consumer_key -> {kind: waiting callers}
+        self._waiting = {}
+        self.granted = {kind: 0 for kind in budgets}
+        self.rejected = {kind: 0 for kind in budgets}
+
+    def attach(self, redis_client):
+        self.redis = redis_client
+        self._script = redis_client.register_script(TOKEN_BUCKET_LUA) if redis_client else None
+
+    def _local_bucket(self, consumer_key: str, kind: str):
+        key = (consumer_key, kind)
+        bucket = self._local.get(key)
+        if bucket is None:
+            rate, burst = self.budgets[kind]
+            bucket = self._local[key] = LocalRateLimiter(rate, burst)
+        return bucket
+
+    async def _take(self, consumer_key: str, kind: str) -> float:
+        """Tries to take one token. Returns 0 on success or seconds to wait."""
+        rate, burst = self.budgets[kind]
+        wait_ms = await self._script(
+            keys=[f"ratelimit:{consumer_key}:{kind}"], args=[rate, burst]
+        )
+        return int(wait_ms) / 1000
+
+    def _orders_waiting(self, consumer_key: str) -> int:
+        return self._waiting.get(consumer_key, {}).get("order", 0)
+
+    async def acquire(self, consumer_key: str, kind: str, max_wait: float = None):
+        """Waits until a broker call of the given kind ("read" or "order") may go out.
+        max_wait shortens the allowed wait (e.g. to the request's deadline)."""
+        waiting = self._waiting.setdefault(consumer_key, {})
+        if sum(waiting.values()) >= self.queue_size:
+            self.rejected[kind] += 1
+            raise RateLimitExceeded(f"Broker {kind} queue is full for this account.")
+
+        waiting[kind] = waiting.get(kind, 0) + 1
+        deadline = time.monotonic() + (self.max_wait if max_wait is None else min(max_wait, self.max_wait))
+        try:
+            while True:
+                if kind != "order" and self._orders_waiting(consumer_key):
+                    delay = PRIORITY_YIELD_SECONDS
+                elif self._script is None:
+                    delay = self._local_bucket(consumer_key, kind).take()
+                else:
+                    try:
+                        delay = await self._take(consumer_key, kind)
+                    except Exception as e:
+                        print(f"Rate limiter falling back to local bucket: {e}")
+                        delay = self._local_bucket(consumer_key, kind).take()
+                if delay == 0:
+                    break
+                if time.monotonic() + delay > deadline:
+                    self.rejected[kind] += 1
+                    raise RateLimitExceeded(f"Timed out waiting for broker {kind} budget.")
+                await asyncio.sleep(delay)
+            self.granted[kind] += 1
+        finally:
+            waiting[kind] -= 1
+            if not any(waiting.values()):
+                self._waiting.pop(consumer_key, None)
+
+    def stats(self):
+        return {
+            "budgets": {kind: {"rate": r, "burst": b} for kind, (r, b) in self.budgets.items()},
+            "backend": "redis" if self._script is not None else "local",
+            "queue_size": self.queue_size,
+            "queue_depth": sum(sum(w.values()) for w in self._waiting.values()),
+            "granted": dict(self.granted),
+            "rejected": dict(self.rejected),
+        }
+
+
+broker_scheduler = BrokerRateScheduler(
+    budgets={
+        "read": (READ_RATE_LIMIT, READ_RATE_BURST),
+        "order": (ORDER_RATE_LIMIT, ORDER_RATE_BURST),
+    },
+    queue_size=RATE_QUEUE_SIZE,
+    max_wait=RATE_MAX_WAIT,
+)
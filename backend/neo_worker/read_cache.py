@@ -0,0 +1,106 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+
+from deadlines import DeadlineExceeded, remaining, without_deadline
+
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL", "5"))
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", "1024"))
+
+
+class ReadCache:
+    """Per-session read-through cache for broker reads with single-flight loading.
+
+    Concurrent callers asking for the same (session_id, kind) share one in-flight
+    broker call, which runs without any caller's deadline; each caller waits
+    for it only as long as its own deadline allows.
+
+    invalidate() also forgets the session's in-flight loads. A load stores its
+    result only while it is still the registered one, so a load that was already
+    running when an order went through does not repopulate the cache.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        # (session_id, kind) -> (value, fetched_at)
+        self._entries = OrderedDict()
+        # (session_id, kind) -> asyncio.Task
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, session_id: str, kind: str, loader, refresh: bool = False):
+        """Returns (value, cached, age_seconds) for the given session and kind."""
+        key = (session_id, kind)
+        if not refresh:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry[1]
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0], True, age
+                del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            # The task would otherwise copy this caller's deadline and impose it on every waiter.
+            with without_deadline():
+                task = asyncio.ensure_future(self._load(key, loader))
+            # Every waiter may have given up; its error is still retrieved.
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        budget = remaining()
+        try:
+            value = await asyncio.wait_for(asyncio.shield(task), None if math.isinf(budget) else max(budget, 0))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"Deadline exceeded waiting for broker {kind}.")
+        return value, False, 0.0
+
+    async def _load(self, key, loader):
+        try:
+            value = await loader()
+            if self._inflight.get(key) is asyncio.current_task():
+                self._store(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def _store(self, key, value):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: str):
+        """Drops every cached read for the session (e.g. after an order)."""
+        for key in [k for k in self._entries if k[0] == session_id]:
+            del self._entries[key]
+        for key in [k for k in self._inflight if k[0] == session_id]:
+            del self._inflight[key]
+
+    def clear(self):
+        self._entries.clear()
+        self._inflight.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+read_cache = ReadCache(ttl=READ_CACHE_TTL, max_size=READ_CACHE_SIZE)
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict, deque
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Versions kept per (session_id, kind) that since= can diff against.
+VERSION_HISTORY = int(os.getenv("VERSION_HISTORY", "8"))
+VERSION_SESSIONS = int(os.getenv("VERSION_SESSIONS", "1024"))
+
+
+def content_version(payload) -> str:
+    """Short hash of a broker payload; equal payloads get equal versions."""
+    if orjson is not None:
+        encoded = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    else:
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+def _holdings_key(row):
+    token = row.get("instrumentToken")
+    if token is not None:
+        return f"{row.get('exchangeSegment')}|{token}"
+    return row.get("displaySymbol") or row.get("instrumentName")
+
+
+def _positions_key(row):
+    if row.get("tok") is not None:
+        return f"{row.get('exSeg')}|{row.get('tok')}|{row.get('prod')}"
+    return f"{row.get('trdSym')}|{row.get('prod')}"
+
+
+# Identity of a row across reads, per kind.
+ROW_KEYS = {
+    "holdings": _holdings_key,
+    "positions": _positions_key,
+}
+
+
+def row_key(kind: str, row) -> str:
+    return str(ROW_KEYS[kind](row))
+
+
+# Fields that name a removed row, per kind.
+ROW_LABELS = {
+    "holdings": ("instrumentName", "displaySymbol", "exchangeSegment", "instrumentToken"),
+    "positions": ("trdSym", "exSeg", "prod", "tok"),
+}
+
+
+def row_label(kind: str, row) -> dict:
+    return {f: row[f] for f in ROW_LABELS[kind] if row.get(f) is not None}
+
+
+def diff(kind: str, old, new):
+    """Rows added, changed and removed between two payloads of the same kind.
+
+    {"data": [...]} payloads are compared row by row (keyed by instrument) and
+    removed rows are named by their symbol fields; anything else (limits) is
+    compared by top-level key.
+    """
+    if kind in ROW_KEYS and isinstance(old, dict) and isinstance(new, dict):
+        old_rows = {row_key(kind, r): r for r in old.get("data") or [] if isinstance(r, dict)}
+        new_rows = {row_key(kind, r): r for r in new.get("data") or [] if isinstance(r, dict)}
+        return {
+            "added": [r for k, r in new_rows.items() if k not in old_rows],
+            "changed": [r for k, r in new_rows.items() if k in old_rows and old_rows[k] != r],
+            "removed": [row_label(kind, r) for k, r in old_rows.items() if k not in new_rows],
+        }
+    old = old if isinstance(old, dict) else {}
+    new = new if isinstance(new, dict) else {}
+    return {
+        "changed": {k: v for k, v in new.items() if old.get(k) != v},
+        "removed": [k for k in old if k not in new],
+    }
+
+
+class VersionStore:
+    """Remembers the last few payloads per (session_id, kind) by content version.
+
+    observe() is called with every payload served; a payload that is the same
+    object as the latest one (a read cache hit) is not hashed again.
+    """
+
+    def __init__(self, history: int, max_sessions: int):
+        self.history = history
+        self.max_sessions = max_sessions
+        # (session_id, kind) -> deque of (version, payload), newest last
+        self._entries = OrderedDict()
+        self.deltas = 0
+        self.misses = 0
+
+    def observe(self, session_id: str, kind: str, payload) -> str:
+        key = (session_id, kind)
+        versions = self._entries.get(key)
+        if versions is None:
+            versions = self._entries[key] = deque(maxlen=self.history)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+
+        if versions and versions[-1][1] is payload:
+            return versions[-1][0]
+        version = content_version(payload)
+        if versions and versions[-1][0] == version:
+            # Same content refetched: keep the new object so cache hits skip hashing.
+            versions[-1] = (version, payload)
+            return version
+        versions.append((version, payload))
+        return version
+
+    def since(self, session_id: str, kind: str, version: str):
+        """Payload previously served as `version`, or None once it has aged out."""
+        for seen, payload in self._entries.get((session_id, kind), ()):
+            if seen == version:
+                self.deltas += 1
+                return payload
+        self.misses += 1
+        return None
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "sessions": len(self._entries),
+            "history": self.history,
+            "deltas": self.deltas,
+            "misses": self.misses,
+        }
+
+
+read_versions = VersionStore(history=VERSION_HISTORY, max_sessions=VERSION_SESSIONS)
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import os
+import struct
+
+import redis.asyncio as aioredis
+
+# Redis connection pool (shared with the rate limiter).
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_DB = int(os.getenv("REDIS_DB", "0"))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD") or None
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "64"))
+# Seconds a command waits for a free pooled connection once all are busy.
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "2"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+# Sliding session lifetime, renewed on every lookup.
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(18 * 60 * 60)))
+# Keys per get-and-touch script call in a batch lookup.
+SESSION_BATCH_SIZE = int(os.getenv("SESSION_BATCH_SIZE", "500"))
+
+SESSION_PREFIX = "session:"
+
+# GET every key and slide the expiry of those that exist, in one round trip.
+# Missing keys come back as nil (a Lua false), keeping positions aligned.
+GET_AND_TOUCH_LUA = """
+local values = {}
+for i, key in ipairs(KEYS) do
+  local value = redis.call('GET', key)
+  if value then
+    redis.call('EXPIRE', key, ARGV[1])
+  end
+  values[i] = value
+end
+return values
+"""
+
+# Binary session layout: a format byte, then each of FIELDS as a big-endian
+# uint16 length and UTF-8 bytes (0xFFFF = missing), then any other keys as JSON.
+FORMAT_VERSION = 1
+FIELDS = ("TRADING_TOKEN", "TRADING_SID", "BASE_URL", "consumer_key", "environment", "neo_fin_key")
+_LENGTH = struct.Struct(">H")
+_MISSING = 0xFFFF
+
+
+def create_redis_client():
+    """Returns a client over a bounded, blocking connection pool; does NOT connect yet.
+    Values are bytes: sessions are binary-encoded."""
+    pool = aioredis.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
+        password=REDIS_PASSWORD,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        decode_responses=False,
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+def encode_session(data: dict) -> bytes:
+    parts = [bytes([FORMAT_VERSION])]
+    for field in FIELDS:
+        value = data.get(field)
+        if value is None:
+            parts.append(_LENGTH.pack(_MISSING))
+            continue
+        encoded = str(value).encode()
+        if len(encoded) >= _MISSING:
+            raise ValueError(f"Session field {field} is too long to encode.")
+        parts.append(_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    extra = {k: v for k, v in data.items() if k not in FIELDS}
+    if extra:
+        parts.append(json.dumps(extra, separators=(",", ":")).encode())
+    return b"".join(parts)
+
+
+def decode_session(blob):
+    """Decodes a stored session, or returns None for an empty or truncated blob
+    (treated like a missing session). JSON sessions written before the binary
+    format are still read."""
+    if isinstance(blob, str):
+        blob = blob.encode()
+    if not blob:
+        return None
+    if blob[:1] == b"{":
+        try:
+            return json.loads(blob)
+        except ValueError:
+            return None
+    if blob[0] != FORMAT_VERSION:
+        raise ValueError(f"Unknown session format {blob[0]}.")
+    data = {}
+    offset = 1
+    for field in FIELDS:
+        if offset + _LENGTH.size > len(blob):
+            return None
+        (length,) = _LENGTH.unpack_from(blob, offset)
+        offset += _LENGTH.size
+        if length == _MISSING:
+            continue
+        if offset + length > len(blob):
+            return None
+        data[field] = blob[offset:offset + length].decode()
+        offset += length
+    if offset < len(blob):
+        try:
+            data.update(json.loads(blob[offset:]))
+        except ValueError:
+            return None
+    return data
+
+
+def session_key(session_id: str) -> str:
+    return SESSION_PREFIX + session_id
+
+
+class SessionStore:
+    """Trading sessions in Redis under session:{id}, binary-encoded.
+
+    A lookup reads the session and slides its expiry with one script call,
+    so a request that misses the in-process client cache costs exactly one
+    Redis round trip. Lookups return the raw stored bytes; callers compare
+    them with what they cached and decode only when the session changed.
+    """
+
+    def __init__(self, ttl: int, batch_size: int):
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.redis = None
+        self._get_and_touch = None
+        self.lookups = 0
+        self.batches = 0
+        self.missing = 0
+
+    def attach(self, redis_client):
+        self.redis = redis_client
+        self._get_and_touch = redis_client.register_script(GET_AND_TOUCH_LUA) if redis_client else None
+
+    async def get(self, session_id: str):
+        """Raw session bytes (expiry renewed), or None if missing or expired."""
+        (value,) = await self._get_and_touch(keys=[session_key(session_id)], args=[self.ttl])
+        self.lookups += 1
+        if value is None:
+            self.missing += 1
+        return value
+
+    async def get_many(self, session_ids):
+        """{session_id: raw bytes or None} for many sessions, one round trip per
+        SESSION_BATCH_SIZE sessions (batches run concurrently)."""
+        session_ids = list(dict.fromkeys(session_ids))
+        chunks = [session_ids[i:i + self.batch_size] for i in range(0, len(session_ids), self.batch_size)]
+        results = await asyncio.gather(*(
+            self._get_and_touch(keys=[session_key(s) for s in chunk], args=[self.ttl]) for chunk in chunks
+        ))
+        found = {}
+        for chunk, values in zip(chunks, results):
+            found.update(zip(chunk, values))
+        self.lookups += len(found)
+        self.batches += 1
+        self.missing += sum(1 for v in found.values() if v is None)
+        return found
+
+    async def put(self, session_id: str, data: dict) -> bytes:
+        blob = encode_session(data)
+        await self.redis.set(session_key(session_id), blob, ex=self.ttl)
+        return blob
+
+    def stats(self):
+        return {
+            "ttl": self.ttl,
+            "lookups": self.lookups,
+            "batches": self.batches,
+            "missing": self.missing,
+            "pool_max_connections": REDIS_MAX_CONNECTIONS,
+        }
+
+
+session_store = SessionStore(ttl=SESSION_TTL, batch_size=SESSION_BATCH_SIZE)
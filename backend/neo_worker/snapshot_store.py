@@ -0,0 +1,304 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from analytics import HoldingsFrame, PositionsFrame
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "/tmp/portfolio_snapshots")
+# An unchanged payload is never stored; a changed one at most this often per account.
+SNAPSHOT_MIN_INTERVAL = float(os.getenv("SNAPSHOT_MIN_INTERVAL", "60"))
+SNAPSHOT_RETENTION_DAYS = int(os.getenv("SNAPSHOT_RETENTION_DAYS", "90"))
+
+KINDS = ("holdings", "positions")
+
+# One record per instrument per snapshot; symbols are dictionary-encoded.
+ROW_DTYPE = np.dtype([
+    ("symbol", "<u4"), ("qty", "<f8"), ("avg_price", "<f8"),
+    ("price", "<f8"), ("value", "<f8"), ("pnl", "<f8"),
+])
+# One record per snapshot: when, whose, and which rows of the day's row file.
+INDEX_DTYPE = np.dtype([("ts", "<f8"), ("account", "<u4"), ("start", "<u8"), ("count", "<u4")])
+
+
+def account_key(value: str) -> str:
+    """Accounts are stored hashed; the raw consumer key never reaches disk."""
+    return hashlib.blake2b(value.encode(), digest_size=8).hexdigest()
+
+
+def snapshot_columns(kind: str, payload):
+    """(symbols, qty, avg_price, price, value, pnl) of a holdings or positions payload.
+
+    Holdings are marked at the last close; positions store the net quantity,
+    the open average price, the net cash flow as value and the realised P&L.
+    """
+    if kind == "holdings":
+        frame = HoldingsFrame.from_payload(payload)
+        price = frame.price
+        value = frame.qty * price
+        return frame.symbols, frame.qty, frame.avg, price, value, value - frame.qty * frame.avg
+    frame = PositionsFrame(payload)
+    return (frame.symbols, frame.net, frame.open_avg, np.full(len(frame), np.nan),
+            frame.cash_flow, frame.realised)
+
+
+class Dictionary:
+    """Append-only string <-> id table persisted as a JSON list."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.values = []
+        self.ids = {}
+        self.dirty = False
+        if os.path.exists(path):
+            with open(path) as f:
+                self.values = json.load(f)
+            self.ids = {v: i for i, v in enumerate(self.values)}
+
+    def code(self, value: str) -> int:
+        idx = self.ids.get(value)
+        if idx is None:
+            idx = self.ids[value] = len(self.values)
+            self.values.append(value)
+            self.dirty = True
+        return idx
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.values, f)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+def _day(ts: float) -> str:
+    return datetime.date.fromtimestamp(ts).isoformat()
+
+
+def _iso(ts: float) -> str:
+    return datetime.datetime.fromtimestamp(ts).isoformat(timespec="seconds")
+
+
+def _r(value, digits: int = 2):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+class SnapshotStore:
+    """Local history of holdings and positions, partitioned by day.
+
+    Each day directory holds, per kind, an append-only row file and an index
+    file of fixed-size records, both read back as memory-mapped NumPy arrays.
+    Index records are in time order, so a time range is a binary search and a
+    symbol filter is one vectorized comparison over the selected rows.
+    """
+
+    def __init__(self, root: str, min_interval: float, retention_days: int):
+        self.root = root
+        self.min_interval = min_interval
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._symbols = None
+        self._accounts = None
+        # (account, kind) -> (version, ts) of the last stored snapshot
+        self._last = {}
+        # kind -> ts of the last index record written, so records stay in time order
+        self._written_ts = {}
+        self._pruned_day = None
+        self.written = 0
+        self.skipped = 0
+
+    def _open(self):
+        if self._symbols is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._symbols = Dictionary(os.path.join(self.root, "symbols.json"))
+            self._accounts = Dictionary(os.path.join(self.root, "accounts.json"))
+
+    def _paths(self, day: str, kind: str):
+        directory = os.path.join(self.root, day)
+        return os.path.join(directory, f"{kind}.rows"), os.path.join(directory, f"{kind}.idx")
+
+    # ---- writing (called from a worker thread) ----
+
+    def append(self, account: str, kind: str, payload, ts: float = None):
+        """Writes one snapshot. The timestamp is taken under the write lock (and never
+        goes below the previous record's), so writes that queue up in a different
+        order than they were requested still land in time order."""
+        symbols, qty, avg_price, price, value, pnl = snapshot_columns(kind, payload)
+        with self._lock:
+            ts = max(time.time() if ts is None else ts, self._written_ts.get(kind, 0.0))
+            self._written_ts[kind] = ts
+            self._open()
+            rows = np.empty(len(symbols), dtype=ROW_DTYPE)
+            rows["symbol"] = [self._symbols.code(s) for s in symbols]
+            rows["qty"], rows["avg_price"], rows["price"] = qty, avg_price, price
+            rows["value"], rows["pnl"] = value, pnl
+
+            day = _day(ts)
+            rows_path, index_path = self._paths(day, kind)
+            os.makedirs(os.path.dirname(rows_path), exist_ok=True)
+            start = os.path.getsize(rows_path) // ROW_DTYPE.itemsize if os.path.exists(rows_path) else 0
+            entry = np.array([(ts, self._accounts.code(account), start, len(rows))], dtype=INDEX_DTYPE)
+            # Rows first: an index record never points past the end of the row file.
+            with open(rows_path, "ab") as f:
+                f.write(rows.tobytes())
+            with open(index_path, "ab") as f:
+                f.write(entry.tobytes())
+            self._symbols.save()
+            self._accounts.save()
+            self.written += 1
+            if self._pruned_day != day:
+                self._prune(day)
+
+    def _prune(self, today: str):
+        cutoff = (datetime.date.fromisoformat(today) - datetime.timedelta(days=self.retention_days)).isoformat()
+        for name in os.listdir(self.root):
+            if len(name) == 10 and name[4] == "-" and name < cutoff:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        self._pruned_day = today
+
+    def record_in_background(self, run_blocking, account: str, kind: str, version: str, payload):
+        """Stores a snapshot off the event loop if the payload changed and the last
+        one is older than min_interval. Failures are only logged."""
+        if kind not in KINDS:
+            return
+        now = time.time()
+        last = self._last.get((account, kind))
+        if last is not None and (last[0] == version or now - last[1] < self.min_interval):
+            self.skipped += 1
+            return
+        self._last[(account, kind)] = (version, now)
+
+        async def record():
+            try:
+                await run_blocking(self.append, account, kind, payload)
+            except Exception as e:
+                print(f"Snapshot write failed ({kind}): {e}")
+
+        asyncio.ensure_future(record())
+
+    # ---- reading ----
+
+    def _load(self, path: str, dtype):
+        if not os.path.exists(path) or os.path.getsize(path) < dtype.itemsize:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(os.path.getsize(path) // dtype.itemsize,))
+
+    def _select(self, account_id: int, kind: str, start: float, end: float):
+        """(snapshot times, their rows, snapshot number of each row) within [start, end]."""
+        times, blocks, owners = [], [], []
+        seen = 0
+        day = datetime.date.fromtimestamp(start)
+        while day <= datetime.date.fromtimestamp(end):
+            rows_path, index_path = self._paths(day.isoformat(), kind)
+            day += datetime.timedelta(days=1)
+            index = self._load(index_path, INDEX_DTYPE)
+            if not len(index):
+                continue
+            lo = np.searchsorted(index["ts"], start, side="left")
+            hi = np.searchsorted(index["ts"], end, side="right")
+            index = index[lo:hi]
+            index = index[index["account"] == account_id]
+            if not len(index):
+                continue
+            rows = self._load(rows_path, ROW_DTYPE)
+            counts = index["count"].astype(np.int64)
+            # Row positions of every selected snapshot, without a Python loop per snapshot.
+            block_starts = np.cumsum(counts) - counts
+            positions = np.repeat(index["start"].astype(np.int64) - block_starts, counts) + np.arange(counts.sum())
+            times.append(np.array(index["ts"]))
+            blocks.append(np.array(rows[positions]))
+            owners.append(np.repeat(np.arange(seen, seen + len(index)), counts))
+            seen += len(index)
+        if not times:
+            return np.empty(0), np.empty(0, dtype=ROW_DTYPE), np.empty(0, dtype=np.int64)
+        return np.concatenate(times), np.concatenate(blocks), np.concatenate(owners)
+
+    def query(self, account: str, kind: str, start: float, end: float, symbol: str = None, points: int = 30):
+        """Portfolio totals per snapshot (or one symbol's rows), plus what changed
+        between the first and last snapshot in the range. Never calls the broker.
+        The range is clamped to the retention window (nothing older is kept)."""
+        now = time.time()
+        oldest = now - (self.retention_days + 1) * 86400
+        if not start >= oldest:
+            start = oldest
+        if not end <= now:
+            end = now
+        with self._lock:
+            self._open()
+            account_id = self._accounts.ids.get(account)
+            symbol = symbol.upper().removesuffix("-EQ") if symbol else None
+            symbol_id = self._symbols.ids.get(symbol) if symbol else None
+            symbol_names = list(self._symbols.values)
+        result = {"kind": kind, "from": _iso(start), "to": _iso(end), "snapshots": 0, "series": []}
+        if account_id is None:
+            return result
+        times, rows, owners = self._select(account_id, kind, start, end)
+        result["snapshots"] = len(times)
+        if not len(times):
+            return result
+        picked = np.unique(np.linspace(0, len(times) - 1, min(points, len(times))).round().astype(np.int64))
+
+        if symbol:
+            mask = rows["symbol"] == symbol_id if symbol_id is not None else np.zeros(len(rows), dtype=bool)
+            per_snapshot = np.full(len(times), -1, dtype=np.int64)
+            per_snapshot[owners[mask]] = np.nonzero(mask)[0]
+            for i in picked:
+                row = rows[per_snapshot[i]] if per_snapshot[i] >= 0 else None
+                result["series"].append({
+                    "ts": _iso(times[i]),
+                    "qty": _r(row["qty"], 4) if row is not None else 0,
+                    "price": _r(row["price"]) if row is not None else None,
+                    "value": _r(row["value"]) if row is not None else 0,
+                    "pnl": _r(row["pnl"]) if row is not None else 0,
+                })
+            result["symbol"] = symbol
+            return result
+
+        n = len(times)
+        value = np.bincount(owners, weights=rows["value"], minlength=n)
+        pnl = np.bincount(owners, weights=np.nan_to_num(rows["pnl"]), minlength=n)
+        count = np.bincount(owners, weights=rows["qty"] != 0, minlength=n)
+        result["series"] = [
+            {"ts": _iso(times[i]), "value": _r(value[i]), "pnl": _r(pnl[i]), "count": int(count[i])}
+            for i in picked
+        ]
+
+        first, last = rows[owners == 0], rows[owners == n - 1]
+        before = dict(zip(first["symbol"].tolist(), first["qty"].tolist()))
+        after = dict(zip(last["symbol"].tolist(), last["qty"].tolist()))
+        result["changes"] = {
+            "added": [{"symbol": symbol_names[k], "qty": q} for k, q in after.items() if k not in before and q],
+            "removed": [{"symbol": symbol_names[k], "qty": q} for k, q in before.items() if k not in after and q],
+            "changed": [{"symbol": symbol_names[k], "qty_before": before[k], "qty_after": q}
+                        for k, q in after.items() if k in before and before[k] != q],
+            "value_change": _r(value[-1] - value[0]),
+            "pnl_change": _r(pnl[-1] - pnl[0]),
+        }
+        return result
+
+    def stats(self):
+        days = sorted(d for d in os.listdir(self.root) if len(d) == 10) if os.path.isdir(self.root) else []
+        size = sum(
+            os.path.getsize(os.path.join(self.root, d, name))
+            for d in days for name in os.listdir(os.path.join(self.root, d))
+        )
+        return {
+            "days": len(days),
+            "first_day": days[0] if days else None,
+            "bytes": size,
+            "written": self.written,
+            "skipped": self.skipped,
+            "retention_days": self.retention_days,
+        }
+
+
+snapshot_store = SnapshotStore(SNAPSHOT_DIR, SNAPSHOT_MIN_INTERVAL, SNAPSHOT_RETENTION_DAYS)
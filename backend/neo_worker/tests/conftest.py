@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The worker imports its modules flat (as in the Docker image), so tests do too.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,18 @@
+import pytest
+
+from analytics import HoldingsFrame, what_if
+
+HOLDINGS = {"data": [{"displaySymbol": "INFY", "quantity": 10, "averagePrice": 1400, "closingPrice": 1500}]}
+
+
+@pytest.mark.parametrize("price", [None, 100.0])
+def test_selling_a_symbol_that_is_not_held_says_so(price):
+    frame = HoldingsFrame.from_payload(HOLDINGS)
+    with pytest.raises(ValueError, match="Cannot sell TCS: it is not held"):
+        what_if(frame, "S", "TCS", 1, price, top=5)
+
+
+def test_buying_a_new_symbol_still_needs_a_price():
+    frame = HoldingsFrame.from_payload(HOLDINGS)
+    with pytest.raises(ValueError, match="pass a price"):
+        what_if(frame, "B", "TCS", 1, None, top=5)
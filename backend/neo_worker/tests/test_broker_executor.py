@@ -0,0 +1,40 @@
+import asyncio
+import threading
+
+from broker_executor import BrokerExecutor
+
+
+def test_abandoned_call_keeps_its_slot_until_the_thread_returns():
+    release = threading.Event()
+
+    async def scenario():
+        executor = BrokerExecutor(max_workers=2, global_limit=1, session_limit=1)
+        executor.start()
+        try:
+            try:
+                await asyncio.wait_for(executor.run("sid", release.wait, 5), 0.05)
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.sleep(0.01)
+            stuck = executor.stats()
+
+            # The hung call still holds the only slot, so the next call queues where stats can see it.
+            second = asyncio.ensure_future(executor.run("sid", lambda: "ok"))
+            await asyncio.sleep(0.05)
+            queued = executor.stats()
+
+            release.set()
+            result = await asyncio.wait_for(second, 1)
+            await asyncio.sleep(0.01)
+            return stuck, queued, result, executor.stats()
+        finally:
+            release.set()
+            executor.shutdown()
+
+    stuck, queued, result, after = asyncio.run(scenario())
+    assert stuck["in_flight"] == 1 and stuck["abandoned"] == 1
+    assert queued["queue_depth"] == 1
+    assert result == "ok"
+    assert after["in_flight"] == 0 and after["abandoned"] == 0
+    assert after["abandoned_total"] == 1
+    assert after["completed"] == 2
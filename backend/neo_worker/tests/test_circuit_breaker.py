@@ -0,0 +1,23 @@
+import pytest
+
+from circuit_breaker import BreakerRegistry, CircuitOpen
+
+
+def test_one_accounts_failures_do_not_open_the_circuit_for_others():
+    registry = BreakerRegistry(failures=2, cooldown=30, max_circuits=16)
+    for _ in range(2):
+        registry.get("place_order", "bad-account").record_failure()
+
+    with pytest.raises(CircuitOpen):
+        registry.get("place_order", "bad-account").before_call()
+    registry.get("place_order", "good-account").before_call()
+    assert registry.is_closed("place_order", "good-account")
+    assert registry.stats()["place_order"] == {"circuits": 2, "open": 1, "rejected": 1}
+
+
+def test_least_recently_used_circuits_are_forgotten():
+    registry = BreakerRegistry(failures=2, cooldown=30, max_circuits=2)
+    for account in ("a", "b", "c"):
+        registry.get("holdings", account)
+
+    assert registry.stats()["holdings"]["circuits"] == 2
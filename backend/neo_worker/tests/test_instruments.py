@@ -0,0 +1,63 @@
+import asyncio
+import datetime
+import csv
+import io
+
+import pytest
+
+import instruments
+from instruments import InstrumentIndex, InstrumentStore
+
+CSV = "pSymbol,pExchSeg,pTrdSymbol,pSymbolName,pInstType,lLotSize\n2885,nse_cm,RELIANCE-EQ,RELIANCE,EQ,1\n"
+
+
+def store_with(monkeypatch, builds, retry_interval=600):
+    """A store whose builds return the given row counts (or raise), counting attempts."""
+    calls = []
+
+    def build_index(day):
+        calls.append(day)
+        result = builds[min(len(calls), len(builds)) - 1]
+        if isinstance(result, Exception):
+            raise result
+        index = InstrumentIndex(as_of=day)
+        if result:
+            index.add_rows(csv.DictReader(io.StringIO(CSV)))
+        return index.finalize()
+
+    async def run_blocking(fn, *args):
+        return fn(*args)
+
+    monkeypatch.setattr(instruments, "build_index", build_index)
+    monkeypatch.setattr(instruments, "prune_cache", lambda day: None)
+    return InstrumentStore(retry_interval=retry_interval), run_blocking, calls
+
+
+def test_empty_build_is_not_retried_on_every_order(monkeypatch):
+    store, run_blocking, calls = store_with(monkeypatch, [0])
+
+    async def orders():
+        for _ in range(5):
+            store.refresh_in_background(run_blocking)
+            await asyncio.sleep(0)
+
+    asyncio.run(orders())
+    assert len(calls) == 1
+    assert store.stats()["backing_off"]
+
+
+def test_failed_build_backs_off_then_retries(monkeypatch):
+    store, run_blocking, calls = store_with(monkeypatch, [OSError("download failed"), 1], retry_interval=0.05)
+
+    async def scenario():
+        with pytest.raises(OSError):
+            await store.ensure_loaded(run_blocking)
+        with pytest.raises(RuntimeError):
+            await store.ensure_loaded(run_blocking)
+        await asyncio.sleep(0.06)
+        return await store.ensure_loaded(run_blocking)
+
+    index = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert index.as_of == datetime.date.today() and len(index) == 1
+    assert not store.backing_off()
@@ -0,0 +1,128 @@
+import asyncio
+
+from order_book import OrderBook
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def no_report():
+    return {"data": []}
+
+
+def test_wait_on_unknown_order_does_not_track_or_poll():
+    async def scenario():
+        book = OrderBook(poll_interval=0.01, retention=60)
+        order, changed = await book.wait("sid", "BOGUS123", 0.05, no_report)
+        await asyncio.sleep(0.05)
+        return book, order, changed
+
+    book, order, changed = run(scenario())
+    assert order is None and not changed
+    stats = book.stats()
+    assert stats["tracked"] == 0
+    assert stats["open"] == 0
+    assert stats["pollers"] == 0
+    assert stats["polls"] == 0
+
+
+def test_wait_on_another_sessions_order_is_refused():
+    async def scenario():
+        book = OrderBook(poll_interval=0.01, retention=60)
+        book.track("sid-a", "1001", symbol="HAL-EQ", side="B", qty="5")
+        result = await book.wait("sid-b", "1001", 0.05, no_report)
+        book.stop()
+        return book, result
+
+    book, (order, changed) = run(scenario())
+    assert order is None and not changed
+    assert book.get("1001", "sid-b") is None
+    assert book.get("1001", "sid-a").symbol == "HAL-EQ"
+
+
+def test_wait_returns_on_fill():
+    async def scenario():
+        book = OrderBook(poll_interval=0.01, retention=60)
+        book.track("sid", "1001", symbol="HAL-EQ", side="B", qty="5")
+
+        async def report():
+            return {"data": [{"nOrdNo": "1001", "ordSt": "complete", "fldQty": 5, "avgPrc": "10.0"}]}
+
+        result = await book.wait("sid", "1001", 1, report)
+        book.stop()
+        return result
+
+    order, changed = run(scenario())
+    assert changed and order.terminal and order.filled_qty == 5
+
+
+class Unauthorized(Exception):
+    status_code = 401
+
+
+def test_poller_stops_after_repeated_failures():
+    calls = []
+
+    async def failing_report():
+        calls.append(1)
+        raise ConnectionError("broker down")
+
+    async def scenario():
+        book = OrderBook(poll_interval=0.01, retention=60, idle_interval=0.01, max_failures=3)
+        book.track("sid", "1001")
+        book.ensure_poller("sid", failing_report)
+        await asyncio.sleep(0.2)
+        return book
+
+    book = run(scenario())
+    assert len(calls) == 3
+    assert book.stats()["pollers"] == 0
+    assert book.get("1001") is not None
+
+
+def test_expired_session_drops_its_orders():
+    async def expired():
+        raise Unauthorized("session expired")
+
+    async def scenario():
+        book = OrderBook(poll_interval=0.01, retention=60)
+        book.track("sid", "1001")
+        book.track("other", "2002")
+        book.ensure_poller("sid", expired)
+        await asyncio.sleep(0.05)
+        return book
+
+    book = run(scenario())
+    assert book.get("1001") is None and book.get("2002") is not None
+    assert book.stats()["pollers"] == 0 and book.stats()["dropped"] == 1
+
+
+def test_open_orders_without_waiters_poll_at_the_idle_interval():
+    calls = []
+
+    async def report():
+        calls.append(1)
+        return {"data": []}
+
+    async def scenario():
+        book = OrderBook(poll_interval=0.01, retention=60, idle_interval=10)
+        book.track("sid", "1001")
+        book.ensure_poller("sid", report)
+        await asyncio.sleep(0.1)
+        idle = len(calls)
+        # A waiter cuts the idle sleep short and polls at the fast interval.
+        await book.wait("sid", "1001", 0.1, report)
+        book.stop()
+        return idle, len(calls)
+
+    idle, total = run(scenario())
+    assert idle == 1
+    assert total > 3
+
+
+def test_open_orders_are_pruned_after_max_age():
+    book = OrderBook(poll_interval=0.01, retention=60, max_age=0)
+    book.track("sid", "1001")
+    book._prune()
+    assert book.get("1001") is None
@@ -0,0 +1,90 @@
+import pytest
+
+from pre_trade import PreTradeChecker, PreTradeRejected
+
+SELL = {"trading_symbol": "INFY-EQ", "transaction_type": "S", "quantity": "100", "order_type": "MKT",
+        "exchange_segment": "nse_cm", "product": "CNC"}
+
+
+def holdings(qty):
+    return {"data": [{"displaySymbol": "INFY", "quantity": qty, "sellableQuantity": qty, "closingPrice": 1500}]}
+
+
+def positions(buy, sell):
+    return {"data": [{"trdSym": "INFY-EQ", "prod": "CNC", "flBuyQty": str(buy), "flSellQty": str(sell)}]}
+
+
+def test_positions_read_does_not_release_a_sell_of_held_shares():
+    checker = PreTradeChecker(max_age=300, max_sessions=8)
+    checker.observe("sid", "holdings", holdings(100))
+    checker.confirm(checker.reserve("sid", SELL, checker.check("sid", SELL)["order_value"]))
+
+    # The fill shows up in positions, but the holdings read above predates it.
+    checker.observe("sid", "positions", positions(0, 100))
+
+    with pytest.raises(PreTradeRejected) as rejected:
+        checker.check("sid", SELL)
+    assert rejected.value.check == "holdings"
+
+
+def test_holdings_read_after_the_sell_replaces_the_reservation():
+    checker = PreTradeChecker(max_age=300, max_sessions=8)
+    checker.observe("sid", "holdings", holdings(100))
+    checker.confirm(checker.reserve("sid", SELL))
+
+    checker.observe("sid", "holdings", holdings(40))
+
+    assert checker.sellable(checker._state("sid"), "INFY") == 40
+
+
+def test_todays_delivery_buys_are_sellable():
+    checker = PreTradeChecker(max_age=300, max_sessions=8)
+    checker.observe("sid", "holdings", {"data": []})
+    checker.observe("sid", "positions", positions(100, 0))
+
+    assert "holdings" in checker.check("sid", SELL)["passed"]
+
+
+def test_concurrent_sells_are_held_against_each_other_before_the_broker_answers():
+    checker = PreTradeChecker(max_age=300, max_sessions=8)
+    checker.observe("sid", "holdings", holdings(100))
+    first = checker.reserve("sid", SELL, checker.check("sid", SELL)["order_value"])
+
+    # A read arriving while the first order is in flight does not release it.
+    checker.observe("sid", "holdings", holdings(100))
+    with pytest.raises(PreTradeRejected):
+        checker.check("sid", SELL)
+
+    # The broker rejected the first order: its shares are sellable again.
+    checker.release("sid", first)
+    assert "holdings" in checker.check("sid", SELL)["passed"]
+
+
+def test_confirmed_order_is_covered_by_the_next_holdings_read():
+    checker = PreTradeChecker(max_age=300, max_sessions=8)
+    checker.observe("sid", "holdings", holdings(100))
+    checker.confirm(checker.reserve("sid", SELL))
+
+    checker.observe("sid", "holdings", holdings(0))
+
+    assert checker._state("sid").reserved == []
+
+
+@pytest.mark.parametrize("payload", [{"error": [{"code": "900901", "message": "Invalid Credentials"}]},
+                                     {"stat": "Not_Ok", "emsg": "Session expired"},
+                                     {"message": "no data key"}])
+def test_error_reads_do_not_replace_the_last_good_holdings(payload):
+    checker = PreTradeChecker(max_age=300, max_sessions=8)
+    checker.observe("sid", "holdings", holdings(100))
+
+    checker.observe("sid", "holdings", payload)
+
+    assert "holdings" in checker.check("sid", SELL)["passed"]
+    assert checker.stats()["unreadable"] == 1
+
+
+def test_error_read_alone_skips_the_check_instead_of_rejecting():
+    checker = PreTradeChecker(max_age=300, max_sessions=8)
+    checker.observe("sid", "holdings", {"stat": "Not_Ok", "emsg": "Session expired"})
+
+    assert "holdings" in checker.check("sid", SELL)["skipped"]
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+import pytest
+
+from rate_limiter import BrokerRateScheduler, RateLimitExceeded
+
+
+def scheduler(rate=1.0, burst=1, max_wait=30):
+    return BrokerRateScheduler(budgets={"read": (rate, burst), "order": (rate, burst)},
+                               queue_size=10, max_wait=max_wait)
+
+
+def test_local_bucket_refuses_instead_of_sleeping_past_max_wait():
+    limiter = scheduler()
+
+    async def scenario():
+        await limiter.acquire("k", "read")
+        started = time.monotonic()
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire("k", "read", max_wait=0)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 0.05
+    assert limiter.rejected["read"] == 1
+
+
+def test_local_bucket_waits_for_a_token_within_max_wait():
+    limiter = scheduler(rate=20.0)
+
+    async def scenario():
+        await limiter.acquire("k", "read")
+        started = time.monotonic()
+        await limiter.acquire("k", "read", max_wait=1)
+        return time.monotonic() - started
+
+    assert 0.02 < asyncio.run(scenario()) < 0.5
+    assert limiter.granted["read"] == 2
+
+
+def test_redis_failure_falls_back_to_the_same_deadline_checks():
+    limiter = scheduler()
+
+    async def broken_script(**kwargs):
+        raise ConnectionError("redis down")
+
+    limiter._script = broken_script
+
+    async def scenario():
+        await limiter.acquire("k", "order")
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire("k", "order", max_wait=0)
+
+    asyncio.run(scenario())
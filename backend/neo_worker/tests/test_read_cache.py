@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import pytest
+
+from deadlines import DeadlineExceeded, _deadline
+from read_cache import ReadCache
+
+
+async def with_budget(budget: float, coro_fn):
+    _deadline.set(time.monotonic() + budget)
+    return await coro_fn()
+
+
+def test_coalesced_callers_keep_their_own_deadlines():
+    async def scenario():
+        cache = ReadCache(ttl=5, max_size=10)
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.2)
+            return {"data": []}
+
+        short = asyncio.ensure_future(with_budget(0.05, lambda: cache.get("sid", "holdings", load)))
+        await asyncio.sleep(0)
+        long = asyncio.ensure_future(with_budget(10, lambda: cache.get("sid", "holdings", load)))
+        return await asyncio.gather(short, long, return_exceptions=True), calls
+
+    (short, long), calls = asyncio.run(scenario())
+    assert isinstance(short, DeadlineExceeded)
+    assert long == ({"data": []}, False, 0.0)
+    assert calls == 1
+
+
+def test_shared_load_does_not_inherit_the_first_callers_deadline():
+    async def scenario():
+        cache = ReadCache(ttl=5, max_size=10)
+        seen = []
+
+        async def load():
+            seen.append(_deadline.get())
+            return 1
+
+        await with_budget(1, lambda: cache.get("sid", "limits", load))
+        return seen
+
+    assert asyncio.run(scenario()) == [None]
+
+
+def test_spent_budget_fails_fast():
+    async def scenario():
+        cache = ReadCache(ttl=5, max_size=10)
+
+        async def load():
+            await asyncio.sleep(1)
+
+        with pytest.raises(DeadlineExceeded):
+            await with_budget(-1, lambda: cache.get("sid", "limits", load))
+
+    asyncio.run(scenario())
+
+
+def test_load_running_during_invalidate_does_not_repopulate_or_leave_state():
+    cache = ReadCache(ttl=60, max_size=16)
+    release = asyncio.Event()
+
+    async def slow_loader():
+        await release.wait()
+        return "before-order"
+
+    async def scenario():
+        reader = asyncio.ensure_future(cache.get("sid", "holdings", slow_loader))
+        await asyncio.sleep(0)
+        cache.invalidate("sid")
+        release.set()
+        value, cached, _ = await reader
+        return value, cached
+
+    assert asyncio.run(scenario()) == ("before-order", False)
+    assert cache.stats()["size"] == 0 and cache.stats()["in_flight"] == 0
@@ -0,0 +1,25 @@
+from read_versions import diff
+
+
+def test_removed_holdings_are_named_by_symbol():
+    old = {"data": [
+        {"instrumentName": "RELIANCE", "displaySymbol": "RELIANCE", "exchangeSegment": "nse_cm",
+         "instrumentToken": 2885, "quantity": 5},
+        {"instrumentName": "IDEA", "displaySymbol": "IDEA", "exchangeSegment": "nse_cm",
+         "instrumentToken": 14366, "quantity": 100},
+    ]}
+    new = {"data": [dict(old["data"][0], quantity=6)]}
+
+    changes = diff("holdings", old, new)
+
+    assert [r["quantity"] for r in changes["changed"]] == [6]
+    assert changes["removed"] == [{"instrumentName": "IDEA", "displaySymbol": "IDEA",
+                                   "exchangeSegment": "nse_cm", "instrumentToken": 14366}]
+
+
+def test_removed_positions_carry_trading_symbol():
+    old = {"data": [{"trdSym": "SBIN-EQ", "exSeg": "nse_cm", "prod": "MIS", "tok": "3045", "flBuyQty": "1"}]}
+
+    changes = diff("positions", old, {"data": []})
+
+    assert changes["removed"] == [{"trdSym": "SBIN-EQ", "exSeg": "nse_cm", "prod": "MIS", "tok": "3045"}]
@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip("redis")
+
+from session_store import decode_session, encode_session
+
+SESSION = {"TRADING_TOKEN": "tok", "TRADING_SID": "sid", "BASE_URL": "https://x", "consumer_key": "ck",
+           "environment": "prod", "neo_fin_key": "neotradeapi", "extra": 1}
+
+
+def test_round_trip():
+    assert decode_session(encode_session(SESSION)) == SESSION
+
+
+@pytest.mark.parametrize("cut", [0, 1, 2, 5, 10])
+def test_empty_or_truncated_blob_is_a_missing_session(cut):
+    assert decode_session(encode_session(SESSION)[:cut]) is None
+
+
+def test_truncated_legacy_json_is_a_missing_session():
+    assert decode_session(b'{"TRADING_TOKEN": "t') is None
@@ -0,0 +1,34 @@
+import time
+
+import numpy as np
+
+from snapshot_store import INDEX_DTYPE, SnapshotStore, _day
+
+HOLDINGS = {"data": [{"displaySymbol": "INFY", "quantity": 10, "averagePrice": 1400, "closingPrice": 1500}]}
+
+
+def test_index_stays_in_time_order_when_writes_land_out_of_order(tmp_path):
+    store = SnapshotStore(str(tmp_path), min_interval=0, retention_days=90)
+    now = time.time()
+
+    # Two snapshots requested at now and now-5 whose writes reach the lock in reverse order.
+    store.append("acct", "holdings", HOLDINGS, now)
+    store.append("acct", "holdings", HOLDINGS, now - 5)
+    store.append("acct", "holdings", HOLDINGS)
+
+    _, index_path = store._paths(_day(now), "holdings")
+    ts = np.fromfile(index_path, dtype=INDEX_DTYPE)["ts"]
+    assert len(ts) == 3
+    assert np.all(np.diff(ts) >= 0)
+    assert store.query("acct", "holdings", now - 60, now + 60)["snapshots"] == 3
+
+
+def test_query_range_is_clamped_to_retention(tmp_path):
+    store = SnapshotStore(str(tmp_path), min_interval=0, retention_days=3)
+    store.append("acct", "holdings", HOLDINGS)
+    now = time.time()
+
+    for start in (now - 1e6 * 86400, -1e308, float("nan")):
+        result = store.query("acct", "holdings", start, now)
+        assert result["snapshots"] == 1
+    assert store.query("acct", "holdings", now - 60, 1e308)["snapshots"] == 1
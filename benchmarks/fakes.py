@@ -0,0 +1,234 @@
+"""Offline stand-ins for the Kotak Neo client and Redis used by the benchmarks.
+
+install() registers them under the real module names (neo_api_client,
+redis.asyncio) so the worker can be imported unchanged.
+"""
+import random
+import sys
+import time
+import types
+import uuid
+
+
+class LatencyProfile:
+    """Broker behaviour: latency in ms (normal, clipped at 0) and an error rate."""
+
+    def __init__(self, mean_ms: float = 50.0, jitter_ms: float = 10.0, error_rate: float = 0.0, seed: int = 0):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    def wait(self):
+        delay = max(0.0, self._random.gauss(self.mean_ms, self.jitter_ms)) / 1000
+        time.sleep(delay)
+        if self._random.random() < self.error_rate:
+            raise RuntimeError("fake broker error")
+
+
+def make_holdings(n: int):
+    rows = []
+    for i in range(n):
+        qty = 10 + i
+        avg = 100.0 + i
+        close = avg * 1.05
+        rows.append({
+            "instrumentName": f"STOCK{i:04d}",
+            "displaySymbol": f"STOCK{i:04d}",
+            "exchangeSegment": "nse_cm",
+            "instrumentToken": 10000 + i,
+            "quantity": qty,
+            "averagePrice": avg,
+            "holdingCost": qty * avg,
+            "closingPrice": close,
+            "mktValue": qty * close,
+            "unrealisedGainLoss": qty * (close - avg),
+            "sellableQuantity": qty,
+            "securityType": "Equity",
+            "instrumentType": "Equity",
+            "isAlternateScrip": False,
+        })
+    return {"data": rows}
+
+
+def make_positions(n: int):
+    rows = []
+    for i in range(n):
+        rows.append({
+            "trdSym": f"STOCK{i:04d}-EQ", "exSeg": "nse_cm", "prod": "MIS", "tok": str(10000 + i),
+            "flBuyQty": "10", "flSellQty": "5", "cfBuyQty": "0", "cfSellQty": "0",
+            "buyAmt": "1000.00", "sellAmt": "520.00", "cfBuyAmt": "0.00", "cfSellAmt": "0.00",
+            "lotSz": "1", "multiplier": "1", "genNum": "1", "genDen": "1", "prcNum": "1", "prcDen": "1",
+        })
+    return {"stat": "Ok", "stCode": 200, "data": rows}
+
+
+LIMITS = {
+    "stat": "Ok", "stCode": 200, "Net": "100000.00", "MarginUsed": "2500.00",
+    "CollateralValue": "102500.00", "Collateral": "0.00", "RmsPayInAmt": "0.00",
+}
+
+
+class FakeNeoAPI:
+    """Mimics the NeoAPI methods the worker calls. Class attributes configure it."""
+
+    profile = LatencyProfile()
+    holdings_rows = 100
+    positions_rows = 20
+
+    def __init__(self, environment=None, access_token=None, neo_fin_key=None, consumer_key=None, **kwargs):
+        self.configuration = types.SimpleNamespace(
+            consumer_key=consumer_key, neo_fin_key=neo_fin_key, base_url=None,
+            edit_token=None, edit_sid=None, bearer_token=access_token,
+        )
+        self.on_message = self.on_error = self.on_close = self.on_open = None
+
+    def totp_login(self, mobile_number=None, ucc=None, totp=None):
+        self.profile.wait()
+        return {"data": {"token": "view-token", "sid": "view-sid"}}
+
+    def totp_validate(self, mpin=None):
+        self.profile.wait()
+        self.configuration.edit_token = "trade-token-" + uuid.uuid4().hex
+        self.configuration.edit_sid = "trade-sid"
+        self.configuration.base_url = "https://fake.neo"
+        return {"data": {"token": self.configuration.edit_token}}
+
+    def holdings(self):
+        self.profile.wait()
+        return make_holdings(self.holdings_rows)
+
+    def positions(self):
+        self.profile.wait()
+        return make_positions(self.positions_rows)
+
+    def limits(self):
+        self.profile.wait()
+        return dict(LIMITS)
+
+    # Orders placed through any fake client; they fill after fill_after seconds.
+    orders = {}
+    fill_after = 1.0
+
+    def place_order(self, **kwargs):
+        self.profile.wait()
+        order_id = str(uuid.uuid4().int)[:15]
+        self.orders[order_id] = (time.monotonic(), kwargs)
+        return {"stat": "Ok", "stCode": 200, "nOrdNo": order_id}
+
+    def order_report(self):
+        self.profile.wait()
+        now = time.monotonic()
+        rows = []
+        for order_id, (placed, kwargs) in self.orders.items():
+            filled = now - placed >= self.fill_after
+            rows.append({
+                "nOrdNo": order_id, "trdSym": kwargs.get("trading_symbol"),
+                "ordSt": "complete" if filled else "open",
+                "fldQty": int(kwargs.get("quantity", 0)) if filled else 0,
+                "avgPrc": "100.00" if filled else "0.00",
+            })
+        return {"stat": "Ok", "stCode": 200, "data": rows}
+
+    def scrip_master(self, exchange_segment=None):
+        return {"data": {"filesPaths": []}}
+
+    def subscribe(self, instrument_tokens=None, isIndex=False, isDepth=False):
+        return None
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        method = getattr(self._redis, name)
+
+        def queue(*args, **kwargs):
+            self._ops.append((method, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        results = [await method(*args, **kwargs) for method, args, kwargs in self._ops]
+        self._ops = []
+        return results
+
+
+class FakeRedis:
+    """In-memory subset of redis.asyncio.Redis. Every command counts as one round trip."""
+
+    def __init__(self, *args, **kwargs):
+        self._data = {}
+        self.round_trips = 0
+
+    async def ping(self):
+        self.round_trips += 1
+        return True
+
+    async def get(self, key):
+        self.round_trips += 1
+        return self._data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.round_trips += 1
+        self._data[key] = value
+        return True
+
+    async def expire(self, key, seconds):
+        self.round_trips += 1
+        return key in self._data
+
+    async def close(self):
+        return None
+
+    aclose = close
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class _Pipeline(FakePipeline):
+            async def execute(self):
+                redis.round_trips += 1 - len(self._ops)
+                return await super().execute()
+        return _Pipeline(self)
+
+    def register_script(self, script):
+        if "'EXPIRE'" in script:
+            # Session get-and-touch: one value (or None) per key.
+            async def get_and_touch(keys=None, args=None, client=None):
+                self.round_trips += 1
+                return [self._data.get(key) for key in keys]
+            return get_and_touch
+
+        async def run(keys=None, args=None, client=None):
+            # Rate-limit buckets are not modelled: every call gets a token.
+            self.round_trips += 1
+            return 0
+        return run
+
+
+_shared_redis = FakeRedis()
+
+
+def install():
+    """Registers the fakes as neo_api_client and redis.asyncio."""
+    neo_module = types.ModuleType("neo_api_client")
+    neo_module.NeoAPI = FakeNeoAPI
+    sys.modules["neo_api_client"] = neo_module
+
+    redis_asyncio = types.ModuleType("redis.asyncio")
+    redis_asyncio.Redis = lambda *args, **kwargs: _shared_redis
+    redis_asyncio.BlockingConnectionPool = lambda *args, **kwargs: None
+    redis_module = sys.modules.get("redis") or types.ModuleType("redis")
+    redis_module.asyncio = redis_asyncio
+    sys.modules["redis"] = redis_module
+    sys.modules["redis.asyncio"] = redis_asyncio
+    return _shared_redis
@@ -0,0 +1,248 @@
+"""Offline load/latency benchmark for the MCP tools, neo_worker and main_api.
+
+Everything runs in one process: the worker and gateway apps are driven through
+httpx.ASGITransport, the broker is FakeNeoAPI and Redis is FakeRedis.
+
+    python benchmarks/run_bench.py --requests 500 --concurrency 20 --out bench.json
+    python benchmarks/run_bench.py --compare old.json new.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, os.path.join(ROOT, "backend", "neo_worker"))
+sys.path.insert(0, os.path.join(ROOT, "backend", "main_api"))
+sys.path.insert(0, ROOT)
+
+import fakes  # noqa: E402
+
+WORKER_BASE = "http://neo-worker:8001"
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+async def run_scenario(name: str, call, requests: int, concurrency: int):
+    """Runs call() `requests` times with `concurrency` callers; returns a summary dict."""
+    latencies = []
+    errors = {}
+    remaining = iter(range(requests))
+
+    async def caller():
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                await call()
+            except Exception as e:
+                kind = type(e).__name__
+                errors[kind] = errors.get(kind, 0) + 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_s": round(wall, 4),
+        "throughput_rps": round(requests / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+def checked(response):
+    response.raise_for_status()
+    return response
+
+
+async def create_session(worker, consumer_key: str = "bench-key"):
+    response = await worker.post("/worker/validate/", json={
+        "totp": "123456", "consumer_key": consumer_key, "mobile_number": "+910000000000",
+        "ucc": "BENCH", "mpin": "1234",
+    })
+    return checked(response).json()["session_id"]
+
+
+def worker_scenarios(worker, session_id: str, refresh: bool):
+    params = {"refresh": "true"} if refresh else {}
+    leg = {"side": "B", "qty": 1, "symbol": "STOCK0001"}
+    return {
+        "worker.holdings": lambda: worker.get(f"/worker/holdings/{session_id}", params=params),
+        "worker.holdings.projected": lambda: worker.get(
+            f"/worker/holdings/{session_id}",
+            params={**params, "fields": "instrumentName,quantity,averagePrice"}),
+        "worker.limits": lambda: worker.get(f"/worker/limits/{session_id}", params=params),
+        "worker.positions": lambda: worker.get(f"/worker/positions/{session_id}", params=params),
+        "worker.portfolio": lambda: worker.get(f"/worker/portfolio/{session_id}", params=params),
+        "worker.analytics": lambda: worker.get(f"/worker/analytics/{session_id}", params=params),
+        "worker.buy": lambda: worker.post(f"/worker/buy/{session_id}", json={"qty": 1, "stock": "STOCK0001"}),
+        "worker.orders.batch5": lambda: worker.post(
+            "/worker/orders/batch", json={"session_id": session_id, "legs": [leg] * 5}),
+    }
+
+
+def gateway_scenarios(gateway, session_id: str):
+    return {
+        "gateway.holdings": lambda: gateway.get("/holdings/get-holdings", params={"session_id": session_id}),
+        "gateway.limits": lambda: gateway.get("/limits/get-limits", params={"session_id": session_id}),
+        "gateway.portfolio": lambda: gateway.get("/portfolio/get-portfolio", params={"session_id": session_id}),
+    }
+
+
+def mcp_scenarios(mcp_server):
+    return {
+        "mcp.get_holdings": lambda: mcp_server.mcp.call_tool("get_holdings", {}),
+        "mcp.get_portfolio": lambda: mcp_server.mcp.call_tool("get_portfolio", {}),
+        "mcp.get_limits": lambda: mcp_server.mcp.call_tool("get_limits", {}),
+        "mcp.portfolio_analytics": lambda: mcp_server.mcp.call_tool("portfolio_analytics", {}),
+        "mcp.get_holdings_all_accounts": lambda: mcp_server.mcp.call_tool(
+            "get_holdings_all_accounts", {"refresh": True}),
+    }
+
+
+def route_gateway_to_worker(worker_transport):
+    """Points the gateway's shared worker client at the in-process worker."""
+    import httpx
+    from app import proxy
+    proxy.worker_client = httpx.AsyncClient(transport=worker_transport, base_url=WORKER_BASE)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+async def main(args):
+    redis = fakes.install()
+    fakes.FakeNeoAPI.profile = fakes.LatencyProfile(args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    fakes.FakeNeoAPI.holdings_rows = args.holdings
+    fakes.FakeNeoAPI.positions_rows = args.positions
+
+    import httpx
+    import neo_app
+
+    await neo_app.startup_event()
+    worker_transport = httpx.ASGITransport(app=neo_app.app)
+    targets = set(args.targets.split(","))
+    results = []
+    try:
+        async with httpx.AsyncClient(transport=worker_transport, base_url=WORKER_BASE) as worker:
+            session_id = await create_session(worker)
+            scenarios = {}
+            if "worker" in targets:
+                scenarios.update({name: (lambda c=call: checked_call(c))
+                                  for name, call in worker_scenarios(worker, session_id, args.no_cache).items()})
+            if "gateway" in targets:
+                route_gateway_to_worker(worker_transport)
+                from app.main import app as gateway_app
+                gateway = httpx.AsyncClient(transport=httpx.ASGITransport(app=gateway_app), base_url="http://gateway")
+                scenarios.update({name: (lambda c=call: checked_call(c))
+                                  for name, call in gateway_scenarios(gateway, session_id).items()})
+            if "mcp" in targets:
+                os.environ["NEO_SESSION_ID"] = session_id
+                import mcp_server
+                # FastMCP turns on INFO logging; per-request httpx lines would drown the report.
+                logging.getLogger("httpx").setLevel(logging.WARNING)
+                mcp_server.NEO_SESSION_ID = session_id
+                # One account per consumer key, so each has its own rate budget.
+                mcp_server.SESSIONS = {"default": session_id}
+                for i in range(1, args.accounts):
+                    mcp_server.SESSIONS[f"account{i}"] = await create_session(worker, f"bench-key-{i}")
+                mcp_server.http_client = httpx.AsyncClient(transport=worker_transport, base_url=WORKER_BASE)
+                scenarios.update(mcp_scenarios(mcp_server))
+
+            for name, call in scenarios.items():
+                if args.only and args.only not in name:
+                    continue
+                before = redis.round_trips
+                for _ in range(args.warmup):
+                    try:
+                        await call()
+                    except Exception:
+                        pass
+                summary = await run_scenario(name, call, args.requests, args.concurrency)
+                summary["redis_round_trips"] = redis.round_trips - before
+                results.append(summary)
+                print(f"{name:28s} {summary['throughput_rps']:>9.1f} rps  "
+                      f"p50 {summary['p50_ms']:>8.2f}  p95 {summary['p95_ms']:>8.2f}  "
+                      f"p99 {summary['p99_ms']:>8.2f} ms  errors {sum(summary['errors'].values())}")
+    finally:
+        await neo_app.shutdown_event()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "config": vars(args),
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.out}")
+    return report
+
+
+async def checked_call(call):
+    checked(await call())
+
+
+def compare(old_path: str, new_path: str):
+    with open(old_path) as f:
+        old = {r["scenario"]: r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {r["scenario"]: r for r in json.load(f)["results"]}
+    print(f"{'scenario':28s} {'rps':>16s} {'p50 ms':>18s} {'p99 ms':>18s}")
+    for name in sorted(old.keys() & new.keys()):
+        o, n = old[name], new[name]
+        print(f"{name:28s} {o['throughput_rps']:>7.1f}->{n['throughput_rps']:<8.1f}"
+              f" {o['p50_ms']:>8.2f}->{n['p50_ms']:<8.2f} {o['p99_ms']:>8.2f}->{n['p99_ms']:<8.2f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default="worker,gateway,mcp", help="comma-separated: worker,gateway,mcp")
+    parser.add_argument("--only", default=None, help="run only scenarios whose name contains this")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mean fake broker latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of broker calls that fail")
+    parser.add_argument("--holdings", type=int, default=100, help="rows in the fake holdings payload")
+    parser.add_argument("--positions", type=int, default=20, help="rows in the fake positions payload")
+    parser.add_argument("--accounts", type=int, default=4, help="accounts read by the *_all_accounts scenarios")
+    parser.add_argument("--no-cache", action="store_true", help="send refresh=true on worker reads")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="write JSON results here")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files and exit")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.compare:
+        compare(*args.compare)
+    else:
+        asyncio.run(main(args))
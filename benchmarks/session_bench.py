@@ -0,0 +1,164 @@
+"""Micro-benchmark of the worker's session store against the previous JSON path.
+
+Compares, per session lookup:
+  - encoding: size and encode/decode time of the JSON blob vs the binary format
+  - Redis: round trips and time of GET + EXPIRE + json.loads (pipelined) vs the
+    get-and-touch script + binary decode, for one session and for a batch
+
+Runs offline against the fake Redis by default (round trips are counted, times
+are in-process only); pass --redis-host to measure against a real Redis.
+
+    python benchmarks/session_bench.py
+    python benchmarks/session_bench.py --redis-host 127.0.0.1 --batch 50 --out sessions.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, os.path.join(ROOT, "backend", "neo_worker"))
+
+
+def sample_session():
+    """A session shaped like the ones /worker/validate/ stores (JWT-sized tokens)."""
+    return {
+        "TRADING_TOKEN": "eyJhbGciOiJSUzI1NiJ9." + "x" * 900 + ".sig" + "y" * 340,
+        "TRADING_SID": str(uuid.uuid4()),
+        "BASE_URL": "https://cis.kotaksecurities.com/apim",
+        "consumer_key": "c" * 28,
+        "environment": "prod",
+        "neo_fin_key": "neotradeapi",
+    }
+
+
+def per_call_us(fn, n: int) -> float:
+    started = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - started) / n * 1e6
+
+
+async def per_call_async_us(fn, n: int) -> float:
+    started = time.perf_counter()
+    for _ in range(n):
+        await fn()
+    return (time.perf_counter() - started) / n * 1e6
+
+
+def encoding_results(session_store, n: int):
+    data = sample_session()
+    as_json = json.dumps(data)
+    as_binary = session_store.encode_session(data)
+    assert session_store.decode_session(as_binary) == data
+    return {
+        "json_bytes": len(as_json.encode()),
+        "binary_bytes": len(as_binary),
+        "json_encode_us": round(per_call_us(lambda: json.dumps(data), n), 2),
+        "binary_encode_us": round(per_call_us(lambda: session_store.encode_session(data), n), 2),
+        "json_decode_us": round(per_call_us(lambda: json.loads(as_json), n), 2),
+        "binary_decode_us": round(per_call_us(lambda: session_store.decode_session(as_binary), n), 2),
+    }
+
+
+async def legacy_lookup(redis, session_id: str, ttl: int):
+    """The previous path: pipelined GET + EXPIRE, then json.loads."""
+    key = f"session:{session_id}"
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.get(key)
+        pipe.expire(key, ttl)
+        blob, _ = await pipe.execute()
+    return json.loads(blob)
+
+
+async def redis_results(session_store, redis, n: int, batch: int, counter):
+    store = session_store.SessionStore(ttl=session_store.SESSION_TTL, batch_size=session_store.SESSION_BATCH_SIZE)
+    store.attach(redis)
+    data = sample_session()
+    legacy_ids, ids = [], []
+    for _ in range(batch):
+        legacy_id, session_id = str(uuid.uuid4()), str(uuid.uuid4())
+        await redis.set(f"session:{legacy_id}", json.dumps(data), ex=store.ttl)
+        await store.put(session_id, data)
+        legacy_ids.append(legacy_id)
+        ids.append(session_id)
+
+    async def single():
+        return session_store.decode_session(await store.get(ids[0]))
+
+    async def legacy_batch():
+        return await asyncio.gather(*(legacy_lookup(redis, s, store.ttl) for s in legacy_ids))
+
+    async def new_batch():
+        return [session_store.decode_session(b) for b in (await store.get_many(ids)).values()]
+
+    results = {}
+    for name, call in (
+        ("legacy_single", lambda: legacy_lookup(redis, legacy_ids[0], store.ttl)),
+        ("store_single", single),
+        (f"legacy_batch{batch}", legacy_batch),
+        (f"store_batch{batch}", new_batch),
+    ):
+        await call()
+        before = counter()
+        us = await per_call_async_us(call, n)
+        trips = counter()
+        results[name] = {
+            "us": round(us, 2),
+            "round_trips": None if trips is None else round((trips - before) / n, 2),
+        }
+    return results
+
+
+async def main(args):
+    if args.redis_host:
+        import redis.asyncio as aioredis
+        redis = aioredis.Redis(host=args.redis_host, port=args.redis_port, decode_responses=False)
+        counter = lambda: None
+    else:
+        import fakes
+        redis = fakes.install()
+        counter = lambda: redis.round_trips
+    import session_store
+
+    report = {
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "backend": f"redis://{args.redis_host}:{args.redis_port}" if args.redis_host else "fake",
+        "encoding": encoding_results(session_store, args.encode_iterations),
+        "lookups": await redis_results(session_store, redis, args.iterations, args.batch, counter),
+    }
+    if args.redis_host:
+        await redis.aclose()
+
+    enc = report["encoding"]
+    print(f"size      json {enc['json_bytes']:>6} B   binary {enc['binary_bytes']:>6} B")
+    print(f"encode    json {enc['json_encode_us']:>6.2f} us  binary {enc['binary_encode_us']:>6.2f} us")
+    print(f"decode    json {enc['json_decode_us']:>6.2f} us  binary {enc['binary_decode_us']:>6.2f} us")
+    for name, r in report["lookups"].items():
+        trips = "-" if r["round_trips"] is None else r["round_trips"]
+        print(f"{name:18s} {r['us']:>10.2f} us/call  round trips/call {trips}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.out}")
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000, help="lookups per scenario")
+    parser.add_argument("--encode-iterations", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=20, help="sessions per batch lookup")
+    parser.add_argument("--redis-host", default=None, help="measure against this Redis instead of the fake")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--out", default=None, help="write JSON results here")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
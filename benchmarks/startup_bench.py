@@ -0,0 +1,162 @@
+"""Cold-start benchmark for the stdio MCP server.
+
+Starts `mcp_server.py` the way Claude Desktop does (a fresh process speaking
+JSON-RPC over stdin/stdout) and times the first initialize response and the
+first tools/list response. No worker is needed: no tool is called.
+
+    python benchmarks/startup_bench.py --runs 10 --out startup.json
+    python benchmarks/startup_bench.py --runs 10 --max-ms 1500   # fails above budget
+    python benchmarks/startup_bench.py --imports                 # slowest imports
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(ROOT, "mcp_server.py")
+
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {
+        "protocolVersion": "2025-06-18",
+        "capabilities": {},
+        "clientInfo": {"name": "startup-bench", "version": "0"},
+    },
+}
+INITIALIZED = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+LIST_TOOLS = {"jsonrpc": "2.0", "id": 2, "method": "tools/list"}
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def send(proc, message):
+    proc.stdin.write(json.dumps(message) + "\n")
+    proc.stdin.flush()
+
+
+def read_response(proc, request_id):
+    """Reads stdout lines until the response to request_id arrives."""
+    while True:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"server exited before answering request {request_id}: "
+                               f"{proc.stderr.read()[-2000:]}")
+        message = json.loads(line)
+        if message.get("id") == request_id:
+            if "error" in message:
+                raise RuntimeError(f"request {request_id} failed: {message['error']}")
+            return message
+
+
+def measure_once(python: str):
+    """Returns (ms to initialize response, ms to tools/list response, tool count)."""
+    env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+    started = time.perf_counter()
+    proc = subprocess.Popen([python, SERVER], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, text=True, env=env, cwd=ROOT)
+    try:
+        send(proc, INITIALIZE)
+        read_response(proc, 1)
+        initialize_ms = (time.perf_counter() - started) * 1000
+        send(proc, INITIALIZED)
+        send(proc, LIST_TOOLS)
+        tools = read_response(proc, 2)["result"]["tools"]
+        tools_ms = (time.perf_counter() - started) * 1000
+    finally:
+        proc.stdin.close()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+    return initialize_ms, tools_ms, len(tools)
+
+
+def slowest_imports(python: str, top: int):
+    """Cumulative time of each module mcp_server imports, from `python -X importtime`."""
+    result = subprocess.run([python, "-X", "importtime", "-c", "import mcp_server"],
+                            capture_output=True, text=True, cwd=ROOT)
+    # Children are printed before their parent, indented two spaces per level.
+    children, direct = [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative)))
+        elif depth == 0:
+            if name.strip() == "mcp_server":
+                direct = children + [("mcp_server (total)", int(cumulative))]
+            children = []
+    for module, us in sorted(direct, key=lambda kv: -kv[1])[:top]:
+        print(f"{module:40s} {us / 1000:>8.1f} ms")
+
+
+def main(args):
+    if args.imports:
+        slowest_imports(args.python, args.top)
+        return 0
+
+    for _ in range(args.warmup):
+        measure_once(args.python)
+    initialize, tools = [], []
+    for _ in range(args.runs):
+        init_ms, tools_ms, tool_count = measure_once(args.python)
+        initialize.append(init_ms)
+        tools.append(tools_ms)
+    initialize.sort()
+    tools.sort()
+    summary = {
+        "runs": args.runs,
+        "tools": tool_count,
+        "initialize_p50_ms": round(percentile(initialize, 50), 1),
+        "initialize_p95_ms": round(percentile(initialize, 95), 1),
+        "initialize_min_ms": round(initialize[0], 1),
+        "tools_list_p50_ms": round(percentile(tools, 50), 1),
+    }
+    print(f"initialize  p50 {summary['initialize_p50_ms']:>8.1f}  p95 {summary['initialize_p95_ms']:>8.1f}  "
+          f"min {summary['initialize_min_ms']:>8.1f} ms")
+    print(f"tools/list  p50 {summary['tools_list_p50_ms']:>8.1f} ms  ({tool_count} tools)")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+                "python": args.python,
+                "results": summary,
+            }, f, indent=2)
+        print(f"wrote {args.out}")
+    if args.max_ms is not None and summary["initialize_p50_ms"] > args.max_ms:
+        print(f"FAIL: initialize p50 {summary['initialize_p50_ms']} ms is over the {args.max_ms} ms budget")
+        return 1
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs (fills the bytecode cache)")
+    parser.add_argument("--python", default=sys.executable, help="interpreter that runs the server")
+    parser.add_argument("--max-ms", type=float, default=None, help="exit 1 if initialize p50 exceeds this")
+    parser.add_argument("--imports", action="store_true", help="print the slowest imports and exit")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--out", default=None, help="write JSON results here")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
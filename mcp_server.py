@@ -1,8 +1,156 @@
+"""Kotak Neo MCP server (stdio).
+
+Claude Desktop starts a fresh process per session, so startup time matters:
+only the MCP stack is imported up front, and the HTTP client is created on the
+first tool call. benchmarks/startup_bench.py measures time to the first
+initialize response.
+
+Several Kotak accounts can be used from one server: NEO_SESSIONS names their
+worker sessions, every tool takes an optional `account`, and the
+*_all_accounts tools read every account concurrently.
+"""
+from contextlib import asynccontextmanager
 from mcp.server.fastmcp import FastMCP
-from fastapi import HTTPException
-import httpx
+from mcp.server.fastmcp.exceptions import ToolError
+import asyncio
 import json
-mcp = FastMCP("Kotak-MCP-Server")
+import os
+
+# ---- Worker connection settings (override through the environment) ----
+NEO_WORKER_URL = os.getenv("NEO_WORKER_URL", "http://127.0.0.1:8001").rstrip("/")
+NEO_SESSION_ID = os.getenv("NEO_SESSION_ID", "2c5f8ebf-1ade-4746-bded-c4502a9f5d2e")
+# Named accounts: "me=<session_id>,joint=<session_id>"; NEO_SESSION_ID alone means one "default" account.
+NEO_SESSIONS = os.getenv("NEO_SESSIONS", "")
+NEO_DEFAULT_ACCOUNT = os.getenv("NEO_DEFAULT_ACCOUNT", "")
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("NEO_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("NEO_HTTP_READ_TIMEOUT", "30"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("NEO_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("NEO_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("NEO_HTTP_KEEPALIVE_EXPIRY", "60"))
+# End-to-end budget of one tool call; the gateway and worker give up when it is spent.
+TOOL_DEADLINE = float(os.getenv("NEO_TOOL_DEADLINE", str(HTTP_READ_TIMEOUT)))
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+http_client = None
+
+
+def create_http_client():
+    """Returns one pooled keep-alive client shared by every tool call."""
+    import httpx
+    return httpx.AsyncClient(
+        base_url=NEO_WORKER_URL,
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_http_client():
+    """Returns the shared client, creating it on the first tool call."""
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = create_http_client()
+    return http_client
+
+
+@asynccontextmanager
+async def lifespan(server):
+    # The client (and its TLS context) is built lazily so it does not delay initialize.
+    global http_client
+    try:
+        yield {}
+    finally:
+        if http_client is not None:
+            await http_client.aclose()
+            http_client = None
+
+
+mcp = FastMCP("Kotak-MCP-Server", lifespan=lifespan)
+
+
+def parse_sessions(value: str) -> dict:
+    """Parses "name=session_id,name=session_id" into {name: session_id}."""
+    sessions = {}
+    for item in value.split(","):
+        name, sep, session_id = item.partition("=")
+        if sep and name.strip() and session_id.strip():
+            sessions[name.strip()] = session_id.strip()
+    return sessions
+
+
+# account name -> worker session id, in the order accounts were configured
+SESSIONS = parse_sessions(NEO_SESSIONS) or {"default": NEO_SESSION_ID}
+DEFAULT_ACCOUNT = NEO_DEFAULT_ACCOUNT if NEO_DEFAULT_ACCOUNT in SESSIONS else next(iter(SESSIONS))
+
+
+def session_for(account: str = None) -> str:
+    """Worker session id of a named account (the default account when None)."""
+    session_id = SESSIONS.get(account or DEFAULT_ACCOUNT)
+    if session_id is None:
+        raise ToolError(f"Unknown account {account!r}; known accounts: {', '.join(SESSIONS)}.")
+    return session_id
+
+
+async def call_worker(method: str, path: str, deadline: float = None, **kwargs):
+    """Sends a request to the Neo worker over the shared client with a deadline of
+    `deadline` seconds (NEO_TOOL_DEADLINE by default), forwarded as X-Deadline-Ms.
+    Failures are raised as ToolError, which MCP reports as a tool error result."""
+    import httpx
+    client = get_http_client()
+    deadline = deadline or TOOL_DEADLINE
+    kwargs["headers"] = {**(kwargs.get("headers") or {}), DEADLINE_HEADER: str(int(deadline * 1000))}
+    kwargs.setdefault("timeout", httpx.Timeout(deadline, connect=min(deadline, HTTP_CONNECT_TIMEOUT)))
+    try:
+        response = await client.request(method, path, **kwargs)
+        response.raise_for_status()
+        return response
+    except httpx.HTTPStatusError as e:
+        error_detail = "unknown error"
+        try:
+            error_detail = e.response.json().get('detail', 'unknown error')
+        except:
+            error_detail = str(e)
+        raise ToolError(f"worker error ({e.response.status_code}): {error_detail}")
+    except httpx.TimeoutException:
+        raise ToolError(f"Neo Worker did not answer within {deadline:g}s.")
+    except httpx.RequestError as e:
+        raise ToolError(f"Cannot connect to Neo Worker service: {e}")
+
+
+# Columns requested from the worker by default, so only what the LLM needs is sent.
+HOLDINGS_FIELDS = [
+    "instrumentName", "quantity", "averagePrice",
+    "holdingCost", "closingPrice", "unrealisedGainLoss"
+]
+POSITIONS_FIELDS = [
+    "trdSym", "exSeg", "prod", "flBuyQty", "flSellQty", "cfBuyQty", "cfSellQty",
+    "buyAmt", "sellAmt", "cfBuyAmt", "cfSellAmt", "lotSz"
+]
+
+
+def to_json(data) -> str:
+    return json.dumps(data, separators=(",", ":"))
+
+
+async def read_versioned(session_id: str, kind: str, params: dict, since: str = None):
+    """Reads holdings/limits/positions. With `since` (a version from an earlier
+    read in this conversation) the worker sends only what changed since then.
+    Returns (body, unchanged)."""
+    if since:
+        params = {**params, "since": since}
+    response = await call_worker("GET", f"/worker/{kind}/{session_id}", params=params)
+    body = response.json()
+    return body, bool(since) and body.get("version") == since
+
+
+def unchanged_output(body: dict) -> str:
+    return to_json({"unchanged": True, "version": body["version"],
+                    "message": "No changes since that version; call without `since` to get everything again."})
+
 
 @mcp.tool()
 def add(a: int, b: int) -> int:
@@ -10,169 +158,372 @@ def add(a: int, b: int) -> int:
     return a + b
 
 @mcp.tool()
-async def get_holdings():
-    """ Gets the current holding of the client"""
-    NEO_WORKER_URL = "http://127.0.0.1:8001/worker/holdings"
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(f"{NEO_WORKER_URL}/2c5f8ebf-1ade-4746-bded-c4502a9f5d2e")
-            response.raise_for_status()
-            response = response.json()
-            required_keys = [
-    "instrumentName", "quantity", "averagePrice",
-    "holdingCost", "closingPrice", "unrealisedGainLoss"
-]
+async def get_holdings(refresh: bool = False, all_fields: bool = False, since: str = None, account: str = None):
+    """ Gets the current holding of the client (of `account` if given, see list_accounts).
+    Data may be a few seconds old; pass refresh=True to bypass the worker cache.
+    Only the summary columns are returned unless all_fields=True.
+    To re-check holdings you already have, pass the `version` of that answer as `since`:
+    you get only the added, changed and removed rows (or unchanged=true)."""
+    params = {"refresh": refresh}
+    if not all_fields:
+        params["fields"] = ",".join(HOLDINGS_FIELDS)
+    response, unchanged = await read_versioned(session_for(account), "holdings", params, since)
+    if unchanged:
+        return unchanged_output(response)
+    output = {
+        "message": response.get("message", ""),
+        "cached": response.get("cached", False),
+        "age": response.get("age", 0),
+        "version": response.get("version"),
+    }
+    if response.get("delta"):
+        output["since"] = response.get("since")
+        output["changes"] = response.get("holdings")
+    else:
+        output["holdings"] = (response.get("holdings") or {}).get("data", [])
+    return to_json(output)
 
-            output = {
-                "message": response.get("message", ""),
-                "holdings": []
-            }
-
-            for item in response.get("holdings", {}).get("data", []):
-                filtered = {key: item.get(key) for key in required_keys}
-                output["holdings"].append(filtered)
-
-            # ---- Result ----
-            result = json.dumps(output)
-            return result
-        
-        except httpx.HTTPStatusError as e:
-            error_detail = "unknown error"
-            try:
-                error_detail = e.response.json().get('detail', 'unknown error')
-            except:
-                error_detail = str(e)
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"worker error: {error_detail}"
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(
-                status_code=503, 
-                detail=f"Cannot connect to Neo Worker service: {e}")
-
-@mcp.tool()
-async def get_limits():
-    """ Gets the limits of the client"""
-    NEO_WORKER_URL = "http://127.0.0.1:8001/worker/limits"
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(f"{NEO_WORKER_URL}/2c5f8ebf-1ade-4746-bded-c4502a9f5d2e")
-            response.raise_for_status()
-            response = response.json()
-            return response
-        
-        except httpx.HTTPStatusError as e:
-            error_detail = "unknown error"
-            try:
-                error_detail = e.response.json().get('detail', 'unknown error')
-            except:
-                error_detail = str(e)
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"worker error: {error_detail}"
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(
-                status_code=503, 
-                detail=f"Cannot connect to Neo Worker service: {e}")
-            
-@mcp.tool()
-async def get_positions():
-    """ Gets the position of the client"""
-    NEO_WORKER_URL = "http://127.0.0.1:8001/worker/positions"
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(f"{NEO_WORKER_URL}/2c5f8ebf-1ade-4746-bded-c4502a9f5d2e")
-            response.raise_for_status()
-            response = response.json()
-            return response
-        
-        except httpx.HTTPStatusError as e:
-            error_detail = "unknown error"
-            try:
-                error_detail = e.response.json().get('detail', 'unknown error')
-            except:
-                error_detail = str(e)
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"worker error: {error_detail}"
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(
-                status_code=503, 
-                detail=f"Cannot connect to Neo Worker service: {e}")
-            
-@mcp.tool()
-async def buy_order(qty:str,stock:str):
+@mcp.tool()
+async def get_limits(refresh: bool = False, since: str = None, account: str = None):
+    """ Gets the limits of the client (of `account` if given, see list_accounts).
+    Data may be a few seconds old; pass refresh=True to bypass the worker cache.
+    To re-check limits you already have, pass the `version` of that answer as `since`:
+    you get only the changed values (or unchanged=true)."""
+    response, unchanged = await read_versioned(session_for(account), "limits", {"refresh": refresh}, since)
+    if unchanged:
+        return unchanged_output(response)
+    return to_json(response)
+
+@mcp.tool()
+async def get_positions(refresh: bool = False, all_fields: bool = False, since: str = None, account: str = None):
+    """ Gets the position of the client (of `account` if given, see list_accounts).
+    Data may be a few seconds old; pass refresh=True to bypass the worker cache.
+    Only the main columns are returned unless all_fields=True.
+    To re-check positions you already have, pass the `version` of that answer as `since`:
+    you get only the added, changed and removed rows (or unchanged=true)."""
+    params = {"refresh": refresh}
+    if not all_fields:
+        params["fields"] = ",".join(POSITIONS_FIELDS)
+    response, unchanged = await read_versioned(session_for(account), "positions", params, since)
+    if unchanged:
+        return unchanged_output(response)
+    return to_json(response)
+
+@mcp.tool()
+async def get_portfolio(refresh: bool = False, account: str = None):
+    """ Gets holdings, limits and positions of the client (of `account` if given) in a single call.
+    Prefer this over calling get_holdings, get_limits and get_positions separately.
+    Data may be a few seconds old; pass refresh=True to bypass the worker cache."""
+    params = {"refresh": refresh,
+              "holdings_fields": ",".join(HOLDINGS_FIELDS),
+              "positions_fields": ",".join(POSITIONS_FIELDS)}
+    response = await call_worker("GET", f"/worker/portfolio/{session_for(account)}", params=params)
+    return to_json(response.json())
+
+async def fan_out(kind: str, params: dict):
+    """Reads /worker/{kind}/ for every account concurrently, so the call takes about
+    as long as the slowest account. Returns ({account: body}, {account: error})."""
+    names = list(SESSIONS)
+    results = await asyncio.gather(
+        *(call_worker("GET", f"/worker/{kind}/{SESSIONS[name]}", params=params) for name in names),
+        return_exceptions=True,
+    )
+    bodies, errors = {}, {}
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            errors[name] = str(result)
+        else:
+            bodies[name] = result.json()
+    if not bodies:
+        raise ToolError(f"No account could be read: {to_json(errors)}")
+    return bodies, errors
+
+
+def number(value) -> float:
+    """Broker numbers arrive as floats, ints or strings ("1000.00")."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def consolidate_holdings(bodies: dict):
+    """One row per instrument across accounts: quantities, cost and P&L summed,
+    average price weighted by quantity, with each account's quantity."""
+    merged = {}
+    for account, body in bodies.items():
+        for row in (body.get("holdings") or {}).get("data", []):
+            name = str(row.get("instrumentName") or "").upper()
+            entry = merged.get(name)
+            if entry is None:
+                entry = merged[name] = {"instrumentName": name, "quantity": 0.0, "holdingCost": 0.0,
+                                        "closingPrice": None, "unrealisedGainLoss": 0.0, "accounts": {}}
+            qty = number(row.get("quantity"))
+            entry["quantity"] += qty
+            entry["holdingCost"] += number(row.get("holdingCost"))
+            entry["unrealisedGainLoss"] += number(row.get("unrealisedGainLoss"))
+            entry["closingPrice"] = entry["closingPrice"] or row.get("closingPrice")
+            entry["accounts"][account] = entry["accounts"].get(account, 0.0) + qty
+    rows = []
+    for entry in merged.values():
+        qty, cost = entry["quantity"], entry["holdingCost"]
+        rows.append({
+            "instrumentName": entry["instrumentName"],
+            "quantity": qty,
+            "averagePrice": round(cost / qty, 2) if qty else 0.0,
+            "holdingCost": round(cost, 2),
+            "closingPrice": entry["closingPrice"],
+            "marketValue": round(qty * number(entry["closingPrice"]), 2),
+            "unrealisedGainLoss": round(entry["unrealisedGainLoss"], 2),
+            "accounts": entry["accounts"],
+        })
+    rows.sort(key=lambda r: -r["marketValue"])
+    return rows
+
+
+def net_positions(bodies: dict):
+    """Net open quantity per (symbol, product) across accounts."""
+    merged = {}
+    for account, body in bodies.items():
+        for row in (body.get("positions") or {}).get("data", []):
+            net = (number(row.get("flBuyQty")) + number(row.get("cfBuyQty"))
+                   - number(row.get("flSellQty")) - number(row.get("cfSellQty")))
+            key = (row.get("trdSym"), row.get("prod"))
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = {"trdSym": key[0], "prod": key[1], "netQty": 0.0, "accounts": {}}
+            entry["netQty"] += net
+            entry["accounts"][account] = entry["accounts"].get(account, 0.0) + net
+    return [e for e in merged.values() if e["netQty"] or any(e["accounts"].values())]
+
+
+@mcp.tool()
+async def list_accounts():
+    """ Lists the configured accounts: name, whether it is the default, and whether its
+    session is still active (an expired account needs a new login).
+    Pass a name as `account` to any tool, or use the *_all_accounts tools to read all of them."""
+    response = await call_worker("POST", "/worker/sessions/status",
+                                 json={"session_ids": list(dict.fromkeys(SESSIONS.values()))})
+    status = response.json().get("sessions", {})
+    return to_json({"accounts": [
+        {"name": name, "default": name == DEFAULT_ACCOUNT, "session": status.get(session_id, "unknown")}
+        for name, session_id in SESSIONS.items()
+    ]})
+
+@mcp.tool()
+async def get_holdings_all_accounts(refresh: bool = False):
+    """ Gets holdings of every configured account at once, consolidated per instrument:
+    total quantity, cost, weighted average price, market value at last close,
+    unrealised P&L and the quantity held in each account, plus per-account totals.
+    Accounts that fail are listed under "errors"; the others are still returned."""
+    params = {"refresh": refresh, "fields": ",".join(HOLDINGS_FIELDS)}
+    bodies, errors = await fan_out("holdings", params)
+    rows = consolidate_holdings(bodies)
+    totals = {}
+    for account, body in bodies.items():
+        data = (body.get("holdings") or {}).get("data", [])
+        totals[account] = {
+            "count": len(data),
+            "holdingCost": round(sum(number(r.get("holdingCost")) for r in data), 2),
+            "unrealisedGainLoss": round(sum(number(r.get("unrealisedGainLoss")) for r in data), 2),
+        }
+    return to_json({
+        "accounts": totals,
+        "total": {
+            "count": len(rows),
+            "holdingCost": round(sum(r["holdingCost"] for r in rows), 2),
+            "marketValue": round(sum(r["marketValue"] for r in rows), 2),
+            "unrealisedGainLoss": round(sum(r["unrealisedGainLoss"] for r in rows), 2),
+        },
+        "holdings": rows,
+        "errors": errors,
+    })
+
+@mcp.tool()
+async def get_positions_all_accounts(refresh: bool = False):
+    """ Gets today's positions of every configured account at once: each account's
+    positions and the net open quantity per symbol and product across accounts.
+    Accounts that fail are listed under "errors"; the others are still returned."""
+    params = {"refresh": refresh, "fields": ",".join(POSITIONS_FIELDS)}
+    bodies, errors = await fan_out("positions", params)
+    return to_json({
+        "accounts": {account: (body.get("positions") or {}).get("data", []) for account, body in bodies.items()},
+        "net": net_positions(bodies),
+        "errors": errors,
+    })
+
+@mcp.tool()
+async def get_limits_all_accounts(refresh: bool = False):
+    """ Gets the limits of every configured account at once, with the total net
+    available cash. Accounts that fail are listed under "errors"."""
+    bodies, errors = await fan_out("limits", {"refresh": refresh})
+    limits = {account: body.get("limits") for account, body in bodies.items()}
+    return to_json({
+        "accounts": limits,
+        "total_net": round(sum(number((l or {}).get("Net")) for l in limits.values()), 2),
+        "errors": errors,
+    })
+
+@mcp.tool()
+async def portfolio_analytics(top: int = 10, refresh: bool = False, live: bool = False,
+                              side: str = None, symbol: str = None, qty: float = None, price: float = None,
+                              account: str = None):
+    """ Computes portfolio analytics on the server: total value and invested amount,
+    unrealised P&L (absolute and %), day change, allocation weights, concentration
+    (HHI, effective number of positions), the top-N exposures, realised/unrealised
+    P&L of today's positions and available cash.
+    Use this instead of doing arithmetic on get_holdings output.
+    Parameters:
+      - top: int, number of largest holdings to list (default 10, max 50)
+      - live: bool, mark holdings at live market prices (default: last close unless already streaming)
+      - side, symbol, qty, price: optional what-if order ("B"/"S", e.g. "HAL", 10, price
+        optional for held symbols) to see weights, concentration, cash and realised P&L after it
+      - account: str, optional account name (see list_accounts)
+    """
+    params = {"top": top, "refresh": refresh, "live": live}
+    if side and symbol and qty:
+        params.update({"side": side, "symbol": symbol, "qty": qty})
+        if price is not None:
+            params["price"] = price
+    response = await call_worker("GET", f"/worker/analytics/{session_for(account)}", params=params)
+    return to_json(response.json())
+
+@mcp.tool()
+async def portfolio_history(days: float = 7, symbol: str = None, kind: str = "holdings",
+                            start: str = None, end: str = None, points: int = 30, account: str = None):
+    """ Shows how the portfolio changed over time, from snapshots the worker records
+    whenever holdings/positions are read (no broker call).
+    Without symbol: total value, P&L and number of instruments per snapshot, plus the
+    instruments added, removed or resized between the first and last snapshot.
+    With symbol: that instrument's quantity, price, value and P&L over time.
+    Parameters:
+      - days: float, how far back to look (default 7), ignored when start is given
+      - symbol: str, optional instrument (e.g. "HAL")
+      - kind: "holdings" (default) or "positions"
+      - start, end: optional ISO dates/datetimes (e.g. "2025-01-06")
+      - points: int, max points in the series (default 30)
+      - account: str, optional account name (see list_accounts)
+    """
+    params = {"days": days, "kind": kind, "points": points}
+    for name, value in (("symbol", symbol), ("start", start), ("end", end)):
+        if value:
+            params[name] = value
+    response = await call_worker("GET", f"/worker/history/{session_for(account)}", params=params)
+    return to_json(response.json())
+
+@mcp.tool()
+async def search_instrument(query: str, segment: str = None, limit: int = 10):
+    """ Searches instruments (stocks, F&O contracts) by symbol or company name.
+    Use it to find the exact trading symbol before placing an order.
+    Parameters:
+      - query: str, symbol or part of the company name (e.g. "SUZLON", "hindustan aero")
+      - segment: str, optional exchange segment ("nse_cm", "bse_cm", "nse_fo")
+      - limit: int, max results (default 10)
+    """
+    params = {"q": query, "limit": limit}
+    if segment:
+        params["segment"] = segment
+    response = await call_worker("GET", f"/worker/instruments/search/{session_for()}",
+                                 params=params)
+    return to_json(response.json())
+
+@mcp.tool()
+async def get_quote(symbol: str, segment: str = None):
+    """ Gets the live quote (last traded price, change, volume) for one instrument.
+    Parameters:
+      - symbol: str (e.g. "SUZLON") in capital letters
+      - segment: str, optional exchange segment (default: NSE cash first)
+    """
+    return await get_quotes([symbol], segment)
+
+@mcp.tool()
+async def get_quotes(symbols: list[str], segment: str = None):
+    """ Gets live quotes for several instruments in one call.
+    Parameters:
+      - symbols: list of str (e.g. ["SUZLON","IDEA","HAL"]) in capital letters
+      - segment: str, optional exchange segment (default: NSE cash first)
+    """
+    params = {"symbols": ",".join(symbols)}
+    if segment:
+        params["segment"] = segment
+    response = await call_worker("GET", f"/worker/quotes/{session_for()}", params=params)
+    return to_json(response.json())
+
+@mcp.tool()
+async def buy_order(qty:str,stock:str,account:str=None,skip_checks:bool=False):
     """
     Places BUY Order for the client via the local worker service.
     Parameters:
-      - session_id: str
       - qty: int (>0)
       - stock: str (e.g. "SUZLON","IDEA","GRSE","HAL","BDL") stock will always be in all capital letters.
-    Returns parsed JSON response from the worker (or raises an exception).
+      - account: str, optional account name (see list_accounts)
+      - skip_checks: bool, skip the worker's pre-trade check (holdings, funds, lot size);
+        only when the user insists after a check failed
+    Returns the broker response, including the order id (nOrdNo) to pass to wait_for_fill.
+    An order the pre-trade check finds impossible fails with the reason, without reaching the broker.
     """
-    
-    NEO_WORKER_URL = "http://127.0.0.1:8001/worker/buy/2c5f8ebf-1ade-4746-bded-c4502a9f5d2e"
-    
     payload = {"qty": qty,
-               "stock": stock}
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(NEO_WORKER_URL, json=payload)
-            response.raise_for_status()
-        except httpx.HTTPStatusError as e:
-            error_detail = "unknown error"
-            try:
-                error_detail = e.response.json().get('detail', 'unknown error')
-            except:
-                error_detail = str(e)
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"worker error: {error_detail}"
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(
-                status_code=503, 
-                detail=f"Cannot connect to Neo Worker service: {e}")
-
-@mcp.tool()
-async def sell_order(qty:str,stock:str):
+               "stock": stock,
+               "skip_checks": skip_checks}
+    response = await call_worker("POST", f"/worker/buy/{session_for(account)}", json=payload)
+    return to_json(response.json())
+
+@mcp.tool()
+async def sell_order(qty:str,stock:str,account:str=None,skip_checks:bool=False):
     """
     Places SELL Order for the client via the local worker service.
     Parameters:
-      - session_id: str
       - qty: int (>0)
       - stock: str (e.g. "SUZLON","IDEA","GRSE","HAL","BDL") stock will always be in all capital letters.
-    Returns parsed JSON response from the worker (or raises an exception).
+      - account: str, optional account name (see list_accounts)
+      - skip_checks: bool, skip the worker's pre-trade check (holdings, funds, lot size);
+        only when the user insists after a check failed
+    Returns the broker response, including the order id (nOrdNo) to pass to wait_for_fill.
+    An order the pre-trade check finds impossible fails with the reason, without reaching the broker.
     """
-    
-    NEO_WORKER_URL = "http://127.0.0.1:8001/worker/sell/2c5f8ebf-1ade-4746-bded-c4502a9f5d2e"
-    
     payload = {"qty": qty,
-               "stock": stock}
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(NEO_WORKER_URL, json=payload)
-            response.raise_for_status()
-        except httpx.HTTPStatusError as e:
-            error_detail = "unknown error"
-            try:
-                error_detail = e.response.json().get('detail', 'unknown error')
-            except:
-                error_detail = str(e)
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"worker error: {error_detail}"
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(
-                status_code=503, 
-                detail=f"Cannot connect to Neo Worker service: {e}")
-         
+               "stock": stock,
+               "skip_checks": skip_checks}
+    response = await call_worker("POST", f"/worker/sell/{session_for(account)}", json=payload)
+    return to_json(response.json())
+
+@mcp.tool()
+async def wait_for_fill(order_id: str, timeout: float = 30, account: str = None):
+    """
+    Waits until an order is filled, partly filled, rejected or cancelled and returns it.
+    Use this after buy_order/sell_order instead of polling holdings or positions.
+    Parameters:
+      - order_id: str, the nOrdNo returned when the order was placed
+      - timeout: float, max seconds to wait (capped at 55)
+      - account: str, the account the order was placed from (default account if omitted)
+    Returns the order with status, filled_qty, avg_price and "final" once it can no longer change.
+    """
+    response = await call_worker("GET", f"/worker/orders/{session_for(account)}/{order_id}/wait",
+                                 params={"timeout": timeout},
+                                 deadline=timeout + TOOL_DEADLINE)
+    return to_json(response.json())
+
+@mcp.tool()
+async def place_basket(legs: list[dict], account: str = None):
+    """
+    Places several orders at once (e.g. a rebalance) via the local worker service.
+    Parameters:
+      - legs: list of orders, each a dict with
+          - side: "B" for buy or "S" for sell
+          - qty: int (>0)
+          - symbol: str (e.g. "SUZLON","HAL") in capital letters
+          - product: str, optional (default "CNC")
+          - order_type: str, optional (default "MKT"; "L" for limit, then also pass price)
+          - price: str, optional (default "0")
+          - exchange_segment: str, optional (default "nse_cm")
+          - skip_checks: bool, optional (default false), skip the pre-trade check for this leg
+      - account: str, optional account name (see list_accounts)
+    Returns per-leg results; a failed leg does not cancel the others. Legs the pre-trade
+    check finds impossible come back as "blocked" with the reason.
+    """
+    payload = {"session_id": session_for(account), "legs": legs}
+    response = await call_worker("POST", "/worker/orders/batch", json=payload)
+    return to_json(response.json())
 
 
 def main():
@@ -180,4 +531,4 @@ def main():
     mcp.run(transport='stdio')
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()